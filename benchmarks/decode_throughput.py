@@ -0,0 +1,81 @@
+"""
+Decoding cost of storage values: generic SCALE decoder vs codec.py.
+
+Decodes N u64 stakes (TotalHotkeyAlpha -> Balance.from_rao(x).tao) and N
+RootClaimable maps with 128 subnets each (-> {netuid: claimable_float}), with
+the generic SCALE decoder as the calculators used to, and with the native
+scalar and batch decoders. No node is needed.
+
+Usage: python benchmarks/decode_throughput.py [values]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bittensor import Balance
+from scalecodec.base import RuntimeConfiguration, ScaleBytes
+from scalecodec.type_registry import load_type_registry_preset
+
+from codec import decode_root_claimable, decode_u64, decode_u64_batch, rao_to_tao_batch
+from helpers import claimable_float
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(0)
+    runtime_config = RuntimeConfiguration()
+    runtime_config.update_type_registry(load_type_registry_preset("legacy"))
+
+    def encode(type_string, value):
+        return bytes(runtime_config.create_scale_object(type_string).encode(value).data)
+
+    stakes = [encode("u64", rng.randrange(2**50)) for _ in range(n)]
+    claimable_maps = [
+        encode("BTreeMap<u16, i128>", [(netuid, rng.randrange(2**32)) for netuid in range(1, 129)])
+        for _ in range(n // 100)
+    ]
+
+    def generic_u64():
+        return [
+            Balance.from_rao(runtime_config.create_scale_object("u64", data=ScaleBytes(s)).decode()).tao
+            for s in stakes
+        ]
+
+    def generic_claimable():
+        return [
+            {
+                netuid: claimable_float({"bits": bits})
+                for netuid, bits in runtime_config.create_scale_object(
+                    "BTreeMap<u16, i128>", data=ScaleBytes(m)
+                ).decode()
+            }
+            for m in claimable_maps
+        ]
+
+    rows = [
+        (f"{n} u64 stakes", "generic SCALE", timed(generic_u64), n),
+        (f"{n} u64 stakes", "native scalar", timed(lambda: [decode_u64(s) / 10**9 for s in stakes]), n),
+        (f"{n} u64 stakes", "native batch", timed(lambda: rao_to_tao_batch(decode_u64_batch(stakes))), n),
+        (f"{len(claimable_maps)} RootClaimable maps", "generic SCALE", timed(generic_claimable), len(claimable_maps)),
+        (f"{len(claimable_maps)} RootClaimable maps", "native", timed(lambda: [decode_root_claimable(m) for m in claimable_maps]), len(claimable_maps)),
+    ]
+
+    assert generic_u64() == rao_to_tao_batch(decode_u64_batch(stakes)).tolist()
+    assert generic_claimable() == [decode_root_claimable(m) for m in claimable_maps]
+
+    print(f"{'values':<26}{'decoder':<16}{'total ms':>10}{'us/value':>10}")
+    for what, decoder, seconds, count in rows:
+        print(f"{what:<26}{decoder:<16}{seconds * 1000:>10.2f}{seconds / count * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
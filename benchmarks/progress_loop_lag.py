@@ -0,0 +1,108 @@
+"""
+Event-loop time taken by progress reporting: rich Progress vs HeadlessProgress.
+
+Simulates a root run: N fetches complete through the event loop and each one
+updates one of three progress tasks, while a probe task measures how late the
+loop wakes it up (loop lag). A run without any progress reporting is the
+baseline. "update s" is the event-loop time spent inside progress.update(),
+including waits for the GIL held by rich's refresh thread; "recovered" is the
+difference between rich and headless mode. No node is needed.
+
+Usage: python benchmarks/progress_loop_lag.py [events] [concurrency]
+"""
+import asyncio
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from rich.console import Console
+from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn
+
+from utils.progress import HeadlessProgress
+
+PROBE_INTERVAL = 0.001
+REPEATS = 5
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+class NoProgress:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_task(self, *args, **kwargs):
+        return 0
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+async def run(progress, events: int, concurrency: int):
+    tasks = [progress.add_task(f"[cyan]Fetching phase {i}", total=events) for i in range(3)]
+    semaphore = asyncio.Semaphore(concurrency)
+    spent = [0.0]
+
+    async def fetch(i: int):
+        async with semaphore:
+            await asyncio.sleep(0.0005)  # stands in for the websocket round trip
+            start = time.perf_counter()
+            progress.update(tasks[i % 3], advance=1)
+            spent[0] += time.perf_counter() - start
+
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[fetch(i) for i in range(events)])
+    wall = time.perf_counter() - wall_start
+    stop.set()
+    await probe_task
+    return wall, spent[0], lags
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    modes = {
+        "none": NoProgress,
+        # force_terminal keeps rich rendering on even though the output is not a tty
+        "rich": lambda: Progress(
+            SpinnerColumn(), *Progress.get_default_columns(), TimeElapsedColumn(),
+            console=Console(file=io.StringIO(), force_terminal=True),
+        ),
+        "headless": lambda: HeadlessProgress(file=io.StringIO()),
+    }
+
+    rows = {}
+    for name, make in modes.items():
+        best = None
+        for _ in range(REPEATS):
+            with make() as progress:
+                wall, in_update, lags = asyncio.run(run(progress, events, concurrency))
+            lags.sort()
+            row = (wall, in_update, statistics.median(lags) * 1000, lags[int(len(lags) * 0.99)] * 1000)
+            best = row if best is None or row[0] < best[0] else best
+        rows[name] = best
+
+    print(f"{events} updates, concurrency {concurrency}, best of {REPEATS} by wall time")
+    print(f"{'mode':<10}{'wall s':>10}{'update s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}")
+    for name, (wall, in_update, p50, p99) in rows.items():
+        print(f"{name:<10}{wall:>10.3f}{in_update:>10.3f}{p50:>12.3f}{p99:>12.3f}")
+    recovered = rows["rich"][1] - rows["headless"][1]
+    print(f"loop time recovered by headless mode: {recovered:.3f} s ({recovered / events * 1e6:.2f} us per update)")
+
+
+if __name__ == "__main__":
+    main()
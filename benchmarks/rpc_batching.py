@@ -0,0 +1,100 @@
+"""
+Frames and time per request: stock Websocket vs BatchingWebsocket.
+
+A local stand-in JSON-RPC server answers state_getStorage with a fixed u64 value,
+per request or per batch array, and counts the frames it receives. The client issues
+N rpc_request() calls through AsyncSubstrateInterface with at most C in flight, the way
+the calculators do, once per transport. No node is needed.
+
+Usage: python benchmarks/rpc_batching.py [requests] [concurrency] [max_batch]
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from async_substrate_interface import AsyncSubstrateInterface
+from websockets.asyncio.server import serve
+
+from batching import install_batching
+from helpers import as_completed_windowed
+
+VALUE = "0x" + (123456789).to_bytes(8, "little").hex()
+REPEATS = 3
+
+
+class StandInServer:
+    def __init__(self):
+        self.frames = 0
+        self.requests = 0
+
+    def answer(self, request: dict) -> dict:
+        self.requests += 1
+        return {"jsonrpc": "2.0", "id": request["id"], "result": VALUE}
+
+    async def handler(self, connection):
+        async for message in connection:
+            self.frames += 1
+            request = json.loads(message)
+            if isinstance(request, list):
+                await connection.send(json.dumps([self.answer(r) for r in request]))
+            else:
+                await connection.send(json.dumps(self.answer(request)))
+
+
+class Subtensor:
+    """Only the substrate, as install_batching() expects from an AsyncSubtensor."""
+
+    def __init__(self, url):
+        self.substrate = AsyncSubstrateInterface(url, ws_shutdown_timer=None)
+
+
+async def run(url: str, server: StandInServer, requests: int, concurrency: int, max_batch):
+    subtensor = Subtensor(url)
+    if max_batch:
+        install_batching(subtensor, max_batch)
+    substrate = subtensor.substrate
+
+    async def read(i):
+        return await substrate.rpc_request("state_getStorage", [f"0x{i:064x}", "0x" + "00" * 32])
+
+    frames_before = server.frames
+    start = time.perf_counter()
+    async for result in as_completed_windowed((lambda i=i: read(i) for i in range(requests)), concurrency):
+        if isinstance(result, Exception):
+            raise result
+    elapsed = time.perf_counter() - start
+    frames = server.frames - frames_before
+    await substrate.ws.shutdown()
+    return elapsed, frames
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    max_batch = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    server = StandInServer()
+    async with serve(server.handler, "127.0.0.1", 0) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}"
+
+        print(f"{requests} requests, {concurrency} in flight")
+        rows = []
+        for name, batch in (("single", None), (f"batch {max_batch}", max_batch)):
+            best = min([await run(url, server, requests, concurrency, batch) for _ in range(REPEATS)])
+            elapsed, frames = best
+            rows.append((name, elapsed, frames))
+            print(
+                f"{name:>10}: {elapsed:7.3f}s  {requests / elapsed:8.0f} req/s  "
+                f"{frames:6d} frames  {elapsed / requests * 1e6:7.1f} µs/req"
+            )
+        (_, single, single_frames), (_, batched, batched_frames) = rows
+        print(f"frames: {single_frames / max(batched_frames, 1):.1f}x fewer, time: {single / batched:.2f}x faster")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
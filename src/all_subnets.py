@@ -0,0 +1,189 @@
+"""
+APY of one hotkey on root and on every subnet it has stake on, in one run.
+
+The subnets and their epoch schedules come from a single get_all_subnets_info call at
+`block`, the subnets with stake from a single TotalHotkeyAlpha[hotkey, *] map query.
+Every subnet epoch block of the window is also a root event block, so root runs first
+and the root stake it reads at those blocks is kept in a SharedBlockValues and reused by
+the subnet filters; TaoWeight is resolved once over the epoch blocks of all subnets.
+"""
+import asyncio
+from collections import Counter
+from dataclasses import replace
+from typing import Dict, Iterable, Optional
+
+from bittensor import AsyncSubtensor
+
+from codec import RAO_PER_TAO
+from constants import BLOCK_SECONDS, INTERVAL_SECONDS
+from helpers import get_hotkey_netuids, get_tao_weight
+from options import DEFAULT_OPTIONS, CalcOptions
+from root_calc import retrieve_and_calculate_hotkey_root_apy
+from streaming import ApyResult
+from subnet_calc import retrieve_and_calculate_hotkey_subnet_apy, subnet_epoch_grid
+from take import Piecewise, resolve_piecewise
+from utils.deadline import Deadline
+
+
+class SharedBlockValues:
+    """
+    Per-block values shared by the calculations of one hotkey at the epoch blocks of
+    `blocks`: the root stake TotalHotkeyAlpha[hotkey, 0] and TaoWeight.
+
+    A root stake is read once per block and kept if the block is in `blocks`; values read
+    elsewhere (e.g. with RootClaimable in one raw call) are added with put_root_stake().
+    TaoWeight rarely changes and is resolved over all of `blocks` on first use (see
+    take.resolve_piecewise). `reads` counts the storage reads issued, `hits` the values
+    served without one.
+    """
+
+    def __init__(self, subtensor: AsyncSubtensor, hotkey: str, blocks: Iterable[int]):
+        self.subtensor = subtensor
+        self.hotkey = hotkey
+        self.blocks = sorted(set(blocks))
+        self._block_set = set(self.blocks)
+        self._root_stakes: Dict[int, float] = {}
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._tao_weights: Optional[asyncio.Future] = None
+        self.reads = Counter()
+        self.hits = 0
+
+    def put_root_stake(self, block: int, stake_rao: float):
+        if block in self._block_set and stake_rao >= 0:
+            self._root_stakes[block] = stake_rao
+
+    async def _read_root_stake(self, block: int) -> float:
+        try:
+            result = await self.subtensor.query_subtensor("TotalHotkeyAlpha", block=block, params=[self.hotkey, 0])
+            stake_rao = float(getattr(result, "value", 0) or 0)
+            self.put_root_stake(block, stake_rao)
+            return stake_rao
+        finally:
+            del self._pending[block]
+
+    async def root_stake_rao(self, block: int) -> float:
+        if block in self._root_stakes:
+            self.hits += 1
+            return self._root_stakes[block]
+        if block in self._pending:
+            self.hits += 1
+        else:
+            self.reads["TotalHotkeyAlpha"] += 1
+            self._pending[block] = asyncio.ensure_future(self._read_root_stake(block))
+        return await asyncio.shield(self._pending[block])
+
+    async def root_stake_tao(self, block: int) -> float:
+        return await self.root_stake_rao(block) / RAO_PER_TAO
+
+    async def _resolve_tao_weights(self) -> Piecewise:
+        async def fetch(block: int) -> float:
+            self.reads["TaoWeight"] += 1
+            return await get_tao_weight(self.subtensor, block)
+
+        return await resolve_piecewise(fetch, self.blocks)
+
+    async def tao_weight(self, block: int) -> float:
+        if block not in self._block_set:
+            self.reads["TaoWeight"] += 1
+            return await get_tao_weight(self.subtensor, block)
+        if self._tao_weights is None or (self._tao_weights.done() and self._tao_weights.exception()):
+            self._tao_weights = asyncio.ensure_future(self._resolve_tao_weights())
+        else:
+            self.hits += 1
+        return (await asyncio.shield(self._tao_weights)).at(block)
+
+    def stats(self) -> str:
+        return (
+            f"{sum(self.reads.values())} reads for {len(self.blocks)} epoch blocks ("
+            + ", ".join(f"{name}: {count}" for name, count in self.reads.most_common())
+            + f"), {self.hits} reused"
+        )
+
+
+async def retrieve_and_calculate_hotkey_all_apy(
+    subtensor: AsyncSubtensor,
+    hotkey: str,
+    interval: str,
+    block: int,
+    progress,
+    batch_size: int = 100,
+    use_inherited_filer: bool = False,
+    no_filters: bool = False,
+    options: CalcOptions = DEFAULT_OPTIONS,
+    dividends_source=None,
+) -> Dict[int, Optional[ApyResult]]:
+    """
+    Root and subnet APY of a hotkey: {netuid: ApyResult}, root under 0. Subnets are the
+    ones where the hotkey has stake at `block`. A calculation that fails is reported and
+    left as None, the others still run.
+
+    Root runs first, then each subnet in netuid order, with the same options as the single
+    calculators (see retrieve_and_calculate_hotkey_root_apy and
+    retrieve_and_calculate_hotkey_subnet_apy).
+
+    `options.deadline` (seconds from the call) is split over the calculations: each one gets an
+    even share of the time left when it starts (so what an early one does not use goes to
+    the later ones) and returns a partial result when its share runs out; the ones not
+    started by the deadline are left as None.
+    """
+    interval_seconds = INTERVAL_SECONDS[interval]
+    actual_interval_blocks = int(interval_seconds / BLOCK_SECONDS)
+    budget = Deadline(options.deadline)
+
+    with options.diagnostics.phase("grid"):
+        subnets_info, staked = await budget.require(
+            asyncio.gather(
+                subtensor.get_all_subnets_info(block=block),
+                get_hotkey_netuids(subtensor, hotkey, block),
+            ),
+            "subnet discovery",
+        )
+        schedules = {
+            subnet.netuid: (block - subnet.blocks_since_epoch, subnet.tempo + 1)
+            for subnet in subnets_info
+        }
+        netuids = [netuid for netuid in staked if netuid in schedules]
+
+        epoch_blocks = []
+        for netuid in netuids:
+            _, make_events = await subnet_epoch_grid(
+                subtensor, netuid, block, actual_interval_blocks, batch_size, options.epoch_index, schedules[netuid]
+            )
+            epoch_blocks.extend(event_block for event_block, _, _ in make_events())
+    shared_values = SharedBlockValues(subtensor, hotkey, epoch_blocks)
+
+    progress.console.print(
+        f"\nHotkey has stake on {len(netuids)} subnets: " + (", ".join(map(str, netuids)) or "none")
+    )
+
+    results: Dict[int, Optional[ApyResult]] = {}
+    progress.console.print("\nCalculating root network APY")
+    try:
+        results[0] = await retrieve_and_calculate_hotkey_root_apy(
+            subtensor, hotkey, interval, block, progress,
+            batch_size=batch_size, no_filters=no_filters, subnets_info=subnets_info, shared_values=shared_values,
+            options=replace(options, deadline=budget.share(1 + len(netuids))),
+        )
+    except Exception as e:
+        progress.console.print(f"[yellow]Error calculating root APY: {str(e)}[/yellow]")
+        results[0] = None
+
+    for position, netuid in enumerate(netuids):
+        if budget.expired:
+            progress.console.print(f"[yellow]Deadline of {options.deadline}s reached, subnet {netuid} not calculated[/yellow]")
+            results[netuid] = None
+            continue
+        progress.console.print(f"\nCalculating APY for subnet {netuid}")
+        try:
+            results[netuid] = await retrieve_and_calculate_hotkey_subnet_apy(
+                subtensor, netuid, hotkey, interval, block, progress,
+                batch_size=batch_size, use_inherited_filer=use_inherited_filer, no_filters=no_filters,
+                schedule=schedules[netuid], shared_values=shared_values, dividends_source=dividends_source,
+                options=replace(options, deadline=budget.share(len(netuids) - position)),
+            )
+        except Exception as e:
+            progress.console.print(f"[yellow]Error calculating APY for subnet {netuid}: {str(e)}[/yellow]")
+            results[netuid] = None
+
+    progress.console.print(f"\nShared root stake and TaoWeight: {shared_values.stats()}")
+    return results
@@ -0,0 +1,165 @@
+"""
+JSON-RPC request batching in the websocket transport.
+
+Every storage read and runtime call (query_subtensor, get_subnet_price, state_queryStorageAt,
+...) goes through AsyncSubstrateInterface's Websocket, which sends each request as its own
+frame. BatchingWebsocket packs the requests waiting in its send queue into JSON-RPC batch
+arrays and splits batch responses back to the per-id futures the callers are awaiting, so
+the many concurrent reads of a fetch window cost a few frames instead of one each.
+
+Flush policy: a batch is sent when it holds `max_batch` requests, or when the queue stayed
+empty for `flush_interval` seconds after the last request was taken. With flush_interval 0
+only requests already queued are packed, which adds no latency.
+
+BatchingWebsocket overrides the private send and receive internals of the Websocket, so it
+is only installed for the async-substrate-interface versions in SUPPORTED_VERSIONS; with
+any other version install_batching() keeps the stock websocket.
+"""
+import asyncio
+import json
+import ssl
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional
+
+import websockets
+from async_substrate_interface.async_substrate import Websocket, raw_websocket_logger
+from websockets.exceptions import ConnectionClosed
+
+DEFAULT_MAX_BATCH = 50
+DEFAULT_FLUSH_INTERVAL = 0.001
+
+# async-substrate-interface (major, minor) versions whose Websocket internals
+# (_sending, _inflight, _received, _in_use_ids, _lock, _reset_activity_timer) match
+SUPPORTED_VERSIONS = {(1, 5)}
+
+
+class BatchingWebsocket(Websocket):
+    def __init__(
+        self,
+        *args,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.frames_sent = 0
+        self.requests_sent = 0
+        self.frames_received = 0
+        self.responses_received = 0
+
+    async def _next_batch(self) -> list:
+        batch = [await self._sending.get()]
+        self._sending.task_done()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.max_batch:
+            try:
+                item = self._sending.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._sending.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            self._sending.task_done()
+            batch.append(item)
+            deadline = loop.time() + self.flush_interval
+        return batch
+
+    async def _start_sending(self, ws) -> Exception:
+        batch = []
+        try:
+            while True:
+                batch = await self._next_batch()
+                async with self._lock:
+                    for item in batch:
+                        self._inflight[item["id"]] = json.dumps(item)
+                frame = json.dumps(batch if len(batch) > 1 else batch[0])
+                if self._log_raw_websockets:
+                    raw_websocket_logger.debug(f"WEBSOCKET_SEND> {frame}")
+                await ws.send(frame)
+                self.frames_sent += 1
+                self.requests_sent += len(batch)
+                await self._reset_activity_timer()
+        except Exception as e:
+            if isinstance(e, ssl.SSLError):
+                e = ConnectionClosed
+            if not isinstance(e, (asyncio.TimeoutError, TimeoutError, ConnectionClosed)):
+                for item in batch:
+                    future = self._received.get(item["id"])
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+            return e
+
+    async def _recv(self, recd: bytes) -> None:
+        self.frames_received += 1
+        if recd.lstrip()[:1] != b"[":
+            self.responses_received += 1
+            return await super()._recv(recd)
+
+        if self._log_raw_websockets:
+            raw_websocket_logger.debug(f"WEBSOCKET_RECEIVE> {recd.decode()}")
+
+        for response in json.loads(recd):
+            self.responses_received += 1
+            if "id" not in response:
+                raise KeyError(response)
+            async with self._lock:
+                self._inflight.pop(response["id"], None)
+            future = self._received.get(response["id"])
+            if future is not None and not future.done():
+                future.set_result(response)
+            self._in_use_ids.discard(response["id"])
+
+    def stats(self) -> str:
+        per_frame = self.requests_sent / self.frames_sent if self.frames_sent else 0.0
+        return f"{self.requests_sent} requests in {self.frames_sent} frames ({per_frame:.1f} per frame)"
+
+
+def supported_version() -> Optional[str]:
+    """Installed async-substrate-interface version if BatchingWebsocket supports it, else None."""
+    try:
+        installed = version("async-substrate-interface")
+    except PackageNotFoundError:
+        return None
+    try:
+        major, minor = (int(part) for part in installed.split(".")[:2])
+    except ValueError:
+        return None
+    return installed if (major, minor) in SUPPORTED_VERSIONS else None
+
+
+def install_batching(
+    subtensor,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    log=print,
+) -> Optional[BatchingWebsocket]:
+    """
+    Replace the websocket of a not yet connected AsyncSubtensor with a BatchingWebsocket.
+    With an unsupported async-substrate-interface version the stock websocket is kept and
+    None is returned.
+    """
+    substrate = subtensor.substrate
+    ws = substrate.ws
+    if ws.state in (websockets.protocol.State.CONNECTING, websockets.protocol.State.OPEN):
+        raise RuntimeError("install_batching() must be called before the connection is opened")
+    if supported_version() is None:
+        supported = ", ".join(f"{major}.{minor}.x" for major, minor in sorted(SUPPORTED_VERSIONS))
+        log(f"RPC batching disabled: async-substrate-interface {supported} required, using the stock websocket")
+        return None
+    substrate.ws = BatchingWebsocket(
+        ws.ws_url,
+        options=ws._options,
+        shutdown_timer=ws.shutdown_timer,
+        retry_timeout=ws.retry_timeout,
+        max_retries=ws._max_retries,
+        _log_raw_websockets=ws._log_raw_websockets,
+        max_batch=max_batch,
+        flush_interval=flush_interval,
+    )
+    return substrate.ws
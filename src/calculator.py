@@ -0,0 +1,236 @@
+"""
+Session API for embedding the calculators in a long-running service.
+
+An ApyCalculator owns one AsyncSubtensor connection (or uses the one passed in), a
+ReadCache of the reads at finalized blocks shared by all its calculations (see
+prefetch.py; installed on the subtensor until close()), an optional EpochIndex, and a limit on the calculations running at once. It is
+opened once and reused for any number of calls:
+
+    async with ApyCalculator("wss://archive.chain.opentensor.ai:443") as calculator:
+        result = await calculator.subnet_apy(37, hotkey, "7d")
+        results = await calculator.subnet_apy_bulk(37, hotkeys, "7d")
+
+Results are ApyResult objects (apy, dividends, period_yield, skipped, processed, total,
+coverage, take). Nothing is rendered: progress is reported to an optional callback
+on_progress(description, completed, total) and messages to the session's `log`.
+
+The bulk variants calculate several hotkeys at one block and share what does not depend
+on the hotkey: the subnet schedule, or the subnets of the root grid, is read once, and
+the subnet dividends of all hotkeys are read once per epoch (see dividends.py). A hotkey
+whose calculation fails is reported to `log` and left as None.
+
+With a `watchlist`, a Prefetcher runs while the session is open and warms the reads of
+every new epoch for the watched (netuid, hotkey) pairs.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bittensor import AsyncSubtensor
+
+from all_subnets import retrieve_and_calculate_hotkey_all_apy
+from batching import DEFAULT_FLUSH_INTERVAL, install_batching
+from dividends import EpochDividends
+from epoch_index import EpochIndex
+from options import CalcOptions
+from prefetch import DEFAULT_MAX_ENTRIES, DEFAULT_RATE, Prefetcher, ReadCache, install_read_cache, uninstall_read_cache
+from root_calc import retrieve_and_calculate_hotkey_root_apy
+from streaming import ApyResult
+from subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from utils.deadline import Deadline
+from utils.env import OTF_ARCHIVE_NODE
+from utils.progress import CallbackProgress
+
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+DEFAULT_MAX_CONCURRENT = 4
+
+
+class ApyCalculator:
+    """Reusable calculation session (see module docstring)."""
+
+    def __init__(
+        self,
+        node: str = OTF_ARCHIVE_NODE,
+        subtensor: Optional[AsyncSubtensor] = None,
+        batch_size: int = 100,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        no_filters: bool = False,
+        use_inherited_filter: bool = False,
+        raw_decode: bool = False,
+        epoch_index: Optional[EpochIndex] = None,
+        rpc_batch: int = 0,
+        rpc_batch_wait: float = DEFAULT_FLUSH_INTERVAL,
+        cache_size: int = DEFAULT_MAX_ENTRIES,
+        watchlist: Iterable[Tuple[int, str]] = (),
+        prefetch_rate: float = DEFAULT_RATE,
+        log: Optional[Callable[[str], None]] = None,
+    ):
+        self._owns_subtensor = subtensor is None
+        self.subtensor = AsyncSubtensor(node) if subtensor is None else subtensor
+        if self._owns_subtensor and rpc_batch > 1:
+            install_batching(self.subtensor, rpc_batch, rpc_batch_wait, log=log or (lambda msg: None))
+        self.cache = install_read_cache(self.subtensor, ReadCache(cache_size))
+        self.batch_size = batch_size
+        self.no_filters = no_filters
+        self.use_inherited_filter = use_inherited_filter
+        self.raw_decode = raw_decode
+        self.epoch_index = epoch_index
+        self.log = log
+        self._limit = asyncio.Semaphore(max_concurrent)
+        self.prefetcher = Prefetcher(
+            self.subtensor, self.cache, watchlist, prefetch_rate, log=log or (lambda msg: None)
+        )
+        self._prefetch_task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def open(self):
+        if self._owns_subtensor:
+            await self.subtensor.initialize()
+        if any(self.prefetcher.watchlist.values()):
+            self._prefetch_task = asyncio.ensure_future(self.prefetcher.run())
+
+    async def close(self):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            await asyncio.gather(self._prefetch_task, return_exceptions=True)
+            self._prefetch_task = None
+        uninstall_read_cache(self.subtensor, self.cache)
+        if self._owns_subtensor:
+            await self.subtensor.close()
+
+    def _log(self, msg: str):
+        if self.log is not None:
+            self.log(msg)
+
+    async def _prepare(self, block: Optional[int]) -> int:
+        """Current finalized head for the cache; the block to calculate at (head if None)."""
+        substrate = self.subtensor.substrate
+        finalized = await substrate.get_block_number(await substrate.get_chain_finalised_head())
+        self.cache.finalized = max(self.cache.finalized or 0, finalized)
+        return block if block is not None else await self.subtensor.block
+
+    def _options(self, deadline: Optional[float]) -> CalcOptions:
+        return CalcOptions(epoch_index=self.epoch_index, raw_decode=self.raw_decode, deadline=deadline)
+
+    # ------------------------ single calculations ------------------------
+    async def _subnet(
+        self, netuid, hotkey, interval, block, on_progress, budget: Deadline, schedule=None, dividends_source=None
+    ) -> ApyResult:
+        async with self._limit:
+            return await retrieve_and_calculate_hotkey_subnet_apy(
+                self.subtensor, netuid, hotkey, interval, block, CallbackProgress(on_progress, self.log),
+                batch_size=self.batch_size, use_inherited_filer=self.use_inherited_filter, no_filters=self.no_filters,
+                options=self._options(budget.remaining()), schedule=schedule, dividends_source=dividends_source,
+            )
+
+    async def _root(self, hotkey, interval, block, on_progress, budget: Deadline, subnets_info=None) -> ApyResult:
+        async with self._limit:
+            return await retrieve_and_calculate_hotkey_root_apy(
+                self.subtensor, hotkey, interval, block, CallbackProgress(on_progress, self.log),
+                batch_size=self.batch_size, no_filters=self.no_filters, options=self._options(budget.remaining()),
+                subnets_info=subnets_info,
+            )
+
+    async def subnet_apy(
+        self,
+        netuid: int,
+        hotkey: str,
+        interval: str,
+        block: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> ApyResult:
+        """Subnet APY of a hotkey (see subnet_calc.retrieve_and_calculate_hotkey_subnet_apy)."""
+        budget = Deadline(deadline)
+        block = await self._prepare(block)
+        return await self._subnet(netuid, hotkey, interval, block, on_progress, budget)
+
+    async def root_apy(
+        self,
+        hotkey: str,
+        interval: str,
+        block: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> ApyResult:
+        """Root APY of a hotkey (see root_calc.retrieve_and_calculate_hotkey_root_apy)."""
+        budget = Deadline(deadline)
+        block = await self._prepare(block)
+        return await self._root(hotkey, interval, block, on_progress, budget)
+
+    async def all_apy(
+        self,
+        hotkey: str,
+        interval: str,
+        block: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[int, Optional[ApyResult]]:
+        """Root and subnet APY of a hotkey (see all_subnets.retrieve_and_calculate_hotkey_all_apy)."""
+        block = await self._prepare(block)
+        async with self._limit:
+            return await retrieve_and_calculate_hotkey_all_apy(
+                self.subtensor, hotkey, interval, block, CallbackProgress(on_progress, self.log),
+                batch_size=self.batch_size, use_inherited_filer=self.use_inherited_filter, no_filters=self.no_filters,
+                options=self._options(deadline),
+            )
+
+    # ------------------------ bulk calculations ------------------------
+    async def _bulk(self, hotkeys: List[str], calculate) -> Dict[str, Optional[ApyResult]]:
+        async def run(hotkey: str):
+            try:
+                return await calculate(hotkey)
+            except Exception as e:
+                self._log(f"Error calculating APY for {hotkey}: {str(e)}")
+                return None
+
+        return dict(zip(hotkeys, await asyncio.gather(*[run(hotkey) for hotkey in hotkeys])))
+
+    async def subnet_apy_bulk(
+        self,
+        netuid: int,
+        hotkeys: Iterable[str],
+        interval: str,
+        block: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Optional[ApyResult]]:
+        """{hotkey: subnet APY} at one block, with the schedule and dividends read once for all."""
+        hotkeys = list(dict.fromkeys(hotkeys))
+        budget = Deadline(deadline)
+        block = await self._prepare(block)
+        schedule = None
+        if self.epoch_index is None:
+            subnet = await budget.require(self.subtensor.subnet(netuid, block), "grid build")
+            schedule = (subnet.last_step, subnet.tempo + 1)
+        dividends_source = EpochDividends(self.subtensor, consumers=len(hotkeys)) if len(hotkeys) > 1 else None
+        return await self._bulk(hotkeys, lambda hotkey: self._subnet(
+            netuid, hotkey, interval, block, on_progress, budget, schedule, dividends_source
+        ))
+
+    async def root_apy_bulk(
+        self,
+        hotkeys: Iterable[str],
+        interval: str,
+        block: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Optional[ApyResult]]:
+        """{hotkey: root APY} at one block, with the subnets of the grid read once for all."""
+        hotkeys = list(dict.fromkeys(hotkeys))
+        budget = Deadline(deadline)
+        block = await self._prepare(block)
+        subnets_info = await budget.require(self.subtensor.get_all_subnets_info(block=block), "grid build")
+        return await self._bulk(hotkeys, lambda hotkey: self._root(
+            hotkey, interval, block, on_progress, budget, subnets_info
+        ))
+
+    def stats(self) -> str:
+        return f"cache: {self.cache.stats()}"
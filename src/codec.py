@@ -0,0 +1,74 @@
+"""
+Native decoding of the fixed-width storage values read by the calculators.
+
+The generic SCALE decoder builds a ScaleType object per value and the callers wrap
+integers into Balance objects one at a time. The values we read are either plain
+little-endian integers (TotalHotkeyAlpha, AlphaDividendsPerSubnet, TaoWeight: u64)
+or I96F32 fixed-point numbers (RootClaimable: BTreeMap<u16, I96F32>), so they can be
+decoded straight from the raw storage bytes, and many at once with numpy.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+RAO_PER_TAO = 10**9
+U64_MAX = 2**64 - 1
+
+# I96F32 as two little-endian halves of the i128
+_I96F32 = np.dtype([("lo", "<u8"), ("hi", "<i8")])
+# BTreeMap<NetUid(u16), I96F32> entry
+_CLAIMABLE_ENTRY = np.dtype([("netuid", "<u2"), ("lo", "<u8"), ("hi", "<i8")])
+
+
+def decode_compact(data: bytes, offset: int = 0) -> Tuple[int, int]:
+    """Decode a SCALE compact integer. Returns (value, offset after it)."""
+    mode = data[offset] & 0b11
+    if mode == 0:
+        return data[offset] >> 2, offset + 1
+    if mode == 1:
+        return int.from_bytes(data[offset : offset + 2], "little") >> 2, offset + 2
+    if mode == 2:
+        return int.from_bytes(data[offset : offset + 4], "little") >> 2, offset + 4
+    length = (data[offset] >> 2) + 4
+    return int.from_bytes(data[offset + 1 : offset + 1 + length], "little"), offset + 1 + length
+
+
+def decode_u64(data: Optional[bytes]) -> int:
+    return int.from_bytes(data[:8], "little") if data else 0
+
+
+def decode_u64_batch(values: Iterable[Optional[bytes]]) -> np.ndarray:
+    """Decode many u64 values at once; missing values decode to 0."""
+    return np.frombuffer(b"".join(v[:8] if v else bytes(8) for v in values), dtype="<u8")
+
+
+def rao_to_tao_batch(rao: np.ndarray) -> np.ndarray:
+    """Vectorized Balance.from_rao(x).tao."""
+    return rao.astype(np.float64) / RAO_PER_TAO
+
+
+def _i96f32_to_float(lo, hi):
+    # Same arithmetic as bittensor's fixed_to_float(bits, frac_bits=32, total_bits=128),
+    # which takes the integer part from bits >> 96 and the fraction from the low 32 bits.
+    return (hi >> 32) + (lo & 0xFFFFFFFF) / 2**32
+
+
+def decode_i96f32(data: bytes) -> float:
+    bits = int.from_bytes(data[:16], "little", signed=True)
+    return (bits >> 96) + (bits & 0xFFFFFFFF) / 2**32
+
+
+def decode_i96f32_batch(values: Iterable[bytes]) -> np.ndarray:
+    """Decode many I96F32 values at once."""
+    raw = np.frombuffer(b"".join(v[:16] for v in values), dtype=_I96F32)
+    return _i96f32_to_float(raw["lo"].astype(np.int64), raw["hi"]).astype(np.float64)
+
+
+def decode_root_claimable(data: Optional[bytes]) -> Dict[int, float]:
+    """Decode a RootClaimable value (BTreeMap<NetUid, I96F32>) to {netuid: α/TAO}."""
+    if not data:
+        return {}
+    count, offset = decode_compact(data)
+    entries = np.frombuffer(data, dtype=_CLAIMABLE_ENTRY, count=count, offset=offset)
+    rates = _i96f32_to_float(entries["lo"].astype(np.int64), entries["hi"])
+    return dict(zip(entries["netuid"].tolist(), rates.tolist()))
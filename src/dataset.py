@@ -0,0 +1,207 @@
+"""
+Columnar export of the per-epoch inputs of the calculators.
+
+A run with EXPORT_DIR writes one partition per (netuid, hotkey, interval, block):
+
+    <export_dir>/netuid=<netuid>/hotkey=<hotkey>/interval=<interval>/block=<block>/
+        meta.json        window and calculation parameters (written last)
+        <column>.npy     one numpy array per input series, in event order
+
+Columns are written through numpy memory maps as the results arrive, and read back
+memory-mapped, so APY can be recomputed under other filters without touching the
+node and without loading whole series into memory.
+"""
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from filter import MIN_ALPHA_STAKE, MIN_COMBINED_STAKE
+from streaming import ApyResult, RootApyStream, SubnetApyStream
+
+# Inputs of RootApyStream (claimable: α/TAO of the event's netuid, stake: rao, price: TAO/α)
+ROOT_COLUMNS = {
+    "block": "<i8",
+    "netuid": "<u2",
+    "claimable": "<f8",
+    "stake": "<f8",
+    "price": "<f8",
+}
+
+# Inputs of SubnetApyStream; rows of failed queries have failed=True
+SUBNET_COLUMNS = {
+    "block": "<i8",
+    "failed": "?",
+    "tao_weight_param": "<f8",
+    "alpha_div_raw": "<f8",
+    "root_stake_tao": "<f8",
+    "subnet_alpha_stake": "<f8",
+    "inh_root_stake": "<f8",
+    "inh_subnet_stake": "<f8",
+}
+
+# Rows read from the memory maps at a time
+READ_CHUNK = 65536
+
+
+def partition_path(export_dir: str, netuid: int, hotkey: str, interval: str, block: int) -> str:
+    return os.path.join(
+        export_dir, f"netuid={netuid}", f"hotkey={hotkey}", f"interval={interval}", f"block={block}"
+    )
+
+
+class DatasetWriter:
+    """Writes the series of one partition row by row into memory-mapped .npy files."""
+
+    def __init__(self, path: str, columns: Dict[str, str], size: int, meta: dict, root: Optional[str] = None):
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self.path = path
+        # Export directory the partition path is under; discard() removes the directories left empty below it
+        self.root = root
+        self.meta = dict(meta, size=size, columns=columns)
+        self.columns = {
+            name: open_memmap(os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype, shape=(size,))
+            for name, dtype in columns.items()
+        }
+
+    def write(self, idx: int, row: dict):
+        for name, value in row.items():
+            self.columns[name][idx] = value
+
+    def discard(self):
+        """Delete the columns of a partition that will not be completed."""
+        self.columns = {}
+        for name in self.meta["columns"]:
+            path = os.path.join(self.path, f"{name}.npy")
+            if os.path.exists(path):
+                os.remove(path)
+        path = os.path.normpath(self.path)
+        root = os.path.normpath(self.root) if self.root is not None else os.path.dirname(path)
+        while path.startswith(root + os.sep):
+            try:
+                os.rmdir(path)
+            except OSError:
+                break
+            path = os.path.dirname(path)
+
+    def close(self):
+        for column in self.columns.values():
+            column.flush()
+        self.columns = {}
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+
+def root_writer(export_dir, hotkey, interval, block, size, actual_interval_seconds, baseline_claimable_alpha):
+    return DatasetWriter(
+        partition_path(export_dir, 0, hotkey, interval, block),
+        ROOT_COLUMNS,
+        size,
+        {
+            "netuid": 0,
+            "hotkey": hotkey,
+            "interval": interval,
+            "block": block,
+            "actual_interval_seconds": actual_interval_seconds,
+            "baseline_claimable_alpha": {str(k): v for k, v in baseline_claimable_alpha.items()},
+        },
+        root=export_dir,
+    )
+
+
+def subnet_writer(export_dir, netuid, hotkey, interval, block, size, actual_interval_seconds):
+    return DatasetWriter(
+        partition_path(export_dir, netuid, hotkey, interval, block),
+        SUBNET_COLUMNS,
+        size,
+        {
+            "netuid": netuid,
+            "hotkey": hotkey,
+            "interval": interval,
+            "block": block,
+            "actual_interval_seconds": actual_interval_seconds,
+        },
+        root=export_dir,
+    )
+
+
+def subnet_row(block: int, data) -> dict:
+    if data == -1:
+        return {"block": block, "failed": True}
+    return {"block": block, "failed": False, **{name: data[name] for name in SUBNET_COLUMNS if name in data and name != "block"}}
+
+
+class Dataset:
+    """A partition opened read-only; columns are memory-mapped numpy arrays."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in self.meta["columns"]
+        }
+
+    @property
+    def netuid(self) -> int:
+        return self.meta["netuid"]
+
+    def __len__(self) -> int:
+        return self.meta["size"]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def chunks(self, names: List[str]) -> Iterator[List[list]]:
+        """The columns `names` as lists of at most READ_CHUNK rows at a time, in event order."""
+        for start in range(0, len(self), READ_CHUNK):
+            yield [self[name][start : start + READ_CHUNK].tolist() for name in names]
+
+    def root_rows(self) -> Iterator[Tuple[int, float, float, float]]:
+        """RootApyStream inputs, in event order."""
+        for columns in self.chunks(["netuid", "claimable", "stake", "price"]):
+            yield from zip(*columns)
+
+    def subnet_rows(self) -> Iterator:
+        """SubnetApyStream inputs (dict or -1), in event order."""
+        names = [name for name in SUBNET_COLUMNS if name not in ("block", "failed")]
+        for failed, *values in self.chunks(["failed"] + names):
+            for idx, row_failed in enumerate(failed):
+                yield -1 if row_failed else {name: column[idx] for name, column in zip(names, values)}
+
+
+def iter_datasets(export_dir: str, netuid: Optional[int] = None) -> Iterator[Dataset]:
+    """All complete partitions under export_dir, optionally of one netuid."""
+    for dirpath, _, filenames in os.walk(export_dir):
+        if "meta.json" not in filenames:
+            continue
+        dataset = Dataset(dirpath)
+        if netuid is None or dataset.netuid == netuid:
+            yield dataset
+
+
+def calculate_from_dataset(
+    dataset: Dataset,
+    no_filters: bool = False,
+    min_alpha_stake: float = MIN_ALPHA_STAKE,
+    min_combined_stake: float = MIN_COMBINED_STAKE,
+) -> ApyResult:
+    """Recompute APY of an exported partition, e.g. under other filter thresholds."""
+    actual_interval_seconds = dataset.meta["actual_interval_seconds"]
+    if dataset.netuid == 0:
+        baseline = {int(k): v for k, v in dataset.meta["baseline_claimable_alpha"].items()}
+        stream = RootApyStream(baseline, len(dataset), actual_interval_seconds, no_filters, min_combined_stake)
+        rows = dataset.root_rows()
+    else:
+        stream = SubnetApyStream(len(dataset), actual_interval_seconds, no_filters, min_alpha_stake, min_combined_stake)
+        rows = dataset.subnet_rows()
+
+    for idx, data in enumerate(rows):
+        stream.feed(idx, data)
+    return stream.result()
@@ -0,0 +1,175 @@
+"""
+Per-epoch dividends of every hotkey of a subnet, read once per epoch block.
+
+The subnet calculator reads AlphaDividendsPerSubnet[netuid, hotkey] once per hotkey and
+epoch. An EpochDividends source instead reads the dividends of all hotkeys of the subnet
+at an epoch block once and serves every hotkey calculated with it, so the number of
+dividend queries of a run over many hotkeys does not grow with the number of hotkeys:
+
+    map                   one AlphaDividendsPerSubnet[netuid, *] prefix query per epoch
+    events:<Pallet.Event>[:<hotkey>,<netuid>,<amount>]
+                          the System.Events of the epoch block, decoded once for all
+                          netuids; the entries of the named event, with the fields given
+                          as attribute names or positions (default 0,1,2)
+
+The epoch code of the current Subtensor runtime writes AlphaDividendsPerSubnet and emits
+no per-hotkey dividend event, so `map` is what works on mainnet; `events` is for runtimes
+that emit one, and its spec names the event instead of guessing it.
+
+With `check`, every value served is compared with the per-hotkey storage read and the
+storage value is returned; mismatches are counted and the first ones kept for the report.
+
+The reads are kept while they can still be served: with `consumers`, the number of hotkeys
+calculated with the source, an epoch is dropped once each of them got it, and at most
+`max_entries` epochs are kept in any case (the oldest completed read is dropped first).
+"""
+import asyncio
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from bittensor.core.chain_data import decode_account_id
+
+from codec import RAO_PER_TAO
+from helpers import get_divs_for_hotkey_on_subnet, query_map_values
+
+SOURCES = ("map", "events")
+DEFAULT_EVENT_FIELDS = ("0", "1", "2")
+MAX_MISMATCHES = 20
+MAX_EPOCHS = 1024
+
+
+def parse_source(spec: str) -> Tuple[str, str, str, Tuple[str, ...]]:
+    """'map' or 'events:<Pallet>.<Event>[:<hotkey>,<netuid>,<amount>]' -> (kind, pallet, event, fields)."""
+    kind, _, rest = spec.partition(":")
+    if kind == "map" and not rest:
+        return kind, "", "", ()
+    if kind == "events" and rest:
+        name, _, fields = rest.partition(":")
+        pallet, _, event = name.partition(".")
+        fields = tuple(fields.split(",")) if fields else DEFAULT_EVENT_FIELDS
+        if pallet and event and len(fields) == 3:
+            return kind, pallet, event, fields
+    raise ValueError(
+        f"Invalid dividends source '{spec}'. Use 'map' or 'events:<Pallet>.<Event>[:<hotkey>,<netuid>,<amount>]'"
+    )
+
+
+def _attribute(attributes, field: str):
+    if isinstance(attributes, dict):
+        return attributes[field]
+    return attributes[int(field)]
+
+
+def _ss58(hotkey) -> str:
+    return hotkey if isinstance(hotkey, str) else decode_account_id(hotkey)
+
+
+class EpochDividends:
+    """Dividends {hotkey: alpha} of a subnet at an epoch block, read once per block (see module docstring)."""
+
+    def __init__(
+        self,
+        subtensor,
+        spec: str = "map",
+        check: bool = False,
+        consumers: Optional[int] = None,
+        max_entries: int = MAX_EPOCHS,
+    ):
+        self.subtensor = subtensor
+        self.spec = spec
+        self.kind, self.pallet, self.event, self.fields = parse_source(spec)
+        self.check = check
+        self.consumers = consumers
+        self.max_entries = max_entries
+        self._epochs: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._blocks: Dict[int, asyncio.Future] = {}
+        # Number of times each cached read was served, for dropping it after `consumers`
+        self._served = Counter()
+        self.reads = Counter()
+        self.hits = 0
+        self.checked = 0
+        self.mismatch_count = 0
+        self.mismatches: List[Tuple[int, int, str, float, float]] = []
+
+    async def _read_map(self, netuid: int, block: int) -> Dict[str, float]:
+        self.reads["AlphaDividendsPerSubnet map"] += 1
+        values = await query_map_values(self.subtensor, "AlphaDividendsPerSubnet", block, [netuid])
+        return {hotkey: int(value) / RAO_PER_TAO for hotkey, value in values.items() if value}
+
+    async def _read_events(self, block: int) -> Dict[int, Dict[str, float]]:
+        self.reads["System.Events"] += 1
+        substrate = self.subtensor.substrate
+        events = await substrate.get_events(await substrate.get_block_hash(block))
+        dividends = defaultdict(lambda: defaultdict(float))
+        for record in events:
+            record = getattr(record, "value", record)
+            event = record.get("event") or {}
+            if event.get("module_id") != self.pallet or event.get("event_id") != self.event:
+                continue
+            hotkey, netuid, amount = (_attribute(event.get("attributes"), field) for field in self.fields)
+            dividends[int(netuid)][_ss58(hotkey)] += int(amount) / RAO_PER_TAO
+        return {netuid: dict(divs) for netuid, divs in dividends.items()}
+
+    def _evict(self, cache: dict):
+        for key in [key for key, future in cache.items() if future.done()][:len(cache) - self.max_entries]:
+            del cache[key]
+            self._served.pop(key, None)
+
+    async def _shared(self, cache: dict, key, read):
+        if key in cache and not (cache[key].done() and cache[key].exception()):
+            self.hits += 1
+        else:
+            cache[key] = asyncio.ensure_future(read())
+            self._served.pop(key, None)
+        future = cache[key]
+        value = await asyncio.shield(future)
+        if cache.get(key) is future:
+            self._served[key] += 1
+            if self.consumers is not None and self._served[key] >= self.consumers:
+                del cache[key]
+                del self._served[key]
+        if len(cache) > self.max_entries:
+            self._evict(cache)
+        return value
+
+    async def dividends(self, netuid: int, block: int) -> Dict[str, float]:
+        """{hotkey: alpha} of every hotkey with dividends on netuid at the epoch block."""
+        if self.kind == "map":
+            return await self._shared(self._epochs, (netuid, block), lambda: self._read_map(netuid, block))
+        return (await self._shared(self._blocks, block, lambda: self._read_events(block))).get(netuid, {})
+
+    def __len__(self) -> int:
+        return len(self._epochs) + len(self._blocks)
+
+    async def get(self, hotkey: str, netuid: int, block: int) -> float:
+        """Dividends of hotkey (alpha), the value of get_divs_for_hotkey_on_subnet()."""
+        value = (await self.dividends(netuid, block)).get(hotkey, 0.0)
+        if not self.check:
+            return value
+
+        self.reads["AlphaDividendsPerSubnet"] += 1
+        stored = await get_divs_for_hotkey_on_subnet(self.subtensor, hotkey, netuid, block)
+        self.checked += 1
+        if not math.isclose(value, stored, rel_tol=1e-12, abs_tol=1e-12):
+            self.mismatch_count += 1
+            if len(self.mismatches) < MAX_MISMATCHES:
+                self.mismatches.append((netuid, block, hotkey, value, stored))
+        return stored
+
+    def stats(self) -> str:
+        text = (
+            f"{self.spec}: {sum(self.reads.values())} reads ("
+            + ", ".join(f"{name}: {count}" for name, count in self.reads.most_common())
+            + f"), {self.hits} reused"
+        )
+        if self.check:
+            text += f", {self.mismatch_count}/{self.checked} mismatches against storage"
+        return text
+
+    def report(self, console):
+        console.print(f"Dividends source {self.stats()}")
+        for netuid, block, hotkey, value, stored in self.mismatches:
+            console.print(
+                f"[yellow]  netuid {netuid} block {block} {hotkey}: {self.kind} {value:.9f} != storage {stored:.9f}[/yellow]"
+            )
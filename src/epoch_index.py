@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import json
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from helpers import query_subtensor
+
+
+class _SubnetEpochs:
+    """Known epoch blocks of one netuid; complete for blocks in [covered_from, covered_to]."""
+
+    __slots__ = ("registered_at", "covered_from", "covered_to", "epochs")
+
+    def __init__(self, registered_at: int, covered_from: int, covered_to: int, epochs: Iterable[int] = ()):
+        self.registered_at = registered_at
+        self.covered_from = covered_from
+        self.covered_to = covered_to
+        self.epochs = array("q", sorted(epochs))
+
+    def covers(self, start_block: int, end_block: int) -> bool:
+        return self.covered_from <= max(start_block, self.registered_at) and end_block <= self.covered_to
+
+    def add(self, epochs: Iterable[int]):
+        self.epochs = array("q", sorted(set(self.epochs).union(epochs)))
+
+
+class EpochIndex:
+    """
+    Persisted index of actual epoch blocks per netuid.
+
+    The arithmetic grid `last_step - k*(tempo+1)` is only right while tempo stays the
+    same and the subnet exists for the whole window. The index instead walks the chain
+    backwards with `BlocksSinceLastStep` (one read per epoch), so every recorded block is
+    an epoch that really happened. It is built once, stored as JSON, and afterwards only
+    the blocks outside the covered range are walked. Event generation is then a local
+    lookup.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.subnets: Dict[int, _SubnetEpochs] = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    # ------------------------ persistence ------------------------
+    def load(self):
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != self.VERSION:
+            return
+        self.subnets = {
+            int(netuid): _SubnetEpochs(
+                entry["registered_at"], entry["covered_from"], entry["covered_to"], entry["epochs"]
+            )
+            for netuid, entry in data["netuids"].items()
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            "version": self.VERSION,
+            "netuids": {
+                str(netuid): {
+                    "registered_at": entry.registered_at,
+                    "covered_from": entry.covered_from,
+                    "covered_to": entry.covered_to,
+                    "epochs": list(entry.epochs),
+                }
+                for netuid, entry in sorted(self.subnets.items())
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    # ------------------------ building ------------------------
+    async def update(
+        self,
+        subtensor,
+        netuids: Iterable[int],
+        start_block: int,
+        end_block: int,
+        batch_size: int = 100,
+    ):
+        """
+        Make sure the index covers [start_block, end_block] for `netuids`,
+        walking only the missing ranges, then persist it. A netuid that is not registered
+        at end_block, or a read that returns nothing, raises instead of being recorded.
+        """
+        semaphore = asyncio.Semaphore(batch_size)
+
+        async def read(name: str, block: int, params: List) -> int:
+            async with semaphore:
+                value = await query_subtensor(subtensor, name, block, params)
+            if value is None:
+                raise ValueError(f"No {name} for netuid {params[0]} at block {block}")
+            return int(value)
+
+        async def walk(netuid: int, from_block: int, down_to: int) -> Tuple[List[int], int]:
+            """Epoch blocks in [down_to, from_block] and the lowest block they are complete from."""
+            epochs = []
+            at_block = from_block
+            while at_block >= down_to:
+                epoch = at_block - await read("BlocksSinceLastStep", at_block, [netuid])
+                epochs.append(epoch)
+                at_block = epoch - 1
+            return epochs, at_block + 1
+
+        async def update_subnet(netuid: int):
+            if not await read("NetworksAdded", end_block, [netuid]):
+                raise KeyError(f"Netuid {netuid} is not registered at block {end_block}")
+            registered_at = await read("NetworkRegisteredAt", end_block, [netuid])
+            entry = self.subnets.get(netuid)
+            if entry is None or entry.registered_at != registered_at:
+                entry = _SubnetEpochs(registered_at, end_block + 1, end_block)
+                self.subnets[netuid] = entry
+            if entry.covers(start_block, end_block):
+                return
+
+            lowest = max(start_block, registered_at)
+            if end_block > entry.covered_to:
+                epochs, _ = await walk(netuid, end_block, entry.covered_to + 1)
+                entry.add(epochs)
+                entry.covered_to = end_block
+            if lowest < entry.covered_from:
+                epochs, covered_from = await walk(netuid, entry.covered_from - 1, lowest)
+                entry.add(epochs)
+                entry.covered_from = max(min(covered_from, lowest), registered_at)
+
+        await asyncio.gather(*[update_subnet(netuid) for netuid in netuids])
+        self.save()
+
+    # ------------------------ lookups ------------------------
+    def epochs(self, netuid: int, start_block: int, end_block: int) -> array:
+        """Epoch blocks of netuid in [start_block, end_block]."""
+        entry = self.subnets.get(netuid)
+        if entry is None:
+            return array("q")
+        if not entry.covers(start_block, end_block):
+            raise KeyError(f"Epoch index does not cover netuid {netuid} for blocks {start_block}..{end_block}")
+        return entry.epochs[bisect_left(entry.epochs, start_block) : bisect_right(entry.epochs, end_block)]
+
+    def last_epochs(self, netuid: int, end_block: int, count: int) -> array:
+        """The last `count` known epoch blocks of netuid at or before end_block."""
+        entry = self.subnets.get(netuid)
+        if entry is None:
+            return array("q")
+        stop = bisect_right(entry.epochs, end_block)
+        return entry.epochs[max(stop - count, 0) : stop]
+
+    def iter_events(
+        self, netuids: Iterable[int], start_block: int, end_block: int
+    ) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (block, netuid, period) events in chronological order, like
+        events.iter_epoch_events(). period is the distance to the preceding epoch.
+        """
+        def subnet_events(netuid: int):
+            entry = self.subnets[netuid]
+            epochs = self.epochs(netuid, start_block, end_block)
+            first = bisect_left(entry.epochs, start_block)
+            prev = entry.epochs[first - 1] if first > 0 else None
+            for epoch in epochs:
+                yield epoch, netuid, (epoch - prev) if prev is not None else 0
+                prev = epoch
+
+        return heapq.merge(*[subnet_events(netuid) for netuid in netuids if netuid in self.subnets])
+
+    def count_events(self, netuids: Iterable[int], start_block: int, end_block: int) -> int:
+        return sum(len(self.epochs(netuid, start_block, end_block)) for netuid in netuids)
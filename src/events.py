@@ -0,0 +1,37 @@
+import heapq
+from typing import Iterable, Iterator, Tuple
+
+# Sentinels stored in the float columns.
+# FAILED marks a query that could not be completed (the old `-1` markers),
+# MISSING marks a RootClaimable response that has no entry for the event's netuid.
+FAILED = -1.0
+MISSING = float("nan")
+
+
+def iter_epoch_events(
+    schedules: Iterable[Tuple[int, int, int]], start_block: int
+) -> Iterator[Tuple[int, int, int]]:
+    """
+    Lazily yield (block, netuid, period) epoch boundary events in chronological order.
+
+    Args:
+        schedules: (netuid, last_epoch_block, period) per subnet
+        start_block: First block of the window (inclusive)
+    """
+    def subnet_events(netuid: int, last_epoch_block: int, period: int):
+        if last_epoch_block < start_block:
+            return
+        first = last_epoch_block - (last_epoch_block - start_block) // period * period
+        for epoch in range(first, last_epoch_block + 1, period):
+            yield epoch, netuid, period
+
+    return heapq.merge(*[subnet_events(*schedule) for schedule in schedules])
+
+
+def count_epoch_events(schedules: Iterable[Tuple[int, int, int]], start_block: int) -> int:
+    """Number of events iter_epoch_events() yields for the same arguments."""
+    return sum(
+        (last_epoch_block - start_block) // period + 1
+        for _, last_epoch_block, period in schedules
+        if last_epoch_block >= start_block
+    )
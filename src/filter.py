@@ -1,11 +1,24 @@
-def has_enough_stake(root_stake, alpha_stake, inh_root_stake, inh_alpha_stake, tao_weight):
-    if alpha_stake < 10:
+# Default thresholds of the stake filter
+MIN_ALPHA_STAKE = 10
+MIN_COMBINED_STAKE = 4000
+
+
+def has_enough_stake(
+    root_stake,
+    alpha_stake,
+    inh_root_stake,
+    inh_alpha_stake,
+    tao_weight,
+    min_alpha_stake=MIN_ALPHA_STAKE,
+    min_combined_stake=MIN_COMBINED_STAKE,
+):
+    if alpha_stake < min_alpha_stake:
         return False
 
     combined_stake = root_stake * tao_weight + alpha_stake
     inh_combined_stake = inh_root_stake * tao_weight + inh_alpha_stake
     
-    if combined_stake < 4000 and inh_combined_stake < 4000:
+    if combined_stake < min_combined_stake and inh_combined_stake < min_combined_stake:
         return False
     
     return True
@@ -1,12 +1,73 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
 from bittensor import Balance
 from bittensor.core.chain_data import decode_account_id
 from bittensor.utils import U64_MAX
 from bittensor.utils.balance import fixed_to_float
 
+from codec import RAO_PER_TAO, decode_root_claimable, decode_u64
+
 async def query_subtensor(subtensor, name, block, params=[]):
     res = await subtensor.query_subtensor(name=name, params=params, block=block)
     return getattr(res, "value", None)
 
+# (runtime version, name, params) -> (storage key hex, default value bytes or None)
+_storage_keys = {}
+
+async def get_storage_key(subtensor, name, params, runtime_version, block_hash=None):
+    """
+    Storage key and default value of a SubtensorModule item in the runtime of block_hash
+    (version `runtime_version`); computed once per (runtime version, name, params).
+    """
+    cache_key = (runtime_version, name, tuple(params))
+    if cache_key not in _storage_keys:
+        storage_key = await subtensor.substrate.create_storage_key(
+            "SubtensorModule", name, params, block_hash=block_hash
+        )
+        default = None
+        storage_function = storage_key.metadata_storage_function
+        if storage_function.value["modifier"] == "Default":
+            default = storage_function.value_object["default"].value_object
+            if isinstance(default, str):
+                default = bytes.fromhex(default[2:] if default.startswith("0x") else default)
+        _storage_keys[cache_key] = (storage_key.to_hex(), default)
+    return _storage_keys[cache_key]
+
+async def query_subtensor_raw(subtensor, queries, block):
+    """
+    Read several SubtensorModule items at one block with a single state_queryStorageAt
+    call and return their raw SCALE bytes (the storage default for absent keys), without
+    decoding. Decode with the helpers in codec.py.
+
+    Args:
+        queries: list of (name, params)
+    """
+    block_hash = await subtensor.substrate.get_block_hash(block)
+    runtime = await subtensor.substrate.init_runtime(block_hash=block_hash)
+    keys = await asyncio.gather(*[
+        get_storage_key(subtensor, name, params, runtime.runtime_version, block_hash) for name, params in queries
+    ])
+    response = await subtensor.substrate.rpc_request(
+        "state_queryStorageAt", [[key for key, _ in keys], block_hash]
+    )
+    changes = {key: data for group in response["result"] for key, data in group["changes"]}
+    return [
+        bytes.fromhex(changes[key][2:]) if changes.get(key) else default
+        for key, default in keys
+    ]
+
+async def query_map_values(subtensor, name, block, params=None):
+    """{key: value} of a SubtensorModule map (under the prefix `params`) at block; account keys as ss58."""
+    result = await subtensor.query_map_subtensor(name, params=params, block=block)
+    values = {}
+    async for key, value in result:
+        key = getattr(key, "value", key)
+        if isinstance(key, (tuple, list)):
+            key = decode_account_id(key)
+        values[key] = getattr(value, "value", value)
+    return values
+
 async def get_children(subtensor, hotkey, netuid, block):
     resp = await query_subtensor(subtensor, "ChildKeys", block, [hotkey, netuid]) or []
     return [(float(p) / float(U64_MAX), decode_account_id(ch[0])) for p, ch in resp]
@@ -28,11 +89,60 @@ async def get_total_stake(subtensor, hotkey, block=None):
     val = getattr(resp, "value", 0)
     return Balance.from_rao(val).tao
 
+async def get_hotkey_netuids(subtensor, hotkey, block):
+    """Netuids (root excluded) with a non-zero TotalHotkeyAlpha[hotkey, netuid] at block, from one map query."""
+    result = await subtensor.query_map_subtensor("TotalHotkeyAlpha", params=[hotkey], block=block)
+    netuids = []
+    async for netuid, stake in result:
+        netuid = int(getattr(netuid, "value", netuid))
+        if netuid != 0 and getattr(stake, "value", stake):
+            netuids.append(netuid)
+    return sorted(netuids)
+
 async def get_tao_weight(subtensor, block):
     resp = await subtensor.query_subtensor(name="TaoWeight", block=block, params=[])
     raw = getattr(resp, "value", 0)
     return raw / (2**64 - 1)
 
+def subnet_epoch_queries(hotkey, netuid):
+    """Per-epoch values of the subnet calculator: field -> (storage item, params, scale of the u64)."""
+    return {
+        "alpha_div_raw": ("AlphaDividendsPerSubnet", [netuid, hotkey], RAO_PER_TAO),
+        "subnet_alpha_stake": ("TotalHotkeyAlpha", [hotkey, netuid], RAO_PER_TAO),
+        "root_stake_tao": ("TotalHotkeyAlpha", [hotkey, 0], RAO_PER_TAO),
+        "tao_weight_param": ("TaoWeight", [], U64_MAX),
+    }
+
+async def get_subnet_epoch_values(subtensor, hotkey, netuid, block, fields, raw_decode=False):
+    """
+    Values of `fields` (keys of subnet_epoch_queries) at block, i.e. the values of
+    get_divs_for_hotkey_on_subnet, get_stake_for_hotkey_on_subnet (netuid and root) and
+    get_tao_weight. With `raw_decode` they are read in one call and decoded from raw bytes.
+    """
+    queries = subnet_epoch_queries(hotkey, netuid)
+    if raw_decode:
+        raw = await query_subtensor_raw(subtensor, [queries[f][:2] for f in fields], block)
+        return {f: decode_u64(value) / queries[f][2] for f, value in zip(fields, raw)}
+
+    getters = {
+        "alpha_div_raw": lambda: get_divs_for_hotkey_on_subnet(subtensor, hotkey, netuid, block),
+        "subnet_alpha_stake": lambda: get_stake_for_hotkey_on_subnet(subtensor, hotkey, netuid, block),
+        "root_stake_tao": lambda: get_stake_for_hotkey_on_subnet(subtensor, hotkey, 0, block),
+        "tao_weight_param": lambda: get_tao_weight(subtensor, block),
+    }
+    values = await asyncio.gather(*[getters[f]() for f in fields])
+    return dict(zip(fields, values))
+
+async def get_root_block_values_raw(subtensor, hotkey, block):
+    """
+    (root claimable {netuid: α/TAO} or None, root stake in rao) at block, i.e. the values of
+    get_root_claimable_entries and TotalHotkeyAlpha[hotkey, 0], read in one call.
+    """
+    claimable, stake = await query_subtensor_raw(
+        subtensor, [("RootClaimable", [hotkey]), ("TotalHotkeyAlpha", [hotkey, 0])], block
+    )
+    return decode_root_claimable(claimable) or None, float(decode_u64(stake))
+
 async def get_childkey_take(subtensor, hotkey, netuid, block):
     r = await subtensor.query_subtensor(name='ChildkeyTake', params=[hotkey, netuid], block=block)
     return getattr(r, "value", 0)
@@ -62,33 +172,81 @@ async def get_root_claimable_entries(subtensor, hotkey, block):
         result = await subtensor.query_subtensor("RootClaimable", block=block, params=[hotkey])
         if not result or not result.value:
             return None
-        
-        # Extract tuple list: [((netuid1, {'bits': val1}), (netuid2, {'bits': val2}), ...)]
-        # Reference: bittensor/core/async_subtensor.py:3189
-        bits_list = next(iter(result.value))
-        
-        
-        claimable_dict = {}
-        for netuid, bits_data in bits_list:
-            claimable_dict[netuid] = claimable_float(bits_data)
-        
-        return claimable_dict
+        return parse_root_claimable(result.value)
     except Exception:
         return None
 
+def parse_root_claimable(value) -> dict:
+    """Decoded RootClaimable value -> {netuid: α/TAO}."""
+    # Extract tuple list: [((netuid1, {'bits': val1}), (netuid2, {'bits': val2}), ...)]
+    # Reference: bittensor/core/async_subtensor.py:3189
+    bits_list = next(iter(value))
+
+    claimable_dict = {}
+    for netuid, bits_data in bits_list:
+        claimable_dict[netuid] = claimable_float(bits_data)
+
+    return claimable_dict
+
 # Convert I96F32 fixed-point to float, then to rao
 # Reference: bittensor/utils/balance.py:376-391 (fixed_to_float)
 # I96F32 = 96 integer bits + 32 fractional bits
 def claimable_float(bits_data) -> float:
     return fixed_to_float(bits_data, frac_bits=32, total_bits=128)
 
-async def calc_inherited_on_subnet(subtensor, stake, netuid, parents, children, block):
-    alpha_to_children = sum(stake * frac for frac, _ in children)
-
+async def calc_alpha_from_parents(subtensor, netuid, parents, block):
     alpha_from_parents = 0
     for parent in parents:
         frac, parent_hotkey = parent[0], parent[1]
         parent_stake = await get_stake_for_hotkey_on_subnet(subtensor, parent_hotkey, netuid, block)
         alpha_from_parents += frac * parent_stake
+    return alpha_from_parents
+
+async def calc_inherited_on_subnet(subtensor, stake, netuid, parents, children, block):
+    alpha_to_children = sum(stake * frac for frac, _ in children)
+    alpha_from_parents = await calc_alpha_from_parents(subtensor, netuid, parents, block)
     
-    return stake - int(alpha_to_children) + int(alpha_from_parents)
\ No newline at end of file
+    return stake - int(alpha_to_children) + int(alpha_from_parents)
+
+async def as_completed_windowed(
+    factories: Iterable[Callable[[], Awaitable]], limit: int, hold: Optional[Callable[[], bool]] = None
+) -> AsyncIterator:
+    """
+    Run coroutines produced by `factories` with at most `limit` in flight and yield
+    their results in completion order. Exceptions are yielded as results.
+    The iterable is consumed lazily, so memory stays bounded by `limit`.
+    Closing the generator early (e.g. with contextlib.aclosing) cancels the fetches
+    still in flight.
+
+    `hold` adds backpressure for a consumer reordering the results: it is called after each
+    factory is taken from the iterable, and while it returns True (and some fetch is still
+    in flight) that factory is not started.
+    """
+    factories = iter(factories)
+    pending = set()
+    held = None
+
+    def refill():
+        nonlocal held
+        while len(pending) < limit:
+            if held is None:
+                held = next(factories, None)
+                if held is None:
+                    return
+            if hold is not None and pending and hold():
+                return
+            pending.add(asyncio.ensure_future(held()))
+            held = None
+
+    try:
+        refill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(done)
+            refill()
+            for task in done:
+                yield task.exception() or task.result()
+            refill()
+    finally:
+        for task in pending:
+            task.cancel()
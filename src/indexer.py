@@ -0,0 +1,58 @@
+import sys
+import asyncio
+
+from bittensor import AsyncSubtensor
+
+from constants import BLOCK_SECONDS, INTERVAL_SECONDS
+from epoch_index import EpochIndex
+from store import EpochStore
+from utils.env import parse_env_data
+
+VALID_INTERVALS = set(INTERVAL_SECONDS.keys())
+
+
+def parse_args():
+    """Parse and validate command line arguments."""
+    if len(sys.argv) < 3:
+        print("Usage: python indexer.py <store> <interval> [--once]")
+        print("  <store> - path of the SQLite store to create or extend")
+        print("  <interval> - history to backfill before the finalized head, one of: " + ", ".join(f'"{x}"' for x in VALID_INTERVALS))
+        print("  [--once] - stop after the backfill instead of following the chain head")
+        print("Example: python indexer.py apy-store.sqlite 30d")
+        sys.exit(1)
+
+    store_path = sys.argv[1]
+    interval = sys.argv[2]
+    if interval not in VALID_INTERVALS:
+        print(f"Error: Invalid interval '{interval}'. Must be one of: {', '.join(VALID_INTERVALS)}")
+        sys.exit(1)
+    return store_path, interval, "--once" in sys.argv[3:]
+
+
+async def main():
+    store_path, interval, once = parse_args()
+    env = parse_env_data()
+    node_url, batch_size, epoch_index_path = env.node, env.batch_size, env.epoch_index_path
+
+    store = EpochStore(store_path)
+    epoch_index = EpochIndex(epoch_index_path)
+    async with AsyncSubtensor(node_url) as subtensor:
+        finalized = await subtensor.substrate.get_block_number(await subtensor.substrate.get_chain_finalised_head())
+        netuids = await subtensor.get_all_subnets_netuid(block=finalized)
+        start_block = finalized - int(INTERVAL_SECONDS[interval] / BLOCK_SECONDS)
+
+        print(f"Backfilling {len(netuids)} subnets from block {start_block} to {finalized}")
+        try:
+            await store.update(subtensor, netuids, start_block, finalized, batch_size, epoch_index)
+        except RuntimeError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+        if not once:
+            print("Following the finalized head (Ctrl+C to stop)")
+            await store.follow(subtensor, batch_size, epoch_index)
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
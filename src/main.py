@@ -1,82 +1,185 @@
 import sys
 import asyncio
+from contextlib import nullcontext
 from rich.progress import Progress, TimeElapsedColumn, SpinnerColumn
 from rich.panel import Panel
 
-from utils.print import print_results
+from utils.print import print_all_results, print_results
 from utils.env import parse_env_data
+from utils.progress import HeadlessProgress
+from utils.diagnostics import NO_DIAGNOSTICS, Diagnostics
 from constants import INTERVAL_SECONDS
+from epoch_index import EpochIndex
+from options import CalcOptions
 from subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
 from root_calc import retrieve_and_calculate_hotkey_root_apy
+from all_subnets import retrieve_and_calculate_hotkey_all_apy
+from batching import install_batching
+from dividends import EpochDividends
+from store import EpochStore, calculate_from_store
 from bittensor import AsyncSubtensor
 
 VALID_INTERVALS = set(INTERVAL_SECONDS.keys())
 
 def parse_args():
     """Parse and validate command line arguments."""
-    if len(sys.argv) < 4:
-        print("Usage: python main.py <netuid> <hotkey> <interval> [block]")
-        print("  <netuid> - netuid index (0 is root)")
+    args = sys.argv[1:]
+    deadline = None
+    if "--deadline" in args:
+        position = args.index("--deadline")
+        try:
+            deadline = float(args[position + 1])
+        except (IndexError, ValueError):
+            deadline = 0.0
+        if deadline <= 0:
+            print("Error: --deadline needs a positive number of seconds")
+            sys.exit(1)
+        del args[position:position + 2]
+
+    if len(args) < 3:
+        print("Usage: python main.py <netuid> <hotkey> <interval> [block] [--deadline <seconds>]")
+        print("  <netuid> - netuid index (0 is root), or \"all\" for root and every subnet the hotkey has stake on")
         print("  <hotkey> - delegate hotkey in ss58 format")
         print("  <interval> - one of: " + ", ".join(f'"{x}"' for x in VALID_INTERVALS))
         print("  [block] - optional block number to calculate APY from")
+        print("  [--deadline <seconds>] - return a partial result when the calculation takes longer")
         print("Example: python main.py 37 5CsvRJXuR955WojnGMdok1hbhffZyB4N5ocrv82f3p5A2zVp 24h")
         sys.exit(1)
 
     try:
-        netuid = int(sys.argv[1])
-        hotkey = sys.argv[2]
-        interval = sys.argv[3]
-        block = None if len(sys.argv) <= 4 else int(sys.argv[4])
+        netuid = None if args[0] == "all" else int(args[0])
+        hotkey = args[1]
+        interval = args[2]
+        block = None if len(args) <= 3 else int(args[3])
 
         if interval not in VALID_INTERVALS:
             print(f"Error: Invalid interval '{interval}'. Must be one of: {', '.join(VALID_INTERVALS)}")
             sys.exit(1)
 
-        return netuid, hotkey, interval, block
+        return netuid, hotkey, interval, block, deadline
     except ValueError as e:
         print(f"Error: Invalid argument format - {str(e)}")
         sys.exit(1)
 
 async def main():
     # Parse command line arguments
-    netuid, hotkey, interval, block = parse_args()
+    netuid, hotkey, interval, block, deadline = parse_args()
 
     # Get node URL from environment
-    [node_url, batch_size, use_inherited_filter, no_filters] = parse_env_data()
+    env = parse_env_data()
+    epoch_index = EpochIndex(env.epoch_index_path) if env.epoch_index_path else None
+
+    diagnostics = None
+    if env.diagnostics or env.profile:
+        try:
+            diagnostics = Diagnostics(env.profile, env.profile_output)
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+    if env.store_path:
+        # Local range scans over the indexer's store (see store.py), no node connection
+        if netuid is None:
+            print("Error: \"all\" is not supported with STORE")
+            sys.exit(1)
+        if env.use_inherited_filter:
+            print("Error: INHERITED is not supported with STORE")
+            sys.exit(1)
+        try:
+            result = calculate_from_store(EpochStore(env.store_path), netuid, hotkey, interval, block, env.no_filters)
+        except (KeyError, ValueError) as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+        print_results([[result.apy, result.dividends, result.take, result.coverage, result.complete, result.sufficient]], netuid, hotkey, as_json=env.headless)
+        return
 
-    async with AsyncSubtensor(node_url) as subtensor:
+    if env.dividends_source and not env.dividends_check:
+        # The CLI calculates one hotkey: a shared source reads the dividends of all hotkeys for it
+        print("Error: DIVIDENDS_SOURCE is a diagnostic for one hotkey; set DIVIDENDS_CHECK to compare it with storage")
+        sys.exit(1)
+
+    subtensor = AsyncSubtensor(env.node)
+    batching_ws = install_batching(subtensor, env.rpc_batch, env.rpc_batch_wait) if env.rpc_batch > 1 else None
+    dividends_source = None
+    if env.dividends_source:
+        try:
+            dividends_source = EpochDividends(subtensor, env.dividends_source, env.dividends_check)
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
+
+    async with subtensor:
         if block is None:
             block = await subtensor.block
 
-        with Progress(
-            SpinnerColumn(), *Progress.get_default_columns(), TimeElapsedColumn()
-        ) as progress:
-            if use_inherited_filter:
+        if env.headless:
+            progress_context = HeadlessProgress()
+        else:
+            progress_context = Progress(
+                SpinnerColumn(), *Progress.get_default_columns(), TimeElapsedColumn()
+            )
+
+        with progress_context as progress:
+            if env.use_inherited_filter:
                 progress.console.print(f"\n[yellow]WARNING: Inherited filter is used, this option could take more time. [/yellow]")
-            if batch_size > 100:
-                progress.console.print(f"\n[yellow]WARNING: Batch size: {batch_size}, this may cause event loop to be hanging. [/yellow]")
-            progress.console.print(
-                Panel(f"Hotkey: [b][i][magenta]{hotkey}[/magenta][/i][/b]", width=60)
+            if env.batch_size > 100:
+                progress.console.print(f"\n[yellow]WARNING: Batch size: {env.batch_size}, this may cause event loop to be hanging. Set DIAGNOSTICS=1 to see where the time goes. [/yellow]")
+            if not env.headless:
+                progress.console.print(
+                    Panel(f"Hotkey: [b][i][magenta]{hotkey}[/magenta][/i][/b]", width=60)
+                )
+
+            options = CalcOptions(
+                epoch_index=epoch_index,
+                raw_decode=env.raw_decode,
+                export_dir=env.export_dir,
+                diagnostics=diagnostics or NO_DIAGNOSTICS,
+                progressive=env.progressive,
+                tolerance=env.tolerance,
+                deadline=deadline,
             )
+            async with (diagnostics or nullcontext()):
+                try:
+                    if netuid is None:
+                        # Root and every subnet with stake, in one pass
+                        all_results = await retrieve_and_calculate_hotkey_all_apy(
+                            subtensor, hotkey, interval, block, progress,
+                            batch_size=env.batch_size, use_inherited_filer=env.use_inherited_filter, no_filters=env.no_filters,
+                            options=options, dividends_source=dividends_source,
+                        )
+                    elif netuid > 0:
+                        # Calculate subnet APY
+                        progress.console.print(f"\nCalculating APY for subnet {netuid}")
+                        result = await retrieve_and_calculate_hotkey_subnet_apy(
+                            subtensor, netuid, hotkey, interval, block, progress,
+                            batch_size=env.batch_size, use_inherited_filer=env.use_inherited_filter, no_filters=env.no_filters,
+                            options=options, dividends_source=dividends_source,
+                        )
+                        results = [[result.apy, result.dividends, result.take, result.coverage, result.complete, result.sufficient]]
+                    else:
+                        # Calculate root network APY
+                        progress.console.print("\nCalculating root network APY")
+                        result = await retrieve_and_calculate_hotkey_root_apy(
+                            subtensor, hotkey, interval, block, progress,
+                            batch_size=env.batch_size, no_filters=env.no_filters, options=options,
+                        )
+                        results = [[result.apy, result.dividends, result.take, result.coverage, result.complete, result.sufficient]]
+
+                except Exception as e:
+                    progress.console.print(f"Error calculating APY: {str(e)}")
+                    sys.exit(1)
 
-            try:
-                if netuid > 0:
-                    # Calculate subnet APY
-                    progress.console.print(f"\nCalculating APY for subnet {netuid}")
-                    apy, divs = await retrieve_and_calculate_hotkey_subnet_apy(subtensor, netuid, hotkey, interval, block, progress, batch_size, use_inherited_filter, no_filters)
-                    results = [[apy, divs]]
-                else:
-                    # Calculate root network APY
-                    progress.console.print("\nCalculating root network APY")
-                    apy, divs = await retrieve_and_calculate_hotkey_root_apy(subtensor, hotkey, interval, block, progress, batch_size, no_filters)
-                    results = [[apy, divs]]
-                    
-            except Exception as e:
-                progress.console.print(f"Error calculating APY: {str(e)}")
-                sys.exit(1)
+            if dividends_source is not None:
+                dividends_source.report(progress.console)
+            if diagnostics is not None:
+                diagnostics.report(progress.console)
+                if batching_ws is not None:
+                    progress.console.print(f"{'rpc':>12}: {batching_ws.stats()}")
     
-        print_results(results, netuid, hotkey)
+        if netuid is None:
+            print_all_results(all_results, hotkey, as_json=env.headless)
+        else:
+            print_results(results, netuid, hotkey, as_json=env.headless)
 
 # Run the main function
 if __name__ == "__main__":
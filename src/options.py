@@ -0,0 +1,26 @@
+"""
+Options of a calculation, shared by the root, subnet and all-subnets calculators.
+
+They say where the epochs come from, how the values are read and recorded, and when
+fetching stops; see retrieve_and_calculate_hotkey_subnet_apy and
+retrieve_and_calculate_hotkey_root_apy for what each one does.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from epoch_index import EpochIndex
+from utils.diagnostics import NO_DIAGNOSTICS
+
+
+@dataclass(frozen=True)
+class CalcOptions:
+    epoch_index: Optional[EpochIndex] = None
+    raw_decode: bool = False
+    export_dir: Optional[str] = None
+    diagnostics: object = NO_DIAGNOSTICS  # Diagnostics or NO_DIAGNOSTICS
+    progressive: bool = False
+    tolerance: Optional[float] = None  # APY percentage points
+    deadline: Optional[float] = None  # seconds from the call
+
+
+DEFAULT_OPTIONS = CalcOptions()
@@ -0,0 +1,312 @@
+"""
+Watchlist prefetcher: warms the reads of the next epoch before they are requested.
+
+A long-running service calculating the same (netuid, hotkey) pairs over and over pays the
+node latency of the newest epoch on every request after an epoch ends. A ReadCache
+installed on the AsyncSubtensor (install_read_cache) serves query_subtensor and
+get_subnet_price at finalized blocks from memory; values at a finalized block never
+change, so they are kept until evicted (least recently used first).
+uninstall_read_cache puts the original methods back.
+
+A Prefetcher predicts the next epoch block of every subnet from its tempo and last_step
+(last_step + tempo + 1) and checks the finalized head every `poll_interval` seconds; the
+subnet schedules are only read again once a predicted epoch is finalized. The reads of
+that epoch are then issued for every watched hotkey, through the cache:
+
+    subnet hotkeys   AlphaDividendsPerSubnet; with dividends, TotalHotkeyAlpha (netuid
+                     and root) and TaoWeight, the reads of the subnet calculator's plan;
+                     Delegates, ChildkeyTake, ParentKeys and ChildKeys for the take
+    root hotkeys     RootClaimable, TotalHotkeyAlpha[hotkey, 0], Delegates and the subnet
+                     price at the epoch block of every subnet
+
+The newest epoch is the end of every window, where the take reads of the calculators
+always land (see take.resolve_piecewise).
+
+At most `max_in_flight` hotkey epochs are read at once and at most `rate` storage reads
+are issued per second, so the prefetcher does not crowd out the calculations it serves. An
+epoch counts as warmed only once all its reads succeeded; otherwise the next poll retries
+it. Reads of the raw decoder
+(RAW_DECODE) and the dividends sources are not cached.
+"""
+import asyncio
+from collections import Counter, OrderedDict
+from contextlib import aclosing
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from constants import BLOCK_SECONDS
+from helpers import (
+    as_completed_windowed,
+    get_children,
+    get_parents,
+    get_root_claimable_entries,
+    get_subnet_epoch_values,
+)
+from take import get_childkey_take_float, get_delegate_take
+
+DEFAULT_MAX_ENTRIES = 500_000
+DEFAULT_RATE = 20.0
+DEFAULT_MAX_IN_FLIGHT = 4
+CACHED_METHODS = ("query_subtensor", "get_subnet_price")
+
+
+class ReadCache:
+    """Reads at finalized blocks by (item, params, block), least recently used evicted."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # Highest block known to be finalized; reads above it are not cached
+        self.finalized: Optional[int] = None
+        self._values: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        # Instance attributes of the subtensor replaced by install_read_cache (None: class method)
+        self._replaced: Dict[str, object] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, block: Optional[int]) -> bool:
+        return block is not None and self.finalized is not None and block <= self.finalized
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key) -> bool:
+        return key in self._values
+
+    async def _read(self, key, read):
+        try:
+            value = await read()
+            self._values[key] = value
+            if len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+            return value
+        finally:
+            del self._pending[key]
+
+    async def get(self, key, read):
+        """Cached value of key, else the result of read() (concurrent misses share one read)."""
+        if key in self._values:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return self._values[key]
+        if key in self._pending:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._pending[key] = asyncio.ensure_future(self._read(key, read))
+        return await asyncio.shield(self._pending[key])
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        share = self.hits / total * 100 if total else 0.0
+        return f"{len(self._values)} values, {self.hits}/{total} reads served from cache ({share:.1f}%)"
+
+
+def install_read_cache(subtensor, cache: Optional[ReadCache] = None) -> ReadCache:
+    """Serve subtensor.query_subtensor and get_subnet_price at finalized blocks from a ReadCache."""
+    cache = ReadCache() if cache is None else cache
+    query_subtensor, get_subnet_price = subtensor.query_subtensor, subtensor.get_subnet_price
+    cache._replaced = {name: vars(subtensor).get(name) for name in CACHED_METHODS}
+
+    async def cached_query_subtensor(name, block=None, params=None, **kwargs):
+        if kwargs or not cache.cacheable(block):
+            return await query_subtensor(name, block=block, params=params, **kwargs)
+        key = (name, tuple(params or ()), block)
+        return await cache.get(key, lambda: query_subtensor(name, block=block, params=params))
+
+    async def cached_get_subnet_price(netuid, block=None, **kwargs):
+        if kwargs or not cache.cacheable(block):
+            return await get_subnet_price(netuid=netuid, block=block, **kwargs)
+        key = ("SubnetPrice", (netuid,), block)
+        return await cache.get(key, lambda: get_subnet_price(netuid=netuid, block=block))
+
+    subtensor.query_subtensor = cached_query_subtensor
+    subtensor.get_subnet_price = cached_get_subnet_price
+    return cache
+
+
+def uninstall_read_cache(subtensor, cache: ReadCache):
+    """Restore the subtensor methods replaced by install_read_cache(subtensor, cache)."""
+    for name, method in cache._replaced.items():
+        if method is None:
+            delattr(subtensor, name)
+        else:
+            setattr(subtensor, name, method)
+    cache._replaced = {}
+
+
+class RateLimiter:
+    """
+    Spaces the calls of wait() at least count/rate seconds apart, `count` being the number
+    of operations the previous call was for; no limit with rate 0.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self, count: int = 1):
+        now = asyncio.get_running_loop().time()
+        at = max(self._next, now)
+        self._next = at + count * self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+class Prefetcher:
+    """
+    Warms the reads of each new epoch for a watchlist of (netuid, hotkey), netuid 0 for root
+    (see module docstring). `subtensor` must have `cache` installed (install_read_cache).
+    """
+
+    def __init__(
+        self,
+        subtensor,
+        cache: ReadCache,
+        watchlist: Iterable[Tuple[int, str]] = (),
+        rate: float = DEFAULT_RATE,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        poll_interval: float = BLOCK_SECONDS,
+        log=print,
+    ):
+        self.subtensor = subtensor
+        self.cache = cache
+        self.watchlist: Dict[int, Set[str]] = {}
+        for netuid, hotkey in watchlist:
+            self.watch(netuid, hotkey)
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.log = log
+        self._limiter = RateLimiter(rate)
+        # Predicted next epoch block and last epoch block warmed, per netuid
+        self.next_epochs: Dict[int, int] = {}
+        self.warmed: Dict[int, int] = {}
+        # Netuids whose last epoch had failed reads, polled again without waiting for the next epoch
+        self._retry: Set[int] = set()
+        self.reads = Counter()
+
+    def watch(self, netuid: int, hotkey: str):
+        self.watchlist.setdefault(netuid, set()).add(hotkey)
+
+    def unwatch(self, netuid: int, hotkey: str):
+        self.watchlist.get(netuid, set()).discard(hotkey)
+
+    def _watched(self, netuid: int) -> bool:
+        # Root hotkeys read RootClaimable at the epochs of every subnet
+        return bool(self.watchlist.get(netuid)) or bool(self.watchlist.get(0))
+
+    async def _finalized_block(self) -> int:
+        substrate = self.subtensor.substrate
+        return await substrate.get_block_number(await substrate.get_chain_finalised_head())
+
+    async def _read(self, names: List[str], read: Callable[[], Awaitable]):
+        """read() once the rate limit allows the storage reads `names` it issues."""
+        await self._limiter.wait(len(names))
+        self.reads.update(names)
+        return await read()
+
+    async def _warm_subnet_hotkey(self, netuid: int, hotkey: str, block: int):
+        values, *_ = await asyncio.gather(
+            self._read(["AlphaDividendsPerSubnet"], lambda: get_subnet_epoch_values(
+                self.subtensor, hotkey, netuid, block, ["alpha_div_raw"]
+            )),
+            self._read(["Delegates"], lambda: get_delegate_take(self.subtensor, hotkey, block)),
+            self._read(["ChildkeyTake"], lambda: get_childkey_take_float(self.subtensor, hotkey, netuid, block)),
+            self._read(["ParentKeys"], lambda: get_parents(self.subtensor, hotkey, netuid, block)),
+            self._read(["ChildKeys"], lambda: get_children(self.subtensor, hotkey, netuid, block)),
+        )
+        if values["alpha_div_raw"] != 0:
+            await self._read(["TotalHotkeyAlpha", "TotalHotkeyAlpha", "TaoWeight"], lambda: get_subnet_epoch_values(
+                self.subtensor, hotkey, netuid, block, ["subnet_alpha_stake", "root_stake_tao", "tao_weight_param"]
+            ))
+
+    async def _warm_root_hotkey(self, hotkey: str, block: int):
+        await asyncio.gather(
+            self._read(["RootClaimable"], lambda: get_root_claimable_entries(self.subtensor, hotkey, block)),
+            self._read(["TotalHotkeyAlpha"], lambda: self.subtensor.query_subtensor(
+                "TotalHotkeyAlpha", block=block, params=[hotkey, 0]
+            )),
+            self._read(["Delegates"], lambda: get_delegate_take(self.subtensor, hotkey, block)),
+        )
+
+    async def _warm_price(self, netuid: int, block: int):
+        await self._read(["SubnetPrice"], lambda: self.subtensor.get_subnet_price(netuid=netuid, block=block))
+
+    async def _warm_epoch(self, epoch: Tuple[int, int], warm: Callable[[], Awaitable]):
+        """(epoch, None) once warm() succeeded, (epoch, exception) otherwise."""
+        try:
+            await warm()
+            return epoch, None
+        except Exception as e:
+            return epoch, e
+
+    async def warm(self, epochs: List[Tuple[int, int]]) -> Counter:
+        """Read the (netuid, epoch block) values of all watched hotkeys; returns the failures per epoch."""
+        warms = []
+        for epoch in epochs:
+            netuid, block = epoch
+            if netuid != 0:
+                warms += [
+                    (epoch, lambda netuid=netuid, hotkey=hotkey, block=block: self._warm_subnet_hotkey(netuid, hotkey, block))
+                    for hotkey in sorted(self.watchlist.get(netuid, ()))
+                ]
+            if self.watchlist.get(0):
+                warms.append((epoch, lambda netuid=netuid, block=block: self._warm_price(netuid, block)))
+                warms += [
+                    (epoch, lambda hotkey=hotkey, block=block: self._warm_root_hotkey(hotkey, block))
+                    for hotkey in sorted(self.watchlist[0])
+                ]
+
+        fetches = (lambda epoch=epoch, warm=warm: self._warm_epoch(epoch, warm) for epoch, warm in warms)
+        failed = Counter()
+        async with aclosing(as_completed_windowed(fetches, self.max_in_flight)) as results:
+            async for epoch, error in results:
+                if error is not None:
+                    failed[epoch] += 1
+        return failed
+
+    async def poll(self) -> List[Tuple[int, int]]:
+        """
+        One step: when a predicted epoch is finalized, re-read the schedules and warm the new
+        epochs of the watched subnets. Returns the (netuid, epoch block) pairs whose reads all
+        succeeded; the others are due again at the next poll.
+        """
+        finalized = await self._finalized_block()
+        self.cache.finalized = finalized
+        watched = [netuid for netuid in self.next_epochs if self._watched(netuid)]
+        predicted = self.next_epochs and watched and min(self.next_epochs[n] for n in watched) > finalized
+        if predicted and not self._retry:
+            return []
+        if not any(self.watchlist.values()):
+            return []
+
+        due = []
+        for subnet in await self.subtensor.get_all_subnets_info(block=finalized):
+            last_step = finalized - subnet.blocks_since_epoch
+            self.next_epochs[subnet.netuid] = last_step + subnet.tempo + 1
+            if self._watched(subnet.netuid) and self.warmed.get(subnet.netuid) != last_step:
+                due.append((subnet.netuid, last_step))
+
+        failed = await self.warm(due)
+        if failed:
+            self.log(f"Prefetch: reads failed on {len(failed)} of {len(due)} epochs, retried at the next poll")
+        self._retry = {netuid for netuid, _ in failed}
+        warmed = [epoch for epoch in due if epoch not in failed]
+        for netuid, block in warmed:
+            self.warmed[netuid] = block
+        return warmed
+
+    async def run(self):
+        """Poll forever; cancel the task to stop."""
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                self.log(f"Prefetch: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> str:
+        return (
+            f"{sum(self.reads.values())} reads for {len(self.warmed)} subnets ("
+            + ", ".join(f"{name}: {count}" for name, count in self.reads.most_common())
+            + f"), cache: {self.cache.stats()}"
+        )
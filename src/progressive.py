@@ -0,0 +1,216 @@
+"""
+Progressive APY estimation.
+
+Events are fetched in a stratified order instead of chronologically: one stratum per
+netuid, events of a stratum in scrambled van der Corput order so every prefix is spread
+evenly over the window, and strata interleaved in proportion to their size.
+
+The period yield is a product over events, so the estimator works on its logarithm,
+a sum of log(1 + epoch_yield) with skipped events contributing 0. The stratified
+estimate of that sum and its standard error (with finite population correction) give a
+running APY and a confidence interval that shrinks to zero as coverage reaches 100%.
+"""
+import heapq
+import math
+import time
+from functools import lru_cache
+from itertools import groupby
+from typing import Dict, Hashable, Iterable, Iterator, List, Sequence, Tuple
+
+from apy import calculate_apy
+from constants import INTERVAL_SECONDS
+from streaming import ApyResult
+
+# Two-sided 95%
+DEFAULT_Z = 1.96
+# Samples needed before the bound is trusted for an early stop: overall and per stratum
+MIN_SAMPLES = 30
+MIN_STRATUM_SAMPLES = 2
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(x: int) -> int:
+    # splitmix64 finalizer
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+@lru_cache(maxsize=64)
+def van_der_corput(n: int, seed: int = 0) -> Tuple[int, ...]:
+    """
+    0..n-1 in Owen-scrambled van der Corput order: the first 2^j positions fall one into
+    each of 2^j equal cells of the range, at a random place inside the cell. Plain
+    bit reversal would put them on a regular grid (all even positions first), which
+    aliases with anything periodic in the epochs. Cached, as strata mostly share a size.
+    """
+    if n <= 0:
+        return ()
+    bits = max((n - 1).bit_length(), 1)
+    order = []
+    for k in range(1 << bits):
+        position = 0
+        for level in range(bits):
+            # Bits from the most significant one; each is flipped depending on the ones above
+            flip = _mix((seed << 40) ^ (level << 32) ^ position ^ (1 << 63)) & 1
+            position = (position << 1) | (((k >> level) & 1) ^ flip)
+        if position < n:
+            order.append(position)
+    return tuple(order)
+
+
+def stratified_order(strata: Dict[Hashable, Sequence[int]]) -> Iterator[int]:
+    """
+    Items of all strata (each a chronological sequence) interleaved so every stratum
+    advances in proportion to its size, each in van der Corput order.
+    """
+    def stratum(items: Sequence[int]):
+        n = len(items)
+        for taken, position in enumerate(van_der_corput(n)):
+            yield (taken + 0.5) / n, items[position]
+
+    for _, item in heapq.merge(*(stratum(items) for items in strata.values() if items)):
+        yield item
+
+
+def stratified_block_runs(events: Sequence[Tuple[int, int, int]]) -> Iterator[Tuple[int, List]]:
+    """
+    Block runs (block, [(idx, event), ...]) of chronological `events` in the order in
+    which the stratified order of the events (one stratum per netuid) first reaches them.
+    """
+    runs = {
+        block: list(run) for block, run in groupby(enumerate(events), key=lambda e: e[1][0])
+    }
+    strata: Dict[int, List[int]] = {}
+    for idx, (_, netuid, _) in enumerate(events):
+        strata.setdefault(netuid, []).append(idx)
+
+    seen = set()
+    for idx in stratified_order(strata):
+        block = events[idx][0]
+        if block not in seen:
+            seen.add(block)
+            yield block, runs[block]
+
+
+class ProgressiveEstimate:
+    """Running stratified estimate of the APY and dividends of a window."""
+
+    def __init__(
+        self,
+        stratum_sizes: Dict[Hashable, int],
+        actual_interval_seconds: float,
+        z: float = DEFAULT_Z,
+    ):
+        self.total = sum(stratum_sizes.values())
+        self.compounding_periods = INTERVAL_SECONDS["year"] / actual_interval_seconds
+        self.z = z
+        self.sizes = dict(stratum_sizes)
+        # Per stratum: [n, sum g, sum g^2, sum divs, skipped]
+        self._sums: Dict[Hashable, List[float]] = {key: [0, 0.0, 0.0, 0.0, 0] for key in stratum_sizes}
+        self.processed = 0
+        self.skipped = 0
+
+    def add(self, stratum: Hashable, values):
+        """Add one event: `values` is (epoch_yield, divs) or None for a skipped event."""
+        sums = self._sums[stratum]
+        sums[0] += 1
+        if values is None:
+            sums[4] += 1
+            self.skipped += 1
+        else:
+            g = math.log1p(values[0])
+            sums[1] += g
+            sums[2] += g * g
+            sums[3] += values[1]
+        self.processed += 1
+
+    def _log_yield(self) -> Tuple[float, float, float]:
+        """(estimated sum of log growth, its variance, estimated dividends)."""
+        total_n = sum(s[0] for s in self._sums.values())
+        total_g = sum(s[1] for s in self._sums.values())
+        total_g2 = sum(s[2] for s in self._sums.values())
+        pooled_var = 0.0
+        if total_n > 1:
+            pooled_var = max((total_g2 - total_g * total_g / total_n) / (total_n - 1), 0.0)
+
+        log_yield = variance = dividends = 0.0
+        for key, (n, g, g2, divs, _) in self._sums.items():
+            size = self.sizes[key]
+            if n == 0:
+                # Not sampled yet: extrapolate from all samples
+                mean = total_g / total_n if total_n else 0.0
+                log_yield += size * mean
+                dividends += size * (sum(s[3] for s in self._sums.values()) / total_n if total_n else 0.0)
+                variance += size * size * pooled_var
+                continue
+            log_yield += size * g / n
+            dividends += size * divs / n
+            var = max((g2 - g * g / n) / (n - 1), 0.0) if n > 1 else pooled_var
+            variance += size * size * (1 - n / size) * var / n
+        return log_yield, variance, dividends
+
+    @property
+    def error(self) -> float:
+        """Half-width of the APY confidence interval in percentage points; inf before any sample."""
+        if self.processed == self.skipped:
+            return math.inf
+        log_yield, variance, _ = self._log_yield()
+        bound = self.z * math.sqrt(variance)
+        low = calculate_apy(math.expm1(log_yield - bound), self.compounding_periods)
+        high = calculate_apy(math.expm1(log_yield + bound), self.compounding_periods)
+        return (high - low) / 2
+
+    def converged(self, tolerance: float) -> bool:
+        if self.processed < min(MIN_SAMPLES, self.total):
+            return False
+        if any(sums[0] < min(MIN_STRATUM_SAMPLES, self.sizes[key]) for key, sums in self._sums.items()):
+            return False
+        return self.error <= tolerance
+
+    def result(self) -> ApyResult:
+        log_yield, variance, dividends = self._log_yield()
+        period_yield = math.expm1(log_yield)
+        return ApyResult(
+            apy=calculate_apy(period_yield, self.compounding_periods),
+            dividends=dividends,
+            period_yield=period_yield,
+            skipped=self.skipped,
+            processed=self.processed,
+            total=self.total,
+            error=self.error,
+        )
+
+
+def stratum_sizes(events: Iterable[Tuple[int, int, int]]) -> Dict[int, int]:
+    """Number of events per netuid."""
+    sizes: Dict[int, int] = {}
+    for _, netuid, _ in events:
+        sizes[netuid] = sizes.get(netuid, 0) + 1
+    return sizes
+
+
+class EstimateReporter:
+    """Shows the running estimate as the description of a progress task, at most every `interval` seconds."""
+
+    def __init__(self, progress, estimate: ProgressiveEstimate, interval: float = 0.5):
+        self.progress = progress
+        self.estimate = estimate
+        self.interval = interval
+        self.task = progress.add_task("[green]APY estimate", total=estimate.total)
+        self._next_refresh = 0.0
+
+    def update(self, advance: int = 1):
+        now = time.monotonic()
+        if now < self._next_refresh and self.estimate.processed < self.estimate.total:
+            self.progress.update(self.task, advance=advance)
+            return
+        self._next_refresh = now + self.interval
+        result = self.estimate.result()
+        self.progress.update(
+            self.task,
+            advance=advance,
+            description=f"[green]APY ≈ {result.apy:.4f}% ± {result.error:.4f}%",
+        )
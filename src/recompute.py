@@ -0,0 +1,49 @@
+import sys
+
+from dataset import calculate_from_dataset, iter_datasets
+from filter import MIN_ALPHA_STAKE, MIN_COMBINED_STAKE
+from utils.env import parse_env_data
+from utils.print import print_results
+
+
+def parse_args():
+    """Parse and validate command line arguments."""
+    if len(sys.argv) < 2:
+        print("Usage: python recompute.py <export_dir> [netuid] [min_alpha_stake] [min_combined_stake]")
+        print("  <export_dir> - directory written by a run with EXPORT_DIR")
+        print("  [netuid] - optional netuid to recompute (default: all exported)")
+        print(f"  [min_alpha_stake] - optional alpha stake threshold (default: {MIN_ALPHA_STAKE})")
+        print(f"  [min_combined_stake] - optional combined stake threshold in TAO (default: {MIN_COMBINED_STAKE})")
+        print("Example: python recompute.py ./export 37 10 1000")
+        sys.exit(1)
+
+    try:
+        export_dir = sys.argv[1]
+        netuid = None if len(sys.argv) <= 2 else int(sys.argv[2])
+        min_alpha_stake = MIN_ALPHA_STAKE if len(sys.argv) <= 3 else float(sys.argv[3])
+        min_combined_stake = MIN_COMBINED_STAKE if len(sys.argv) <= 4 else float(sys.argv[4])
+        return export_dir, netuid, min_alpha_stake, min_combined_stake
+    except ValueError as e:
+        print(f"Error: Invalid argument format - {str(e)}")
+        sys.exit(1)
+
+
+def main():
+    export_dir, netuid, min_alpha_stake, min_combined_stake = parse_args()
+    env = parse_env_data()
+    no_filters, headless = env.no_filters, env.headless
+
+    datasets = list(iter_datasets(export_dir, netuid))
+    if not datasets:
+        print(f"No exported data found in {export_dir}")
+        sys.exit(1)
+
+    for dataset in datasets:
+        result = calculate_from_dataset(dataset, no_filters, min_alpha_stake, min_combined_stake)
+        if not headless:
+            print(f"\n{dataset.meta['interval']} window ending at block {dataset.meta['block']}")
+        print_results([[result.apy, result.dividends]], dataset.netuid, dataset.meta["hotkey"], as_json=headless)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 import asyncio
-from typing import Tuple, List, Dict
+import math
+from contextlib import aclosing
+from itertools import groupby
+from typing import Tuple, List, Dict, Optional
 
 from constants import BLOCK_SECONDS, INTERVAL_SECONDS, REQUIRED_BLOCKS_RATIO
 from bittensor import AsyncSubtensor
-from apy import calculate_apy
-from helpers import get_root_claimable_entries
+from dataset import root_writer
+from events import FAILED, MISSING, count_epoch_events, iter_epoch_events
+from helpers import as_completed_windowed, get_root_block_values_raw, get_root_claimable_entries
+from options import DEFAULT_OPTIONS, CalcOptions
+from progressive import EstimateReporter, ProgressiveEstimate, stratified_block_runs, stratum_sizes
+from streaming import ApyResult, RootApyStream
+from take import TakeAccumulator, resolve_root_takes
+from utils.deadline import Deadline
 
 
 def normalize_claimable_alpha(d: dict) -> Dict[int, float]:
@@ -38,6 +47,9 @@ def calculate_hotkey_root_apy(
     
     This function contains only calculation logic - all data must be provided as arguments.
     No async operations or external queries are performed.
+
+    Kept for the dict/list based inputs (e.g. tests/data/calc_args_*.json); the events are
+    fed to a RootApyStream, like the fetched blocks of retrieve_and_calculate_hotkey_root_apy().
     
     Args:
         events: List of event dicts with keys: block, netuid, period
@@ -49,67 +61,19 @@ def calculate_hotkey_root_apy(
         no_filters: If False, filter out stakes < 4000 TAO
     
     Returns:
-        Tuple[float, float, int]: (apy_percent, total_dividends_tao, skipped_count)
+        Tuple[float, float, float, int]: (apy_percent, total_dividends_tao, period_yield, skipped_count)
     """
-    RAO_PER_TAO = 10**9
-    
-    yield_product = 1.0
-    total_divs_tao = 0.0
-    skipped = 0
-
-    prev_claimable_alpha_by_netuid: Dict[int, float] = dict(baseline_claimable_alpha)
-
+    stream = RootApyStream(baseline_claimable_alpha, len(events), actual_interval_seconds, no_filters)
     for idx, event in enumerate(events):
         netuid = event["netuid"]
-
-        # Claimable rate (α/TAO)
         claimable_dict_raw = root_claimable_dicts_raw[idx]
-        if claimable_dict_raw == -1:
-            skipped += 1
-            continue
-        claimable_alpha = normalize_claimable_alpha(claimable_dict_raw)
-
-        prev_alpha_per_tao = float(prev_claimable_alpha_by_netuid.get(netuid, 0.0))
-        curr_alpha_per_tao = float(claimable_alpha.get(netuid, prev_alpha_per_tao))
-
-        # Δα/TAO (clamp negatives to 0)
-        delta_alpha_per_tao = curr_alpha_per_tao - prev_alpha_per_tao
-        if delta_alpha_per_tao < 0:
-            delta_alpha_per_tao = 0.0
-
-        # Update baseline for next observation
-        prev_claimable_alpha_by_netuid[netuid] = curr_alpha_per_tao
-
-        # Stake (normalize to tao)
-        stake_raw = stakes_raw[idx]
-        if stake_raw <= 0:
-            skipped += 1
-            continue
-        stake_rao = float(stake_raw)
-        stake_tao = stake_rao / RAO_PER_TAO
-
-        if (not no_filters) and (stake_tao < 4000):
-            skipped += 1
-            continue
-
-        price_tao_per_alpha = float(prices_tao_per_alpha[idx])
-        if price_tao_per_alpha <= 0:
-            skipped += 1
-            continue
-
-        # Per-epoch values
-        epoch_yield_ratio = delta_alpha_per_tao * price_tao_per_alpha  # dimensionless
-        epoch_divs_tao    = (delta_alpha_per_tao * stake_tao) * price_tao_per_alpha
-
-        total_divs_tao += epoch_divs_tao
-        yield_product *= (1.0 + epoch_yield_ratio)
-
-    # Period yield & APY
-    period_yield = yield_product - 1.0
-    compounding_periods = INTERVAL_SECONDS["year"] / actual_interval_seconds
-    apy = calculate_apy(period_yield, compounding_periods)
+        claimable = (
+            FAILED if claimable_dict_raw == -1 else normalize_claimable_alpha(claimable_dict_raw).get(netuid, MISSING)
+        )
+        stream.feed(idx, (netuid, claimable, float(stakes_raw[idx]), float(prices_tao_per_alpha[idx])))
 
-    return apy, float(total_divs_tao), period_yield, skipped
+    result = stream.result()
+    return result.apy, result.dividends, result.period_yield, result.skipped
 
 
 async def retrieve_and_calculate_hotkey_root_apy(
@@ -120,7 +84,10 @@ async def retrieve_and_calculate_hotkey_root_apy(
     progress,
     batch_size: int = 100,
     no_filters: bool = False,
-) -> Tuple[float, float]:
+    options: CalcOptions = DEFAULT_OPTIONS,
+    subnets_info: Optional[list] = None,
+    shared_values=None,
+) -> ApyResult:
     """
     Calculate APY for a hotkey from RootClaimable.
 
@@ -131,8 +98,47 @@ async def retrieve_and_calculate_hotkey_root_apy(
         epoch_yield_ratio = Δα/TAO * price                 # dimensionless
         epoch_divs_tao    = (Δα/TAO * stake_tao) * price   # tao
 
+    Events are generated lazily and fetched block by block with at most `batch_size`
+    blocks in flight; every result is fed into a RootApyStream as soon as it arrives,
+    so memory does not grow with the interval.
+
+    The settings below are read from `options` (see options.CalcOptions).
+
+    With `options.epoch_index`, events are the actual epoch blocks recorded in the index
+    instead of the grid extrapolated from each subnet's current tempo.
+
+    The effective take is the dividend-weighted delegate take (Delegates), read only at
+    change points concurrently with the event reads.
+
+    With `options.raw_decode`, RootClaimable and the stake of a block are read in one storage
+    call and decoded directly from the raw bytes (see codec.py).
+
+    With `options.export_dir`, the per-event inputs and the baseline are also written to a
+    columnar partition there (see dataset.py) for offline recalculation.
+
+    `options.diagnostics` (see utils/diagnostics.py) records the time spent in the grid build,
+    baseline fetch, streaming fetch, decoding, calculation and take phases.
+
+    With `options.progressive`, blocks are fetched in a stratified order (per netuid, spread over
+    the window, see progressive.py) and a running estimate with a confidence bound is
+    shown. An event's Δα/TAO needs the rate at the netuid's previous epoch, which is read
+    separately when that block was not fetched yet. With `options.tolerance` (APY percentage
+    points), fetching stops once the bound is below it and the estimate is returned
+    (result.error set, result.complete False); otherwise the exact result is returned.
+    Progressive mode keeps the event list and out-of-order results in memory.
+
+    `subnets_info` (the result of get_all_subnets_info at `block`) replaces that read of
+    the grid. With `shared_values` (see all_subnets.SharedBlockValues), the root stake of
+    each block is read through it, so later subnet calculations of the same hotkey reuse it.
+
+    With `options.deadline` (seconds from the call), blocks are fetched in the progressive order so
+    that any prefix is a stratified sample. When the budget runs out, the fetches in flight
+    and the take reads are cancelled and the estimate of what was fetched is returned
+    (result.complete False, result.sufficient tells whether its coverage reaches
+    REQUIRED_BLOCKS_RATIO). A grid or baseline read still pending then raises TimeoutError.
+
     Returns:
-        (apy_percent, total_dividends_tao)
+        ApyResult (apy_percent, total_dividends_tao, period_yield, skipped, coverage)
     """
 
     # ------------------------ utils ------------------------
@@ -147,55 +153,63 @@ async def retrieve_and_calculate_hotkey_root_apy(
     actual_interval_blocks = int(interval_seconds / BLOCK_SECONDS)
     actual_interval_seconds = actual_interval_blocks * BLOCK_SECONDS
     start_block = block - actual_interval_blocks
-
-    subnets = await subtensor.get_all_subnets_info(block=block)
-
-    # Build epoch boundary events per subnet
-    events: List[Dict] = []
-    for subnet in subnets:
-        netuid = subnet.netuid
-        tempo = subnet.tempo
-        period = tempo + 1
-        last_epoch_block = block - subnet.blocks_since_epoch
-        epoch = last_epoch_block
-        while epoch >= start_block:
-            events.append({"block": epoch, "netuid": netuid, "period": period})
-            epoch -= period
-
-    events.sort(key=lambda x: (x["block"], x["netuid"]))
-
-    # ------------------------ RootClaimable (α/TAO), with baseline ------------------------
+    budget = Deadline(options.deadline)
+    progressive = options.progressive or options.deadline is not None
+
+    with options.diagnostics.phase("grid"):
+        if options.epoch_index is None:
+            subnets = (
+                subnets_info if subnets_info is not None
+                else await budget.require(subtensor.get_all_subnets_info(block=block), "grid build")
+            )
+
+            # Epoch boundary schedule per subnet: (netuid, last_epoch_block, period)
+            schedules = [
+                (subnet.netuid, block - subnet.blocks_since_epoch, subnet.tempo + 1)
+                for subnet in subnets
+            ]
+            total_events = count_epoch_events(schedules, start_block)
+            make_events = lambda: iter_epoch_events(schedules, start_block)
+        else:
+            # Actual epoch blocks from the persisted index (only uncovered ranges hit the node)
+            if subnets_info is not None:
+                netuids = [subnet.netuid for subnet in subnets_info]
+            else:
+                netuids = await budget.require(subtensor.get_all_subnets_netuid(block=block), "grid build")
+            await budget.require(options.epoch_index.update(subtensor, netuids, start_block, block, batch_size), "grid build")
+            total_events = options.epoch_index.count_events(netuids, start_block, block)
+            make_events = lambda: options.epoch_index.iter_events(netuids, start_block, block)
+
+        total_blocks = sum(1 for _ in groupby(make_events(), key=lambda e: e[0]))
+    # Events sharing a block share the RootClaimable and stake queries
+    block_runs = groupby(enumerate(make_events()), key=lambda e: e[1][0])
+
+    # ------------------------ progress ------------------------
     rootClaimableTask = progress.add_task(
         f"[cyan]Fetching root claimable entries for {hotkey}",
-        total=len(events) + 1
+        total=total_blocks + 1
     )
+    stakeTask = progress.add_task(f"[cyan]Fetching stakes for {hotkey}", total=total_blocks)
+    priceTask = progress.add_task(f"[cyan]Fetching α→tao prices", total=total_events)
 
+    # ------------------------ RootClaimable (α/TAO), with baseline ------------------------
     async def get_root_claimable_with_progress(at_block: int) -> dict:
         res = await get_root_claimable_entries(subtensor, hotkey, at_block)
         progress.update(rootClaimableTask, advance=1)
         return res if isinstance(res, dict) else -1
 
     baseline_block = max(start_block - 1, 0)
-    raw_baseline = await get_root_claimable_with_progress(baseline_block)
+    with options.diagnostics.phase("baseline"):
+        raw_baseline = await budget.require(get_root_claimable_with_progress(baseline_block), "baseline read")
     baseline_claimable_alpha = (
         normalize_claimable_alpha(raw_baseline) if raw_baseline != -1 else {}
     )
 
-    root_claimable_tasks = [
-        (lambda event=event: get_root_claimable_with_progress(event["block"]))
-        for event in events
-    ]
-    root_claimable_dicts_raw: List[dict] = []
-    for i in range(0, len(root_claimable_tasks), batch_size):
-        batch = root_claimable_tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(*[task() for task in batch], return_exceptions=True)
-        root_claimable_dicts_raw.extend([r if not isinstance(r, Exception) else -1 for r in batch_results])
-
     # ------------------------ Stakes (unit inference) ------------------------
-    stakeTask = progress.add_task(f"[cyan]Fetching stakes for {hotkey}", total=len(events))
-
     async def query_stake_with_progress(at_block: int, params: List) -> float:
         try:
+            if shared_values is not None:
+                return await shared_values.root_stake_rao(at_block)
             result = await subtensor.query_subtensor("TotalHotkeyAlpha", block=at_block, params=params)
             return float(result.value)  # may be tao or rao; convert later
         except Exception:
@@ -203,24 +217,8 @@ async def retrieve_and_calculate_hotkey_root_apy(
         finally:
             progress.update(stakeTask, advance=1)
 
-    stake_tasks = [
-        (lambda event=event: query_stake_with_progress(event["block"], [hotkey, 0]))
-        for event in events
-    ]
-
-    stakes_raw: List[float] = []
-    for i in range(0, len(stake_tasks), batch_size):
-        batch = stake_tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(*[task() for task in batch], return_exceptions=True)
-        stakes_raw.extend([(-1.0 if isinstance(r, Exception) else float(r)) for r in batch_results])
-
     # ------------------------ α→tao mid-price via get_subnet_price ------------------------
     # Note: use price *at the event block* if supported; otherwise fallback to head.
-    priceTask = progress.add_task(
-        f"[cyan]Fetching α→tao prices",
-        total=len(events)
-    )
-    
     async def get_price_with_progress(at_block: int, netuid: int) -> float:
         try:
             # Use the built-in get_subnet_price method which calls SwapRuntimeApi.current_alpha_price
@@ -237,39 +235,202 @@ async def retrieve_and_calculate_hotkey_root_apy(
         finally:
             progress.update(priceTask, advance=1)
 
-    price_tasks = [
-        (lambda event=event: get_price_with_progress(event["block"], event["netuid"]))
-        for event in events
-    ]
-
-    prices_tao_per_alpha: List[float] = []
-    for i in range(0, len(price_tasks), batch_size):
-        batch = price_tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(*[task() for task in batch], return_exceptions=True)
-        prices_tao_per_alpha.extend([(-1.0 if isinstance(r, Exception) else float(r)) for r in batch_results])
-
-    # ------------------------ Calculation ------------------------
-    apy, total_dividends_tao, period_yield, skipped = calculate_hotkey_root_apy(
-        events=events,
-        baseline_claimable_alpha=baseline_claimable_alpha,
-        root_claimable_dicts_raw=root_claimable_dicts_raw,
-        stakes_raw=stakes_raw,
-        prices_tao_per_alpha=prices_tao_per_alpha,
-        actual_interval_seconds=actual_interval_seconds,
-        no_filters=no_filters,
-    )
+    # ------------------------ Per-block fetch ------------------------
+    async def fetch_block(at_block: int, run: List[Tuple[int, Tuple[int, int, int]]]):
+        """Fetch claimable, stake and prices of all events at `at_block`: (at_block, [(idx, data), ...])."""
+        if options.raw_decode:
+            values, *prices = await asyncio.gather(
+                get_root_block_values_raw(subtensor, hotkey, at_block),
+                *[get_price_with_progress(at_block, netuid) for _, (_, netuid, _) in run],
+                return_exceptions=True,
+            )
+            progress.update(rootClaimableTask, advance=1)
+            progress.update(stakeTask, advance=1)
+            if isinstance(values, Exception):
+                claimable_dict_raw, stake_raw = -1, -1.0
+            else:
+                claimable_dict_raw, stake_raw = values
+                claimable_dict_raw = -1 if claimable_dict_raw is None else claimable_dict_raw
+                if shared_values is not None:
+                    shared_values.put_root_stake(at_block, stake_raw)
+        else:
+            claimable_dict_raw, stake_raw, *prices = await asyncio.gather(
+                get_root_claimable_with_progress(at_block),
+                query_stake_with_progress(at_block, [hotkey, 0]),
+                *[get_price_with_progress(at_block, netuid) for _, (_, netuid, _) in run],
+                return_exceptions=True,
+            )
+        with options.diagnostics.phase("decode"):
+            claimable_alpha = (
+                None if isinstance(claimable_dict_raw, Exception) or claimable_dict_raw == -1
+                else normalize_claimable_alpha(claimable_dict_raw)
+            )
+            stake_raw = FAILED if isinstance(stake_raw, Exception) else float(stake_raw)
+
+            fed = []
+            for (idx, (_, netuid, _)), price in zip(run, prices):
+                claimable = FAILED if claimable_alpha is None else claimable_alpha.get(netuid, MISSING)
+                price = FAILED if isinstance(price, Exception) else float(price)
+                fed.append((idx, (netuid, claimable, stake_raw, price)))
+        return at_block, fed
+
+    # ------------------------ Streaming calculation ------------------------
+    stream = RootApyStream(baseline_claimable_alpha, total_events, actual_interval_seconds, no_filters)
+
+    # Effective take: the change-point reads of the delegate take run alongside the APY pass
+    stream.takes = TakeAccumulator()
+    takes_task = asyncio.ensure_future(resolve_root_takes(subtensor, hotkey, (at_block for at_block, _, _ in make_events())))
+
+    # ------------------------ Progressive estimate ------------------------
+    # Claimable rate per (block, netuid) of fetched events, for the Δα/TAO of later samples
+    rates: Dict[Tuple[int, int], float] = {}
+
+    async def fetch_block_progressive(at_block: int, run: List[Tuple[int, Tuple[int, int, int]]]):
+        """fetch_block() plus the rate at each event's previous epoch: (at_block, [(idx, data, prev_rate), ...])."""
+        _, fed = await fetch_block(at_block, run)
+        for _, (netuid, claimable, _, _) in fed:
+            rates[(at_block, netuid)] = claimable
+
+        prev_blocks = list({
+            at_block - period for _, (_, netuid, period) in run
+            if period > 0 and at_block - period >= start_block and (at_block - period, netuid) not in rates
+        })
+        prev_claimables = await asyncio.gather(
+            *[get_root_claimable_entries(subtensor, hotkey, b) for b in prev_blocks], return_exceptions=True
+        )
+        for prev_block, claimable_dict_raw in zip(prev_blocks, prev_claimables):
+            claimable_alpha = (
+                normalize_claimable_alpha(claimable_dict_raw) if isinstance(claimable_dict_raw, dict) else None
+            )
+            for _, (_, netuid, period) in run:
+                if at_block - period == prev_block:
+                    rates[(prev_block, netuid)] = (
+                        FAILED if claimable_alpha is None else claimable_alpha.get(netuid, MISSING)
+                    )
+
+        prev_rates = [
+            rates.get((at_block - period, netuid), MISSING)
+            if period > 0 and at_block - period >= start_block else MISSING
+            for _, (_, netuid, period) in run
+        ]
+        return at_block, [(idx, data, prev_rate) for (idx, data), prev_rate in zip(fed, prev_rates)]
+
+    def estimate_values(data, prev_rate: float):
+        netuid, claimable, stake_raw, price = data
+        if claimable == FAILED or prev_rate == FAILED:
+            return None
+        prev_alpha_per_tao = baseline_claimable_alpha.get(netuid, 0.0) if math.isnan(prev_rate) else prev_rate
+        curr_alpha_per_tao = prev_alpha_per_tao if math.isnan(claimable) else claimable
+        return stream.epoch_values(max(curr_alpha_per_tao - prev_alpha_per_tao, 0.0), stake_raw, price)
+
+    if progressive:
+        events = list(make_events())
+        estimate = ProgressiveEstimate(stratum_sizes(events), actual_interval_seconds)
+        reporter = EstimateReporter(progress, estimate)
+        fetches = (
+            (lambda at_block=at_block, run=run: fetch_block_progressive(at_block, run))
+            for at_block, run in stratified_block_runs(events)
+        )
+        hold = None
+    else:
+        estimate = None
+        fetches, hold = stream.backpressure((
+            (run[0][0], lambda at_block=at_block, run=run: fetch_block(at_block, run))
+            for at_block, run in ((at_block, list(run)) for at_block, run in block_runs)
+        ), batch_size)
+    writer = None
+    if options.export_dir:
+        writer = root_writer(
+            options.export_dir, hotkey, interval, block, total_events, actual_interval_seconds, baseline_claimable_alpha
+        )
+
+    async def consume() -> bool:
+        """Feed the fetched blocks as they arrive; True when stopped early at the tolerance."""
+        async with aclosing(as_completed_windowed(fetches, batch_size, hold)) as fetched_results:
+            async for fetched in fetched_results:
+                if isinstance(fetched, Exception):
+                    raise fetched
+                at_block, fed = fetched
+                with options.diagnostics.phase("calculation"):
+                    for idx, data, *prev_rate in fed:
+                        if writer is not None:
+                            netuid, claimable, stake_raw, price = data
+                            writer.write(idx, {
+                                "block": at_block, "netuid": netuid,
+                                "claimable": claimable, "stake": stake_raw, "price": price,
+                            })
+                        stream.feed(idx, data)
+                        if estimate is not None:
+                            estimate.add(data[0], estimate_values(data, *prev_rate))
+                            reporter.update()
+                if options.tolerance is not None and estimate is not None and estimate.converged(options.tolerance):
+                    return estimate.processed < total_events
+        return False
+
+    stopped = True
+    expired = False
+    with options.diagnostics.phase("fetch"):
+        try:
+            stopped = await budget.run(consume())
+        except asyncio.TimeoutError:
+            # Closing the window cancelled the fetches in flight
+            expired = True
+        except BaseException:
+            # Failed or cancelled: the partial export is not kept
+            if writer is not None:
+                writer.discard()
+            raise
+        finally:
+            if stopped:
+                # Stopped early or raised: the take is not calculated
+                takes_task.cancel()
+
+    if stopped:
+        # Early answer: the estimate stands in for the exact result
+        result = estimate.result()
+        if expired:
+            log(
+                f"[yellow]Deadline of {options.deadline}s reached after {result.processed}/{result.total} events: "
+                f"partial APY {result.apy:.6f}% ± {result.error:.6f}%, coverage "
+                f"{result.processed - result.skipped}/{result.total} ({result.coverage*100:.2f}%) "
+                f"{'>=' if result.sufficient else '<'} required {REQUIRED_BLOCKS_RATIO*100:.2f}%[/yellow]"
+            )
+        else:
+            log(
+                f"Stopped after {result.processed}/{result.total} events: "
+                f"APY {result.apy:.6f}% ± {result.error:.6f}% (tolerance {options.tolerance}%)"
+            )
+        if writer is not None:
+            writer.discard()
+            log("[yellow]Export skipped: the run stopped before all events were fetched.[/yellow]")
+    else:
+        if writer is not None:
+            writer.close()
+            log(f"Exported event data to {writer.path}")
+
+        result = stream.result()
+        try:
+            with options.diagnostics.phase("take"):
+                stream.takes.locate(at_block for at_block, _, _ in make_events())
+                result.take = stream.takes.result(await budget.run(takes_task))
+        except asyncio.TimeoutError:
+            log(f"[yellow]Deadline of {options.deadline}s reached before the effective take was resolved.[/yellow]")
+        except Exception as e:
+            log(f"[yellow]Could not calculate the effective take: {e}[/yellow]")
 
     # Coverage note
-    if len(events) - skipped < REQUIRED_BLOCKS_RATIO * len(events):
+    if result.coverage < REQUIRED_BLOCKS_RATIO and not stopped:
         log(
-            f"[yellow]Coverage {len(events) - skipped}/{len(events)} "
-            f"({(len(events) - skipped)/len(events)*100:.2f}%) < required "
+            f"[yellow]Coverage {result.processed - result.skipped}/{result.total} "
+            f"({result.coverage*100:.2f}%) < required "
             f"{REQUIRED_BLOCKS_RATIO*100:.2f}% — APY may be inaccurate.[/yellow]"
         )
 
     # Summary output
-    log(f"Total {interval} yield: {period_yield * 100:.6f}%")
-    log(f"Total {interval} dividends (tao):   {total_dividends_tao:.12f} tao")
-    log(f"APY: {apy:.6f}%")
+    log(f"Total {interval} yield: {result.period_yield * 100:.6f}%")
+    log(f"Total {interval} dividends (tao):   {result.dividends:.12f} tao")
+    log(f"APY: {result.apy:.6f}%")
+    if result.take is not None:
+        log(f"Effective take: {result.take * 100:.6f}%")
 
-    return apy, float(total_dividends_tao)
+    return result
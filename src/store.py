@@ -0,0 +1,397 @@
+"""
+Local store of the per-epoch inputs of all hotkeys, and the calculators over it.
+
+Instead of asking the archive node for every (hotkey, block) on demand, the indexer
+(indexer.py) ingests each epoch boundary of the epoch index (see epoch_index.py) once
+into an SQLite database:
+
+    epochs            (netuid, block): period, TaoWeight, price (TAO/α)
+    subnet_dividends  (hotkey, netuid, block): AlphaDividendsPerSubnet and TotalHotkeyAlpha
+                      on the subnet and on root (rao), for the hotkeys with dividends
+    root_claimable    (hotkey, block, netuid): RootClaimable rate of the epoch's netuid
+                      (α/TAO, NULL if the hotkey's map has no entry for it) and
+                      TotalHotkeyAlpha on root (rao), for the hotkeys in RootClaimable
+    coverage          (netuid): registration block and the range whose epochs are all stored
+
+A block costs one map query per epoch for the dividends, one RootClaimable map query,
+one price call per epoch and one state_queryStorageAt for all stakes and TaoWeight,
+whatever the number of hotkeys. Blocks are ingested with at most `batch_size` in flight.
+
+calculate_from_store() then reads a window with one range scan and feeds the streams of
+the node-backed calculators: subnets over the window of subnet_calc.subnet_epoch_grid()
+with an epoch index, root over every epoch in the interval with the rates at each
+netuid's last epoch before it as the baseline. Not stored, hence not supported: the
+inherited stake filter and the effective take.
+"""
+import asyncio
+import sqlite3
+from collections import defaultdict
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from codec import RAO_PER_TAO, U64_MAX, decode_u64
+from constants import BLOCK_SECONDS, INTERVAL_SECONDS
+from epoch_index import EpochIndex
+from events import FAILED, MISSING
+from helpers import as_completed_windowed, parse_root_claimable, query_map_values, query_subtensor_raw
+from streaming import ApyResult, RootApyStream, SubnetApyStream
+
+# Keys per state_queryStorageAt call
+RAW_CHUNK = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS epochs (
+    netuid INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    period INTEGER NOT NULL,
+    tao_weight REAL NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (netuid, block)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS epochs_block ON epochs (block);
+
+CREATE TABLE IF NOT EXISTS subnet_dividends (
+    hotkey TEXT NOT NULL,
+    netuid INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    dividends INTEGER NOT NULL,
+    alpha_stake INTEGER NOT NULL,
+    root_stake INTEGER NOT NULL,
+    PRIMARY KEY (hotkey, netuid, block)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS root_claimable (
+    hotkey TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    netuid INTEGER NOT NULL,
+    rate REAL,
+    stake INTEGER NOT NULL,
+    PRIMARY KEY (hotkey, block, netuid)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coverage (
+    netuid INTEGER PRIMARY KEY,
+    registered_at INTEGER NOT NULL,
+    covered_from INTEGER NOT NULL,
+    covered_to INTEGER NOT NULL
+);
+"""
+
+
+async def _get_price(subtensor, netuid: int, block: int) -> float:
+    """Same as the root calculator: TAO/α at block, FAILED if unavailable."""
+    try:
+        price_balance = await subtensor.get_subnet_price(netuid=netuid, block=block)
+        price_tao = float(price_balance.tao) if price_balance is not None else -1.0
+        return price_tao if price_tao > 0 else FAILED
+    except Exception:
+        return FAILED
+
+
+async def fetch_block_rows(subtensor, block: int, epochs: List[Tuple[int, int]]) -> Tuple[list, list, list]:
+    """Rows of the epochs, subnet_dividends and root_claimable tables for the epochs [(netuid, period)] at block."""
+    netuids = [netuid for netuid, _ in epochs]
+    dividend_maps, claimable_map, prices = await asyncio.gather(
+        asyncio.gather(*[query_map_values(subtensor, "AlphaDividendsPerSubnet", block, [netuid]) for netuid in netuids]),
+        query_map_values(subtensor, "RootClaimable", block),
+        asyncio.gather(*[_get_price(subtensor, netuid, block) for netuid in netuids]),
+    )
+    dividends = [{hotkey: int(value) for hotkey, value in values.items() if value} for values in dividend_maps]
+    claimable = {hotkey: parse_root_claimable(value) for hotkey, value in claimable_map.items() if value}
+
+    # Every stake and TaoWeight of the block in one storage call per RAW_CHUNK keys
+    root_hotkeys = sorted(set(claimable).union(*dividends))
+    queries = [("TaoWeight", [])] + [("TotalHotkeyAlpha", [hotkey, 0]) for hotkey in root_hotkeys]
+    queries += [("TotalHotkeyAlpha", [hotkey, netuid]) for netuid, divs in zip(netuids, dividends) for hotkey in divs]
+    raw = []
+    for offset in range(0, len(queries), RAW_CHUNK):
+        raw += await query_subtensor_raw(subtensor, queries[offset : offset + RAW_CHUNK], block)
+    values = [decode_u64(value) for value in raw]
+    tao_weight = values[0] / U64_MAX
+    root_stakes = dict(zip(root_hotkeys, values[1 : 1 + len(root_hotkeys)]))
+    alpha_stakes = iter(values[1 + len(root_hotkeys) :])
+
+    epoch_rows, dividend_rows, claimable_rows = [], [], []
+    for (netuid, period), divs, price in zip(epochs, dividends, prices):
+        epoch_rows.append((netuid, block, period, tao_weight, price))
+        for hotkey, amount in divs.items():
+            dividend_rows.append((hotkey, netuid, block, amount, next(alpha_stakes), root_stakes[hotkey]))
+        for hotkey, rates in claimable.items():
+            claimable_rows.append((hotkey, block, netuid, rates.get(netuid), root_stakes[hotkey]))
+    return epoch_rows, dividend_rows, claimable_rows
+
+
+class EpochStore:
+    """SQLite store of the per-epoch inputs of all hotkeys (see module docstring)."""
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, self.VERSION):
+            raise ValueError(f"{path} has store version {version}, expected {self.VERSION}")
+        self.db.executescript(SCHEMA)
+        self.db.execute(f"PRAGMA user_version={self.VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    # ------------------------ coverage ------------------------
+    def coverage(self) -> Dict[int, Tuple[int, int, int]]:
+        """{netuid: (registered_at, covered_from, covered_to)}"""
+        rows = self.db.execute("SELECT netuid, registered_at, covered_from, covered_to FROM coverage")
+        return {netuid: (registered_at, covered_from, covered_to) for netuid, registered_at, covered_from, covered_to in rows}
+
+    def covers(self, netuid: int, start_block: int, end_block: int) -> bool:
+        entry = self.coverage().get(netuid)
+        if entry is None:
+            return False
+        registered_at, covered_from, covered_to = entry
+        return covered_from <= max(start_block, registered_at) and end_block <= covered_to
+
+    def head(self, netuid: Optional[int] = None) -> Optional[int]:
+        """Last covered block of netuid, or of the store."""
+        coverage = self.coverage()
+        if netuid is not None:
+            return coverage[netuid][2] if netuid in coverage else None
+        return max((covered_to for _, _, covered_to in coverage.values()), default=None)
+
+    def _set_coverage(self, netuid: int, registered_at: int, covered_from: int, covered_to: int):
+        """Merge [covered_from, covered_to] into the range of netuid; a range not touching it leaves it as is."""
+        entry = self.coverage().get(netuid)
+        if entry is not None and entry[0] == registered_at:
+            if covered_from > entry[2] + 1 or covered_to < entry[1] - 1:
+                return
+            covered_from, covered_to = min(covered_from, entry[1]), max(covered_to, entry[2])
+        self.db.execute(
+            "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)", (netuid, registered_at, covered_from, covered_to)
+        )
+
+    def _reset_netuid(self, netuid: int):
+        """Drop the data of a netuid registered anew."""
+        with self.db:
+            for table in ("epochs", "subnet_dividends", "root_claimable", "coverage"):
+                self.db.execute(f"DELETE FROM {table} WHERE netuid = ?", (netuid,))
+
+    # ------------------------ ingestion ------------------------
+    async def update(
+        self,
+        subtensor,
+        netuids: List[int],
+        start_block: int,
+        end_block: int,
+        batch_size: int = 100,
+        epoch_index: Optional[EpochIndex] = None,
+        log=print,
+    ):
+        """
+        Make sure the store covers [start_block, end_block] for `netuids`, plus each netuid's
+        last epoch before start_block (the root baseline). Epochs already stored are skipped,
+        so an interrupted run resumes where it stopped. Raises if some blocks failed; the
+        coverage of their netuids is then left unchanged. The coverage of a netuid only grows
+        by ranges touching it: the epochs of a later, disjoint range are stored but not
+        counted as covered until the gap is ingested.
+        """
+        epoch_index = epoch_index or EpochIndex()
+        await epoch_index.update(subtensor, netuids, start_block - 1, end_block, batch_size)
+
+        coverage = self.coverage()
+        wanted: Dict[int, int] = {}
+        events = []
+        for netuid in netuids:
+            entry = epoch_index.subnets[netuid]
+            if netuid in coverage and coverage[netuid][0] != entry.registered_at:
+                self._reset_netuid(netuid)
+            before = epoch_index.last_epochs(netuid, start_block - 1, 1)
+            wanted[netuid] = max(before[0] if len(before) else start_block, entry.registered_at)
+            stored = {
+                block for block, in self.db.execute(
+                    "SELECT block FROM epochs WHERE netuid = ? AND block BETWEEN ? AND ?",
+                    (netuid, wanted[netuid], end_block),
+                )
+            }
+            events += [
+                event for event in epoch_index.iter_events([netuid], wanted[netuid], end_block)
+                if event[0] not in stored
+            ]
+        events.sort()
+
+        fetches = (
+            (lambda block=block, epochs=[(netuid, period) for _, netuid, period in run]: self._fetch(subtensor, block, epochs))
+            for block, run in groupby(events, key=lambda event: event[0])
+        )
+        failed = defaultdict(int)
+        blocks = rows = 0
+        async for fetched in as_completed_windowed(fetches, batch_size):
+            block, epochs, result = fetched
+            if isinstance(result, Exception):
+                for netuid, _ in epochs:
+                    failed[netuid] += 1
+                continue
+            epoch_rows, dividend_rows, claimable_rows = result
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO epochs VALUES (?, ?, ?, ?, ?)", epoch_rows)
+                self.db.executemany("INSERT OR REPLACE INTO subnet_dividends VALUES (?, ?, ?, ?, ?, ?)", dividend_rows)
+                self.db.executemany("INSERT OR REPLACE INTO root_claimable VALUES (?, ?, ?, ?, ?)", claimable_rows)
+            blocks += 1
+            rows += len(dividend_rows) + len(claimable_rows)
+
+        with self.db:
+            for netuid in netuids:
+                if netuid not in failed:
+                    self._set_coverage(netuid, epoch_index.subnets[netuid].registered_at, wanted[netuid], end_block)
+        log(f"Stored {len(events) - sum(failed.values())} epochs at {blocks} blocks ({rows} hotkey rows) up to block {end_block}")
+        if failed:
+            raise RuntimeError(
+                f"{sum(failed.values())} epochs failed on netuids {sorted(failed)}; run again to retry them"
+            )
+
+    async def _fetch(self, subtensor, block: int, epochs: List[Tuple[int, int]]):
+        try:
+            return block, epochs, await fetch_block_rows(subtensor, block, epochs)
+        except Exception as e:
+            return block, epochs, e
+
+    async def follow(
+        self,
+        subtensor,
+        batch_size: int = 100,
+        epoch_index: Optional[EpochIndex] = None,
+        poll_interval: float = BLOCK_SECONDS,
+        log=print,
+    ):
+        """
+        Keep the store up to the finalized head for all subnets, forever. Each netuid resumes
+        after its own covered range, so the epochs of a failed update are retried by the next.
+        """
+        epoch_index = epoch_index or EpochIndex()
+        while True:
+            finalized = await subtensor.substrate.get_block_number(
+                await subtensor.substrate.get_chain_finalised_head()
+            )
+            await self.follow_step(subtensor, finalized, batch_size, epoch_index, log)
+            await asyncio.sleep(poll_interval)
+
+    async def follow_step(self, subtensor, finalized: int, batch_size: int, epoch_index: EpochIndex, log=print):
+        """One step of follow(): ingest every netuid from its covered_to + 1 up to `finalized`."""
+        coverage = self.coverage()
+        last = self.head()
+        starts = defaultdict(list)
+        for netuid in await subtensor.get_all_subnets_netuid(block=finalized):
+            start = coverage[netuid][2] + 1 if netuid in coverage else (last or finalized) + 1
+            if netuid not in coverage or start <= finalized:
+                starts[start].append(netuid)
+        for start, netuids in sorted(starts.items()):
+            try:
+                await self.update(subtensor, netuids, start, finalized, batch_size, epoch_index, log)
+            except RuntimeError as e:
+                log(str(e))
+
+    # ------------------------ reads ------------------------
+    def last_epochs(self, netuid: int, end_block: int, count: int) -> List[int]:
+        rows = self.db.execute(
+            "SELECT block FROM epochs WHERE netuid = ? AND block <= ? ORDER BY block DESC LIMIT ?",
+            (netuid, end_block, count),
+        ).fetchall()
+        return [block for block, in reversed(rows)]
+
+    def subnet_rows(self, netuid: int, hotkey: str, start_block: int, end_block: int) -> List[dict]:
+        """SubnetApyStream inputs of the epochs of netuid in [start_block, end_block], in order."""
+        rows = self.db.execute(
+            """
+            SELECT e.block, e.tao_weight, d.dividends, d.alpha_stake, d.root_stake
+            FROM epochs e
+            LEFT JOIN subnet_dividends d ON d.hotkey = ? AND d.netuid = e.netuid AND d.block = e.block
+            WHERE e.netuid = ? AND e.block BETWEEN ? AND ?
+            ORDER BY e.block
+            """,
+            (hotkey, netuid, start_block, end_block),
+        )
+        return [
+            {
+                "block": block,
+                "tao_weight_param": tao_weight if dividends else 0.0,
+                "alpha_div_raw": (dividends or 0) / RAO_PER_TAO,
+                "root_stake_tao": (root_stake or 0) / RAO_PER_TAO,
+                "subnet_alpha_stake": (alpha_stake or 0) / RAO_PER_TAO,
+                "inh_root_stake": 0.0,
+                "inh_subnet_stake": 0.0,
+            }
+            for block, tao_weight, dividends, alpha_stake, root_stake in rows
+        ]
+
+    def root_rows(self, hotkey: str, start_block: int, end_block: int) -> List[Tuple[int, float, float, float]]:
+        """RootApyStream inputs of all epochs in [start_block, end_block], in (block, netuid) order."""
+        rows = self.db.execute(
+            """
+            SELECT e.netuid, r.block IS NOT NULL, r.rate, r.stake, e.price
+            FROM epochs e
+            LEFT JOIN root_claimable r ON r.hotkey = ? AND r.block = e.block AND r.netuid = e.netuid
+            WHERE e.block BETWEEN ? AND ?
+            ORDER BY e.block, e.netuid
+            """,
+            (hotkey, start_block, end_block),
+        )
+        return [
+            (netuid, (MISSING if rate is None else rate) if found else FAILED, float(stake) if found else FAILED, price)
+            for netuid, found, rate, stake, price in rows
+        ]
+
+    def root_baseline(self, hotkey: str, start_block: int) -> Dict[int, float]:
+        """Rates {netuid: α/TAO} of the hotkey at each netuid's last epoch before start_block."""
+        rows = self.db.execute(
+            """
+            SELECT r.netuid, r.rate
+            FROM (SELECT netuid, MAX(block) AS block FROM epochs WHERE block < ? GROUP BY netuid) last
+            JOIN root_claimable r ON r.hotkey = ? AND r.netuid = last.netuid AND r.block = last.block
+            WHERE r.rate IS NOT NULL
+            """,
+            (start_block, hotkey),
+        )
+        return dict(rows.fetchall())
+
+
+def calculate_from_store(
+    store: EpochStore,
+    netuid: int,
+    hotkey: str,
+    interval: str,
+    block: Optional[int] = None,
+    no_filters: bool = False,
+) -> ApyResult:
+    """APY of a hotkey from the store, over the interval ending at `block` (default: the store's head)."""
+    actual_interval_blocks = int(INTERVAL_SECONDS[interval] / BLOCK_SECONDS)
+    actual_interval_seconds = actual_interval_blocks * BLOCK_SECONDS
+    if block is None:
+        block = store.head(netuid or None)
+        if block is None:
+            raise KeyError(f"Store {store.path} has no data for netuid {netuid}")
+
+    if netuid == 0:
+        start_block = block - actual_interval_blocks
+        netuids = {n for n, (_, _, covered_to) in store.coverage().items() if covered_to >= block}
+        uncovered = sorted(n for n in netuids if not store.covers(n, start_block - 1, block))
+        if not netuids or uncovered:
+            raise KeyError(f"Store does not cover blocks {start_block - 1}..{block} for netuids {uncovered or 'any'}")
+        rows = [row for row in store.root_rows(hotkey, start_block, block) if row[0] in netuids]
+        baseline = store.root_baseline(hotkey, start_block)
+        stream = RootApyStream(baseline, len(rows), actual_interval_seconds, no_filters)
+    else:
+        last_epochs = store.last_epochs(netuid, block, 2)
+        if not last_epochs:
+            raise KeyError(f"Store has no epochs of netuid {netuid} up to block {block}")
+        last_epoch_block = last_epochs[-1]
+        period = last_epochs[-1] - last_epochs[0] if len(last_epochs) == 2 else actual_interval_blocks
+        expected_epochs = max(actual_interval_blocks // period, 1)
+        start_block = last_epoch_block - (expected_epochs - 1) * period
+        if not store.covers(netuid, start_block, last_epoch_block):
+            raise KeyError(f"Store does not cover netuid {netuid} for blocks {start_block}..{last_epoch_block}")
+        rows = store.subnet_rows(netuid, hotkey, start_block, last_epoch_block)
+        stream = SubnetApyStream(len(rows), actual_interval_seconds, no_filters)
+
+    for idx, data in enumerate(rows):
+        stream.feed(idx, data)
+    return stream.result()
@@ -0,0 +1,274 @@
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from constants import INTERVAL_SECONDS, REQUIRED_BLOCKS_RATIO
+from apy import calculate_apy
+from events import FAILED
+from filter import MIN_ALPHA_STAKE, MIN_COMBINED_STAKE, has_enough_stake
+
+RAO_PER_TAO = 10**9
+
+
+@dataclass
+class ApyResult:
+    """Running or final result of an APY calculation."""
+
+    apy: float
+    dividends: float
+    period_yield: float
+    skipped: int
+    processed: int
+    total: int
+    take: Optional[float] = None
+    # Half-width of the APY confidence interval (percentage points) of a progressive estimate
+    error: Optional[float] = None
+    # Storage reads issued per item, when the calculator reports them
+    reads: Optional[Dict[str, int]] = None
+
+    @property
+    def coverage(self) -> float:
+        """Share of all events that were processed and not skipped."""
+        if self.total <= 0:
+            return 0.0
+        return (self.processed - self.skipped) / self.total
+
+    @property
+    def complete(self) -> bool:
+        return self.processed >= self.total
+
+    @property
+    def sufficient(self) -> bool:
+        """Coverage reaches REQUIRED_BLOCKS_RATIO."""
+        return self.coverage >= REQUIRED_BLOCKS_RATIO
+
+
+class _StreamingApy(ABC):
+    """
+    Base of the incremental calculators.
+
+    Events are numbered 0..total-1 in chronological order. `feed(event, data)` accepts them
+    in any order; early arrivals wait in a reorder buffer until every preceding event has
+    been applied. Fetched through backpressure(), the buffer holds at most the events of
+    `limit` fetches, however slow the earliest one is.
+    """
+
+    def __init__(
+        self,
+        total: int,
+        actual_interval_seconds: float,
+        no_filters: bool = False,
+        min_alpha_stake: float = MIN_ALPHA_STAKE,
+        min_combined_stake: float = MIN_COMBINED_STAKE,
+    ):
+        self.total = total
+        self.actual_interval_seconds = actual_interval_seconds
+        self.no_filters = no_filters
+        self.min_alpha_stake = min_alpha_stake
+        self.min_combined_stake = min_combined_stake
+
+        self.yield_product = 1.0
+        self.dividends = 0.0
+        self.skipped = 0
+        self.processed = 0
+
+        self._next = 0
+        self._pending: Dict[int, Any] = {}
+
+        # Optional TakeAccumulator recording the dividends of every applied event
+        self.takes = None
+
+    def feed(self, event: int, data: Any):
+        """Feed the fetched data of the event at position `event` of the window."""
+        if event < self._next or event in self._pending:
+            raise ValueError(f"Event {event} was already fed")
+        self._pending[event] = data
+        while self._next in self._pending:
+            self._apply(self._pending.pop(self._next))
+            self._next += 1
+            self.processed += 1
+
+    @property
+    def buffered(self) -> int:
+        return len(self._pending)
+
+    def backpressure(
+        self, factories: Iterable[Tuple[int, Callable]], limit: int
+    ) -> Tuple[Iterator[Callable], Callable[[], bool]]:
+        """
+        (fetches, hold) for helpers.as_completed_windowed from [(first event, factory)] in
+        event order: a fetch is held while the fetch `limit` places before it still has
+        events waiting to be applied.
+        """
+        starts = deque()
+        taken = applied = 0
+
+        def fetches():
+            nonlocal taken
+            for first, factory in factories:
+                if taken:
+                    starts.append(first)
+                taken += 1
+                yield factory
+
+        def hold() -> bool:
+            nonlocal applied
+            # A fetch is fully applied once the first event of the next one is reached
+            while starts and starts[0] <= self._next:
+                starts.popleft()
+                applied += 1
+            return taken - applied > limit
+
+        return fetches(), hold
+
+    def result(self) -> ApyResult:
+        period_yield = self.yield_product - 1.0
+        compounding_periods = INTERVAL_SECONDS["year"] / self.actual_interval_seconds
+        return ApyResult(
+            apy=calculate_apy(period_yield, compounding_periods),
+            dividends=float(self.dividends),
+            period_yield=period_yield,
+            skipped=self.skipped,
+            processed=self.processed,
+            total=self.total,
+        )
+
+    @abstractmethod
+    def _apply(self, data: Any):
+        """Apply the data of the next event in order."""
+
+    def _record(self, divs: float, stake: float = 0.0, parent_share: Optional[float] = None):
+        if self.takes is not None:
+            self.takes.add(self._next, divs, stake, parent_share)
+
+
+class RootApyStream(_StreamingApy):
+    """
+    Incremental root APY calculation.
+
+    Data of each event is a tuple (netuid, claimable, stake_rao, price_tao_per_alpha) where
+    claimable is the RootClaimable rate (α/TAO) of netuid, FAILED for a failed query or
+    MISSING (nan) when the netuid has no entry. Only the last rate per netuid is kept.
+    The stake filter drops events with less than `min_combined_stake` TAO on root.
+    """
+
+    def __init__(
+        self,
+        baseline_claimable_alpha: Dict[int, float],
+        total: int,
+        actual_interval_seconds: float,
+        no_filters: bool = False,
+        min_combined_stake: float = MIN_COMBINED_STAKE,
+    ):
+        super().__init__(total, actual_interval_seconds, no_filters, min_combined_stake=min_combined_stake)
+        self.prev_claimable_alpha_by_netuid: Dict[int, float] = dict(baseline_claimable_alpha)
+
+    def _apply(self, data: Tuple[int, float, float, float]):
+        netuid, claimable, stake_rao, price_tao_per_alpha = data
+
+        # Claimable rate (α/TAO)
+        if claimable == FAILED:
+            self.skipped += 1
+            return
+
+        prev_alpha_per_tao = float(self.prev_claimable_alpha_by_netuid.get(netuid, 0.0))
+        curr_alpha_per_tao = prev_alpha_per_tao if math.isnan(claimable) else claimable
+
+        # Δα/TAO (clamp negatives to 0)
+        delta_alpha_per_tao = curr_alpha_per_tao - prev_alpha_per_tao
+        if delta_alpha_per_tao < 0:
+            delta_alpha_per_tao = 0.0
+
+        # Update baseline for next observation
+        self.prev_claimable_alpha_by_netuid[netuid] = curr_alpha_per_tao
+
+        values = self.epoch_values(delta_alpha_per_tao, stake_rao, price_tao_per_alpha)
+        if values is None:
+            self.skipped += 1
+            return
+        epoch_yield_ratio, epoch_divs_tao = values
+
+        self.dividends += epoch_divs_tao
+        self.yield_product *= (1.0 + epoch_yield_ratio)
+        self._record(epoch_divs_tao)
+
+    def epoch_values(
+        self, delta_alpha_per_tao: float, stake_rao: float, price_tao_per_alpha: float
+    ) -> Optional[Tuple[float, float]]:
+        """(epoch_yield_ratio, epoch_divs_tao) of one event, None if it is skipped."""
+        # Stake (normalize to tao)
+        if stake_rao <= 0:
+            return None
+        stake_tao = stake_rao / RAO_PER_TAO
+
+        if (not self.no_filters) and (stake_tao < self.min_combined_stake):
+            return None
+
+        if price_tao_per_alpha <= 0:
+            return None
+
+        # Per-epoch values
+        epoch_yield_ratio = delta_alpha_per_tao * price_tao_per_alpha  # dimensionless
+        epoch_divs_tao    = (delta_alpha_per_tao * stake_tao) * price_tao_per_alpha
+        return epoch_yield_ratio, epoch_divs_tao
+
+
+class SubnetApyStream(_StreamingApy):
+    """
+    Incremental subnet APY calculation.
+
+    Data of each event is the dict fetched for the epoch (see subnet_calc) or -1 for a
+    failed query.
+    """
+
+    def _apply(self, data: Optional[dict]):
+        values = self.epoch_values(data)
+        if values is None:
+            self.skipped += 1
+            return
+        epoch_yield, alpha_div_raw = values
+
+        if alpha_div_raw == 0:
+            return
+
+        self.dividends     += alpha_div_raw
+        self.yield_product *= (1.0 + epoch_yield)
+
+        # Share of the inherited stake coming from parents, known when INHERITED is on
+        parent_share = None
+        inh_subnet_stake = data["inh_subnet_stake"]
+        if "alpha_from_parents" in data and inh_subnet_stake > 0:
+            parent_share = data["alpha_from_parents"] / inh_subnet_stake
+        self._record(alpha_div_raw, data["subnet_alpha_stake"], parent_share)
+
+    def epoch_values(self, data: Optional[dict]) -> Optional[Tuple[float, float]]:
+        """(epoch_yield, alpha_div_raw) of one epoch, None if it is skipped."""
+        if data == -1:
+            return None
+
+        subnet_alpha_stake = data["subnet_alpha_stake"]
+        root_stake_tao     = data["root_stake_tao"]
+        inh_root_stake     = data["inh_root_stake"]
+        inh_subnet_stake   = data["inh_subnet_stake"]
+        tao_weight_param   = data["tao_weight_param"]
+        alpha_div_raw      = data["alpha_div_raw"]
+
+        if alpha_div_raw == 0:
+            return 0.0, 0.0
+
+        # Apply filter (guards noisy/minuscule stake epochs)
+        if not self.no_filters and not has_enough_stake(
+            root_stake_tao, subnet_alpha_stake, inh_root_stake, inh_subnet_stake, tao_weight_param,
+            self.min_alpha_stake, self.min_combined_stake,
+        ):
+            return None
+
+        # AlphaDividendsPerSubnet now contains only pure subnet alpha dividends
+        # (root dividends moved to RootAlphaDividendsPerSubnet in subtensor v3.3.0-361)
+        denom = subnet_alpha_stake
+        if denom <= 0:
+            return None
+
+        return alpha_div_raw / denom, alpha_div_raw
@@ -1,20 +1,26 @@
 import asyncio
-import json
-from datetime import datetime
-from pathlib import Path
-from typing import Tuple, List, Dict
+from collections import Counter
+from contextlib import aclosing
+from typing import Callable, Iterator, Tuple, List, Dict, Optional
 from constants import BLOCK_SECONDS, INTERVAL_SECONDS, REQUIRED_BLOCKS_RATIO
 from bittensor import AsyncSubtensor
-from apy import calculate_interval_blocks, calculate_apy
+from dataset import subnet_row, subnet_writer
+from epoch_index import EpochIndex
+from events import count_epoch_events, iter_epoch_events
 from filter import has_enough_stake
 from helpers import (
-    calc_inherited_on_subnet,
+    as_completed_windowed,
+    calc_alpha_from_parents,
     get_children,
-    get_divs_for_hotkey_on_subnet,   # returns alpha units (scaled via Balance; name kept)
     get_parents,
-    get_stake_for_hotkey_on_subnet,   # netuid!=0 -> alpha stake; netuid==0 -> tao stake (root)
-    get_tao_weight,
+    get_subnet_epoch_values,
+    subnet_epoch_queries,
 )
+from options import DEFAULT_OPTIONS, CalcOptions
+from progressive import EstimateReporter, ProgressiveEstimate, van_der_corput
+from streaming import ApyResult, SubnetApyStream
+from take import TakeAccumulator, resolve_subnet_takes, subnet_effective_take
+from utils.deadline import Deadline
 
 
 def calculate_hotkey_subnet_apy(
@@ -40,50 +46,63 @@ def calculate_hotkey_subnet_apy(
     Returns:
         Tuple[float, float, float, int]: (apy_percent, divs_sum_alpha, period_yield, skipped)
     """
-    divs_sum_alpha = 0.0
-    yield_product = 1.0
-    skipped = 0
-
+    stream = SubnetApyStream(len(events), actual_interval_seconds, no_filters)
     for event_index, _ in enumerate(events):
-        data = results[event_index]
-        if data == -1:
-            skipped += 1
-            continue
-
-        subnet_alpha_stake = data["subnet_alpha_stake"]
-        root_stake_tao     = data["root_stake_tao"]
-        inh_root_stake     = data["inh_root_stake"]
-        inh_subnet_stake   = data["inh_subnet_stake"]
-        tao_weight_param   = data["tao_weight_param"]
-        alpha_div_raw      = data["alpha_div_raw"]
+        stream.feed(event_index, results[event_index])
 
-        if alpha_div_raw == 0:
-            continue
+    result = stream.result()
+    return result.apy, result.dividends, result.period_yield, result.skipped
 
-        # Apply filter (guards noisy/minuscule stake epochs)
-        if not no_filters and not has_enough_stake(
-            root_stake_tao, subnet_alpha_stake, inh_root_stake, inh_subnet_stake, tao_weight_param
-        ):
-            skipped += 1
-            continue
 
-        # AlphaDividendsPerSubnet now contains only pure subnet alpha dividends
-        # (root dividends moved to RootAlphaDividendsPerSubnet in subtensor v3.3.0-361)
-        denom = subnet_alpha_stake
-        if denom <= 0:
-            skipped += 1
-            continue
-
-        epoch_yield = alpha_div_raw / denom
+async def subnet_epoch_grid(
+    subtensor: AsyncSubtensor,
+    netuid: int,
+    block: int,
+    actual_interval_blocks: int,
+    batch_size: int = 100,
+    epoch_index: Optional[EpochIndex] = None,
+    schedule: Optional[Tuple[int, int]] = None,
+) -> Tuple[int, Callable[[], Iterator[Tuple[int, int, int]]]]:
+    """
+    Epoch window of a subnet ending at `block`: (number of epochs, factory of the
+    (block, netuid, period) events in chronological order).
 
-        divs_sum_alpha  += alpha_div_raw
-        yield_product   *= (1.0 + epoch_yield)
+    The last epoch block and period come from `epoch_index` if given, else from
+    `schedule` (last_epoch_block, period), else from subtensor.subnet().
+    """
+    if epoch_index is not None:
+        # Actual epoch blocks from the persisted index; period is the latest epoch distance
+        await epoch_index.update(subtensor, [netuid], block - actual_interval_blocks, block, batch_size)
+        last_epochs = epoch_index.last_epochs(netuid, block, 2)
+        if not len(last_epochs):
+            raise KeyError(f"Epoch index has no epochs of netuid {netuid} up to block {block}")
+        last_epoch_block = last_epochs[-1]
+        period = last_epochs[-1] - last_epochs[0] if len(last_epochs) == 2 else actual_interval_blocks
+    elif schedule is not None:
+        last_epoch_block, period = schedule
+    else:
+        subnet = await subtensor.subnet(netuid, block)
+        tempo = subnet.tempo
+        last_epoch_block = subnet.last_step
+        period = tempo + 1
 
-    period_yield = yield_product - 1.0
-    compounding_periods = INTERVAL_SECONDS["year"] / actual_interval_seconds
-    apy_percent = calculate_apy(period_yield, compounding_periods)
+    # FIX: Use exactly N epochs to ensure consistent event count
+    # Calculate expected number of epochs for this interval (floor division)
+    expected_epochs = actual_interval_blocks // period  # Floor division to get whole epochs
+    if expected_epochs < 1:
+        expected_epochs = 1  # At least 1 epoch
 
-    return apy_percent, divs_sum_alpha, period_yield, skipped
+    # Use exactly expected_epochs epochs as the window
+    # Start from last_epoch_block and go back (expected_epochs - 1) epochs
+    # This ensures we always get exactly expected_epochs events, in chronological order
+    start_block = last_epoch_block - (expected_epochs - 1) * period
+    if epoch_index is None:
+        schedules = [(netuid, last_epoch_block, period)]
+        return count_epoch_events(schedules, start_block), lambda: iter_epoch_events(schedules, start_block)
+    return (
+        epoch_index.count_events([netuid], start_block, last_epoch_block),
+        lambda: epoch_index.iter_events([netuid], start_block, last_epoch_block),
+    )
 
 
 async def retrieve_and_calculate_hotkey_subnet_apy(
@@ -96,7 +115,11 @@ async def retrieve_and_calculate_hotkey_subnet_apy(
     batch_size: int = 100,
     use_inherited_filer: bool = False,
     no_filters: bool = False,
-) -> Tuple[float, float]:
+    options: CalcOptions = DEFAULT_OPTIONS,
+    schedule: Optional[Tuple[int, int]] = None,
+    shared_values=None,
+    dividends_source=None,
+) -> ApyResult:
     """
     Subnet APY for a hotkey.
 
@@ -107,120 +130,277 @@ async def retrieve_and_calculate_hotkey_subnet_apy(
 
     Since subtensor v3.3.0 (spec 361), AlphaDividendsPerSubnet no longer
     includes root-originated dividends, so no root deduction is required.
+
+    Epochs are fetched with at most `batch_size` in flight and fed into a
+    SubnetApyStream as they arrive, so memory does not grow with the interval.
+
+    The settings below are read from `options` (see options.CalcOptions).
+
+    With `options.epoch_index`, the window is made of the actual epoch blocks recorded in the
+    index, so tempo changes inside the window are handled.
+
+    The effective take (see take.TakeAccumulator) is computed from the same epochs;
+    Delegates, ChildkeyTake, ParentKeys and ChildKeys are read only at change points,
+    concurrently with the epoch reads.
+
+    Reads are planned per epoch: dividends first, as most epochs of a sparse validator
+    have none and need nothing else; the stake next, with TaoWeight and the root stake
+    only when filters are on; parents, children and their stakes only when INHERITED is
+    on and the epoch fails the filter on its own stake. With `options.export_dir`, every filter
+    input of an epoch with dividends is read (the inherited stakes when INHERITED is on), so
+    the partition can be recomputed under any filter; epochs without dividends are
+    exported with zero stakes. The reads issued are reported and returned in result.reads.
+
+    With `options.raw_decode`, the values of each planning step are read in one storage call and
+    decoded directly from the raw bytes (see codec.py).
+
+    With `options.export_dir`, the fetched epoch values are also written to a columnar
+    partition there (see dataset.py) for offline recalculation.
+
+    `options.diagnostics` (see utils/diagnostics.py) records the time spent in the grid build,
+    epoch fetch, calculation and take phases.
+
+    With `options.progressive`, epochs are fetched in van der Corput order over the window and a
+    running estimate with a confidence bound is shown (see progressive.py). With a
+    `options.tolerance` (APY percentage points), fetching stops once the bound is below it and the
+    estimate is returned (result.error set, result.complete False); otherwise the exact
+    result is returned.
+
+    `schedule` (last_epoch_block, period) replaces the subtensor.subnet() read of the grid
+    (see subnet_epoch_grid). With `shared_values` (see all_subnets.SharedBlockValues), the
+    root stake and TaoWeight of the filter are taken from values shared with other
+    calculations of the same hotkey instead of being read per epoch. With a
+    `dividends_source` (see dividends.EpochDividends), the dividends are taken from the
+    per-epoch dividends of all hotkeys of the subnet, shared by every hotkey calculated
+    with it.
+
+    With `options.deadline` (seconds from the call), epochs are fetched in the progressive order.
+    When the budget runs out, the fetches in flight and the take reads are cancelled and the
+    estimate of the epochs fetched is returned (result.complete False, result.sufficient
+    tells whether its coverage reaches REQUIRED_BLOCKS_RATIO). A grid read still pending
+    then raises TimeoutError.
     """
 
     if netuid == 0:
         raise Exception('For root network use calculate_hotkey_root_apy() instead')
 
-    subnet = await subtensor.subnet(netuid, block)
-    tempo = subnet.tempo
-    last_epoch_block = subnet.last_step
-
-    interval_blocks = calculate_interval_blocks(tempo, interval)
-
     # Calculate the actual interval using INTERVAL_SECONDS (like root_calc.py)
     interval_seconds = INTERVAL_SECONDS[interval]
     actual_interval_blocks = int(interval_seconds / BLOCK_SECONDS)
     actual_interval_seconds = actual_interval_blocks * BLOCK_SECONDS
+    budget = Deadline(options.deadline)
+    progressive = options.progressive or options.deadline is not None
 
-    # FIX: Use exactly N epochs to ensure consistent event count
-    # Calculate expected number of epochs for this interval (floor division)
-    period = tempo + 1
-    expected_epochs = actual_interval_blocks // period  # Floor division to get whole epochs
-    if expected_epochs < 1:
-        expected_epochs = 1  # At least 1 epoch
-
-    # Use exactly expected_epochs epochs as the window
-    # Start from last_epoch_block and go back (expected_epochs - 1) epochs
-    # This ensures we always get exactly expected_epochs events
-    start_block = last_epoch_block - (expected_epochs - 1) * period
-
-    # Build list of epoch boundary blocks WITHIN the calculation window
-    # Collect exactly expected_epochs events in reverse chronological order (newest first)
-    # Then reverse to chronological (oldest first)
-    events: List[Dict] = []
-    epoch = last_epoch_block
-    for _ in range(expected_epochs):
-        events.append({"block": epoch, "netuid": netuid, "tempo": tempo})
-        epoch -= period
-        if epoch < start_block:
-            break  # Safety check
+    with options.diagnostics.phase("grid"):
+        total_events, make_events = await budget.require(
+            subnet_epoch_grid(subtensor, netuid, block, actual_interval_blocks, batch_size, options.epoch_index, schedule),
+            "grid build",
+        )
 
-    # Reverse to chronological order (oldest first)
-    events.reverse()
+    data_task = progress.add_task(f"[cyan]Fetching data for {hotkey}", total=total_events)
+
+    # Streaming fetch & calculation
+    stream = SubnetApyStream(total_events, actual_interval_seconds, no_filters)
+
+    # Storage reads issued per item
+    reads = Counter()
+    queries = subnet_epoch_queries(hotkey, netuid)
+
+    # Fields served by sources shared with other calculations instead of own storage reads
+    shared = {}
+    if shared_values is not None:
+        shared["root_stake_tao"] = shared_values.root_stake_tao
+        shared["tao_weight_param"] = shared_values.tao_weight
+    if dividends_source is not None:
+        shared["alpha_div_raw"] = lambda event_block: dividends_source.get(hotkey, netuid, event_block)
+
+    async def read_values(event_block: int, fields: List[str]) -> dict:
+        if not shared:
+            reads.update(queries[field][0] for field in fields)
+            return await get_subnet_epoch_values(subtensor, hotkey, netuid, event_block, fields, options.raw_decode)
+
+        own = [field for field in fields if field not in shared]
+        reads.update(queries[field][0] for field in own)
+        values, *shared_results = await asyncio.gather(
+            get_subnet_epoch_values(subtensor, hotkey, netuid, event_block, own, options.raw_decode) if own else asyncio.sleep(0, {}),
+            *[shared[field](event_block) for field in fields if field in shared],
+        )
+        values.update(zip([field for field in fields if field in shared], shared_results))
+        return values
 
-    data_task = progress.add_task(f"[cyan]Fetching data for {hotkey}", total=len(events))
+    async def read_inherited(event_block: int, root_stake_tao: float, subnet_alpha_stake: float) -> dict:
+        parents, children = await asyncio.gather(
+            get_parents(subtensor, hotkey, netuid, event_block),
+            get_children(subtensor, hotkey, netuid, event_block),
+        )
+        reads.update(["ParentKeys", "ChildKeys"] + ["TotalHotkeyAlpha"] * (2 * len(parents)))
+        root_from_parents, alpha_from_parents = await asyncio.gather(
+            calc_alpha_from_parents(subtensor, 0, parents, event_block),
+            calc_alpha_from_parents(subtensor, netuid, parents, event_block),
+        )
+        # Same as calc_inherited_on_subnet(), with the parents' stakes read once
+        return {
+            "inh_root_stake": root_stake_tao - int(sum(root_stake_tao * frac for frac, _ in children)) + int(root_from_parents),
+            "inh_subnet_stake": subnet_alpha_stake - int(sum(subnet_alpha_stake * frac for frac, _ in children)) + int(alpha_from_parents),
+            "alpha_from_parents": alpha_from_parents,
+        }
 
     async def query_data_with_progress(event_block: int, hotkey: str, netuid: int):
         """
-        Fetch all data for one epoch boundary:
-          - tao_weight (for filter)
-          - subnet_alpha_stake (alpha), root_stake_tao (tao on root, for filter)
-          - alpha_div_raw (alpha) from AlphaDividendsPerSubnet
-          - inherited stakes (optional)
+        Fetch the data of one epoch boundary that can change its outcome:
+          - alpha_div_raw (alpha) from AlphaDividendsPerSubnet; nothing else without dividends
+          - subnet_alpha_stake (alpha)
+          - tao_weight, root_stake_tao (tao on root), only for the filter
+          - inherited stakes, only when the epoch fails the filter on its own stake
         """
         try:
-            (
-                tao_weight_param,
-                subnet_alpha_stake,
-                root_stake_tao,
-                alpha_div_raw,
-            ) = await asyncio.gather(
-                get_tao_weight(subtensor, event_block),
-                get_stake_for_hotkey_on_subnet(subtensor, hotkey, netuid, event_block),
-                get_stake_for_hotkey_on_subnet(subtensor, hotkey, 0, event_block),
-                get_divs_for_hotkey_on_subnet(subtensor, hotkey, netuid, event_block),
-            )
-
-            inh_root_stake = 0.0
-            inh_subnet_stake = 0.0
-            if use_inherited_filer:
-                parents, children = await asyncio.gather(
-                    get_parents(subtensor, hotkey, netuid, event_block),
-                    get_children(subtensor, hotkey, netuid, event_block),
-                )
-                inh_root_stake, inh_subnet_stake = await asyncio.gather(
-                    calc_inherited_on_subnet(subtensor, root_stake_tao, 0, parents, children, event_block),
-                    calc_inherited_on_subnet(subtensor, subnet_alpha_stake, netuid, parents, children, event_block),
-                )
-
-            progress.update(data_task, advance=1)
-
-            return {
+            data = {
                 "block": event_block,
-                "tao_weight_param": tao_weight_param,
-                "alpha_div_raw": alpha_div_raw,
-                "root_stake_tao": root_stake_tao,
-                "subnet_alpha_stake": subnet_alpha_stake,
-                "inh_root_stake": inh_root_stake,
-                "inh_subnet_stake": inh_subnet_stake,
+                "tao_weight_param": 0.0,
+                "alpha_div_raw": 0.0,
+                "root_stake_tao": 0.0,
+                "subnet_alpha_stake": 0.0,
+                "inh_root_stake": 0.0,
+                "inh_subnet_stake": 0.0,
             }
+            data.update(await read_values(event_block, ["alpha_div_raw"]))
+
+            if data["alpha_div_raw"] != 0:
+                fields = ["subnet_alpha_stake"]
+                if not no_filters or options.export_dir:
+                    fields += ["root_stake_tao", "tao_weight_param"]
+                data.update(await read_values(event_block, fields))
+
+                if use_inherited_filer and (options.export_dir or (
+                    not no_filters
+                    and data["subnet_alpha_stake"] >= stream.min_alpha_stake
+                    and not has_enough_stake(
+                        data["root_stake_tao"], data["subnet_alpha_stake"], 0.0, 0.0, data["tao_weight_param"],
+                        stream.min_alpha_stake, stream.min_combined_stake,
+                    )
+                )):
+                    data.update(await read_inherited(event_block, data["root_stake_tao"], data["subnet_alpha_stake"]))
+
+            progress.update(data_task, advance=1)
+            return data
         except Exception as e:
             progress.update(data_task, advance=1)
             return -1
 
-    # Batch fetch
-    data_tasks = [lambda event=event: query_data_with_progress(event["block"], hotkey, netuid) for event in events]
-
-    results: List[dict] = []
-    for i in range(0, len(data_tasks), batch_size):
-        batch = data_tasks[i:i + batch_size]
-        batch_results = await asyncio.gather(*[task() for task in batch], return_exceptions=True)
-        results.extend([-1 if isinstance(r, Exception) else r for r in batch_results])
-
-    # ------------------------ Calculation ------------------------
-    apy_percent, divs_sum_alpha, period_yield, skipped = calculate_hotkey_subnet_apy(
-        events=events,
-        results=results,
-        actual_interval_seconds=actual_interval_seconds,
-        no_filters=no_filters,
+    # Effective take: the change-point reads of the takes run alongside the APY pass
+    stream.takes = TakeAccumulator()
+    takes_task = asyncio.ensure_future(resolve_subnet_takes(
+        subtensor, hotkey, netuid, (event_block for event_block, _, _ in make_events())
+    ))
+
+    async def fetch_event(event_index: int, event_block: int):
+        return event_index, event_block, await query_data_with_progress(event_block, hotkey, netuid)
+
+    if progressive:
+        estimate = ProgressiveEstimate({netuid: total_events}, actual_interval_seconds)
+        reporter = EstimateReporter(progress, estimate)
+        epoch_blocks = [event_block for event_block, _, _ in make_events()]
+        fetches = (
+            (lambda event_index=event_index: fetch_event(event_index, epoch_blocks[event_index]))
+            for event_index in van_der_corput(total_events)
+        )
+        hold = None
+    else:
+        estimate = None
+        fetches, hold = stream.backpressure((
+            (event_index, lambda event_index=event_index, event_block=event_block: fetch_event(event_index, event_block))
+            for event_index, (event_block, _, _) in enumerate(make_events())
+        ), batch_size)
+    writer = None
+    if options.export_dir:
+        writer = subnet_writer(options.export_dir, netuid, hotkey, interval, block, total_events, actual_interval_seconds)
+
+    async def consume() -> bool:
+        """Feed the fetched epochs as they arrive; True when stopped early at the tolerance."""
+        async with aclosing(as_completed_windowed(fetches, batch_size, hold)) as fetched_results:
+            async for fetched in fetched_results:
+                if isinstance(fetched, Exception):
+                    raise fetched
+                with options.diagnostics.phase("calculation"):
+                    event_index, event_block, data = fetched
+                    if writer is not None:
+                        writer.write(event_index, subnet_row(event_block, data))
+                    stream.feed(event_index, data)
+                    if estimate is not None:
+                        estimate.add(netuid, stream.epoch_values(data))
+                        reporter.update()
+                if options.tolerance is not None and estimate is not None and estimate.converged(options.tolerance):
+                    return estimate.processed < total_events
+        return False
+
+    stopped = True
+    expired = False
+    with options.diagnostics.phase("fetch"):
+        try:
+            stopped = await budget.run(consume())
+        except asyncio.TimeoutError:
+            # Closing the window cancelled the fetches in flight
+            expired = True
+        except BaseException:
+            # Failed or cancelled: the partial export is not kept
+            if writer is not None:
+                writer.discard()
+            raise
+        finally:
+            if stopped:
+                # Stopped early or raised: the take is not calculated
+                takes_task.cancel()
+
+    if stopped:
+        # Early answer: the estimate stands in for the exact result
+        result = estimate.result()
+        if expired:
+            progress.console.print(
+                f"[yellow]Deadline of {options.deadline}s reached after {result.processed}/{result.total} epochs: "
+                f"partial APY {result.apy:.6f}% ± {result.error:.6f}%, coverage "
+                f"{result.processed - result.skipped}/{result.total} ({result.coverage * 100:.2f}%) "
+                f"{'>=' if result.sufficient else '<'} required {REQUIRED_BLOCKS_RATIO * 100:.2f}%[/yellow]"
+            )
+        else:
+            progress.console.print(
+                f"Stopped after {result.processed}/{result.total} epochs: "
+                f"APY {result.apy:.6f}% ± {result.error:.6f}% (tolerance {options.tolerance}%)"
+            )
+        if writer is not None:
+            writer.discard()
+            progress.console.print("[yellow]Export skipped: the run stopped before all epochs were fetched.[/yellow]")
+    else:
+        if writer is not None:
+            writer.close()
+            progress.console.print(f"Exported epoch data to {writer.path}")
+
+        result = stream.result()
+        try:
+            with options.diagnostics.phase("take"):
+                stream.takes.locate(event_block for event_block, _, _ in make_events())
+                result.take = await budget.run(
+                    subnet_effective_take(subtensor, netuid, stream.takes, await budget.run(takes_task))
+                )
+        except asyncio.TimeoutError:
+            progress.console.print(f"[yellow]Deadline of {options.deadline}s reached before the effective take was resolved.[/yellow]")
+        except Exception as e:
+            progress.console.print(f"[yellow]Could not calculate the effective take: {e}[/yellow]")
+    apy_percent, divs_sum_alpha, period_yield, skipped = (
+        result.apy, result.dividends, result.period_yield, result.skipped
+    )
+
+    result.reads = dict(reads)
+    progress.console.print(
+        f"Storage reads: {sum(reads.values())} for {result.processed} epochs ("
+        + ", ".join(f"{name}: {count}" for name, count in reads.most_common())
+        + ")"
     )
 
-    if skipped > 0:
+    if skipped > 0 and not stopped:
         progress.console.print(
             f"[yellow]Skipped {skipped} events due to query failures, filters, or invalid denominators.[/yellow]"
         )
-        if len(events) - skipped < REQUIRED_BLOCKS_RATIO * len(events):
+        if result.coverage < REQUIRED_BLOCKS_RATIO:
             progress.console.print(
                 f"[yellow]Coverage is less than: {REQUIRED_BLOCKS_RATIO * 100:.6f}% and can lead to inaccurate results.[/yellow]"
             )
@@ -228,5 +408,7 @@ async def retrieve_and_calculate_hotkey_subnet_apy(
     progress.console.print(f"{interval} percentage yield: {period_yield * 100:.6f}%")
     progress.console.print(f"{interval} subnet divs [alpha]: {divs_sum_alpha:.6f}")
     progress.console.print(f"apy: {apy_percent:.6f}%")
+    if result.take is not None:
+        progress.console.print(f"effective take: {result.take * 100:.6f}%")
 
-    return apy_percent, divs_sum_alpha
+    return result
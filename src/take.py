@@ -0,0 +1,178 @@
+import asyncio
+import math
+from array import array
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from bittensor.utils import u16_normalized_float
+
+from helpers import calc_alpha_from_parents, get_children, get_childkey_take, get_parents, query_subtensor
+
+
+async def get_delegate_take(subtensor, hotkey, block):
+    return u16_normalized_float(await query_subtensor(subtensor, "Delegates", block, [hotkey]) or 0)
+
+async def get_childkey_take_float(subtensor, hotkey, netuid, block):
+    return u16_normalized_float(await get_childkey_take(subtensor, hotkey, netuid, block) or 0)
+
+
+class Piecewise:
+    """Value of a storage item over a block range, kept as its change points only."""
+
+    __slots__ = ("blocks", "values")
+
+    def __init__(self, changes: List[Tuple[int, Any]]):
+        self.blocks = [block for block, _ in changes]
+        self.values = [value for _, value in changes]
+
+    def at(self, block: int):
+        """Value at block (the one of the first change point for a block before it)."""
+        return self.values[max(bisect_right(self.blocks, block) - 1, 0)]
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+
+def block_range(blocks: Iterable[int]) -> List[int]:
+    """[first, last] of the sorted `blocks` (consumed lazily), [] if there are none."""
+    first_block = last_block = None
+    for last_block in blocks:
+        if first_block is None:
+            first_block = last_block
+    return [] if first_block is None else [first_block, last_block]
+
+
+async def resolve_piecewise(fetch: Callable[[int], Awaitable], blocks: Iterable[int]) -> Piecewise:
+    """
+    A rarely changing storage item over the blocks of `blocks` (sorted, consumed lazily),
+    read only around change points: the first and last block are read and a block range
+    is bisected only while its ends differ, so a constant value costs 2 reads and each
+    change about log2 of the range. A value that changes and reverts between two reads of
+    equal value is not seen.
+    """
+    bounds = block_range(blocks)
+    if not bounds:
+        return Piecewise([])
+    first_block, last_block = bounds
+    changes = []
+
+    async def solve(lo: int, hi: int, lo_value, hi_value):
+        if lo_value == hi_value:
+            return
+        if hi - lo <= 1:
+            changes.append((hi, hi_value))
+            return
+        mid = (lo + hi) // 2
+        mid_value = await fetch(mid)
+        await asyncio.gather(solve(lo, mid, lo_value, mid_value), solve(mid, hi, mid_value, hi_value))
+
+    if first_block == last_block:
+        return Piecewise([(first_block, await fetch(first_block))])
+    first, last = await asyncio.gather(fetch(first_block), fetch(last_block))
+    await solve(first_block, last_block, first, last)
+    return Piecewise([(first_block, first)] + sorted(changes, key=lambda change: change[0]))
+
+
+class TakeAccumulator:
+    """
+    Effective take of a hotkey over the window.
+
+    The share of an epoch's dividends kept by the hotkey owner is
+        parent_share * childkey_take + (1 - parent_share) * delegate_take
+    where parent_share is the part of the hotkey's inherited stake that comes from its
+    parents (childkey take applies to it, delegate take to the rest). The effective take
+    is the dividend-weighted mean over the window.
+
+    The dividends, stake and parent share of the epochs with dividends (the others do not
+    count) are recorded by event position while the APY pass runs, locate() then gives
+    them their blocks from one more pass over the events. The takes are resolved
+    concurrently with resolve_piecewise() and combined in result().
+    """
+
+    __slots__ = ("events", "blocks", "divs", "stakes", "parent_shares")
+
+    def __init__(self):
+        self.events = array("q")
+        self.blocks = array("q")
+        self.divs = array("d")
+        self.stakes = array("d")
+        self.parent_shares = array("d")
+
+    def add(self, idx: int, divs: float, stake: float = 0.0, parent_share: Optional[float] = None):
+        """Record event `idx`; events are added in order."""
+        if divs <= 0:
+            return
+        self.events.append(idx)
+        self.divs.append(divs)
+        self.stakes.append(stake)
+        self.parent_shares.append(math.nan if parent_share is None else parent_share)
+
+    def locate(self, blocks: Iterable[int]):
+        """Blocks of the recorded events from the blocks of all events, in order."""
+        self.blocks = array("q")
+        events = iter(self.events)
+        wanted = next(events, None)
+        for idx, block in enumerate(blocks):
+            if wanted is None:
+                break
+            if idx == wanted:
+                self.blocks.append(block)
+                wanted = next(events, None)
+
+    def result(self, delegate_takes: Piecewise, childkey_takes: Optional[Piecewise] = None) -> Optional[float]:
+        total_divs = 0.0
+        kept_divs = 0.0
+        for block, divs, parent_share in zip(self.blocks, self.divs, self.parent_shares):
+            if math.isnan(parent_share) or childkey_takes is None:
+                parent_share = 0.0
+            take = (
+                parent_share * (childkey_takes.at(block) if childkey_takes else 0.0)
+                + (1 - parent_share) * delegate_takes.at(block)
+            )
+            total_divs += divs
+            kept_divs += divs * take
+        return kept_divs / total_divs if total_divs > 0 else None
+
+
+async def resolve_subnet_takes(subtensor, hotkey: str, netuid: int, blocks: Iterable[int]):
+    """
+    Delegate take, childkey take, parents and children of the hotkey over the blocks,
+    read only at change points. Meant to run concurrently with the APY pass.
+    """
+    bounds = block_range(blocks)
+    return await asyncio.gather(
+        resolve_piecewise(lambda b: get_delegate_take(subtensor, hotkey, b), bounds),
+        resolve_piecewise(lambda b: get_childkey_take_float(subtensor, hotkey, netuid, b), bounds),
+        resolve_piecewise(lambda b: get_parents(subtensor, hotkey, netuid, b), bounds),
+        resolve_piecewise(lambda b: get_children(subtensor, hotkey, netuid, b), bounds),
+    )
+
+
+async def subnet_effective_take(subtensor, netuid: int, takes: TakeAccumulator, resolved) -> Optional[float]:
+    """
+    Effective take from the recorded epochs and the resolve_subnet_takes() result.
+
+    Epochs without a known parent share (INHERITED off) get it from the resolved
+    parents and children; parent stakes are read only for epochs with dividends in
+    which the hotkey actually has parents.
+    """
+    delegate_takes, childkey_takes, parents, children = resolved
+
+    async def fill_parent_share(idx: int):
+        block = takes.blocks[idx]
+        alpha_from_parents = await calc_alpha_from_parents(subtensor, netuid, parents.at(block), block)
+        stake = takes.stakes[idx]
+        inherited = stake - sum(stake * frac for frac, _ in children.at(block)) + alpha_from_parents
+        takes.parent_shares[idx] = alpha_from_parents / inherited if inherited > 0 else 0.0
+
+    await asyncio.gather(*[
+        fill_parent_share(idx)
+        for idx, block in enumerate(takes.blocks)
+        if parents.at(block) and math.isnan(takes.parent_shares[idx])
+    ])
+    return takes.result(delegate_takes, childkey_takes)
+
+
+async def resolve_root_takes(subtensor, hotkey: str, blocks: Iterable[int]):
+    """Delegate take of the hotkey over the blocks, read only at change points."""
+    return await resolve_piecewise(lambda b: get_delegate_take(subtensor, hotkey, b), blocks)
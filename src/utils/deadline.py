@@ -0,0 +1,49 @@
+"""
+Wall-clock budget of a calculation.
+
+A Deadline starts when it is created. Awaiting through run() bounds a step by the time
+left; when the budget runs out the step is cancelled (with whatever tasks it was awaiting)
+and asyncio.TimeoutError is raised, so the caller can return what it has. Without a
+limit, run() just awaits.
+"""
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """Budget of `seconds` from now; None means no limit."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self._at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (0 when expired), None without a limit."""
+        if self._at is None:
+            return None
+        return max(self._at - time.monotonic(), 0.0)
+
+    def share(self, parts: int) -> Optional[float]:
+        """Time left split evenly over `parts` steps still to run, None without a limit."""
+        remaining = self.remaining()
+        return None if remaining is None else remaining / max(parts, 1)
+
+    @property
+    def expired(self) -> bool:
+        return self._at is not None and time.monotonic() >= self._at
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await within the time left; asyncio.TimeoutError when it runs out."""
+        if self._at is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.remaining())
+
+    async def require(self, awaitable: Awaitable[T], step: str) -> T:
+        """run() for a step nothing can be computed without: TimeoutError naming the step."""
+        try:
+            return await self.run(awaitable)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Deadline of {self.seconds}s reached during the {step}, nothing to compute") from None
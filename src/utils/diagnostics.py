@@ -0,0 +1,175 @@
+"""
+Opt-in run diagnostics: event-loop lag, time per phase and profiling.
+
+Phases are measured with wall and process CPU time. For a synchronous section (decoding,
+stream.feed) the CPU time is the section's own; for a span containing awaits it includes
+whatever else the loop ran meanwhile, so a fetch phase with wall >> CPU is waiting on the
+node, and a large CPU share or loop lag means the loop is starved.
+
+When diagnostics are off the calculators get NO_DIAGNOSTICS, whose phase() returns one
+shared no-op context manager.
+"""
+import asyncio
+import cProfile
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up a task sleeping `interval` seconds."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - start - self.interval, 0.0))
+
+    def stats(self) -> Dict[str, float]:
+        if not self.lags:
+            return {"samples": 0}
+        lags = sorted(self.lags)
+        return {
+            "samples": len(lags),
+            "mean": statistics.fmean(lags),
+            "p50": lags[len(lags) // 2],
+            "p99": lags[min(int(len(lags) * 0.99), len(lags) - 1)],
+            "max": lags[-1],
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the profiled thread every `interval` seconds from a background
+    thread and writes it as collapsed stacks ("outer;inner count" per line), the input
+    format of flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Diagnostics:
+    """Time per phase, event-loop lag and an optional profiler around a run."""
+
+    def __init__(self, profile: Optional[str] = None, profile_output: Optional[str] = None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiler '{profile}', use one of: {', '.join(PROFILE_MODES)}")
+        self.phases: Dict[str, List[float]] = {}
+        self.monitor = LoopLagMonitor()
+        self.profile = profile
+        self.profile_output = profile_output or (
+            "apy-profile.prof" if profile == "cprofile" else "apy-profile.folded"
+        )
+        self._profiler = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Accumulate wall and CPU time of the block under `name`."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += time.perf_counter() - wall
+            totals[2] += time.process_time() - cpu
+
+    async def __aenter__(self):
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "sample":
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        self.monitor.start()
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.phases["total"] = [1, time.perf_counter() - self._wall, time.process_time() - self._cpu]
+        await self.monitor.stop()
+        if isinstance(self._profiler, cProfile.Profile):
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_output)
+        elif self._profiler is not None:
+            self._profiler.stop()
+            self._profiler.write(self.profile_output)
+        return False
+
+    def report(self, console):
+        console.print("\n[b]Diagnostics[/b]")
+        for name, (calls, wall, cpu) in self.phases.items():
+            console.print(f"{name:>12}: {calls:>7} calls {wall:10.3f}s wall {cpu:10.3f}s cpu")
+        lag = self.monitor.stats()
+        if lag["samples"]:
+            console.print(
+                f"{'loop lag':>12}: {lag['samples']:>7} samples "
+                f"mean {lag['mean'] * 1000:.2f}ms p50 {lag['p50'] * 1000:.2f}ms "
+                f"p99 {lag['p99'] * 1000:.2f}ms max {lag['max'] * 1000:.2f}ms"
+            )
+        if self.profile:
+            console.print(f"{'profile':>12}: {self.profile_output}")
+
+
+class NoDiagnostics:
+    _phase = nullcontext()
+
+    def phase(self, name: str):
+        return self._phase
+
+
+NO_DIAGNOSTICS = NoDiagnostics()
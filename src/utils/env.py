@@ -1,12 +1,80 @@
 import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
 
 OTF_ARCHIVE_NODE = "wss://archive.chain.opentensor.ai:443"
 
-def parse_env_data():
+
+@dataclass
+class EnvConfig:
+    """Settings read from the environment (see the README's environment table)."""
+
+    node: str
+    batch_size: int
+    use_inherited_filter: bool
+    no_filters: bool
+    epoch_index_path: Optional[str]
+    headless: bool
+    raw_decode: bool
+    export_dir: Optional[str]
+    diagnostics: bool
+    profile: Optional[str]
+    profile_output: Optional[str]
+    progressive: bool
+    tolerance: Optional[float]
+    rpc_batch: int
+    rpc_batch_wait: float  # seconds
+    store_path: Optional[str]
+    dividends_source: Optional[str]
+    dividends_check: bool
+
+
+def parse_env_data() -> EnvConfig:
     node = os.getenv("NODE") or OTF_ARCHIVE_NODE
     batch_size = os.getenv("BATCH_SIZE") or 100
     use_inherited_filter = os.getenv("INHERITED", 'False').lower() in ('true', '1', 't') or False
     no_filters = os.getenv("NO_FILTERS", 'False').lower() in ('true', '1', 't')
+    epoch_index_path = os.getenv("EPOCH_INDEX") or None
+    headless = os.getenv("HEADLESS", 'False').lower() in ('true', '1', 't')
+    raw_decode = os.getenv("RAW_DECODE", 'False').lower() in ('true', '1', 't')
+    export_dir = os.getenv("EXPORT_DIR") or None
+    diagnostics = os.getenv("DIAGNOSTICS", 'False').lower() in ('true', '1', 't')
+    profile = os.getenv("PROFILE") or None
+    profile_output = os.getenv("PROFILE_OUTPUT") or None
+    tolerance = os.getenv("TOLERANCE") or None
+    if tolerance is not None:
+        try:
+            tolerance = float(tolerance)
+        except ValueError:
+            tolerance = 0.0
+        if tolerance <= 0:
+            print("Error: TOLERANCE needs a positive number of APY percentage points")
+            sys.exit(1)
+    progressive = os.getenv("PROGRESSIVE", 'False').lower() in ('true', '1', 't') or tolerance is not None
+    rpc_batch = os.getenv("RPC_BATCH") or 0
+    rpc_batch_wait = os.getenv("RPC_BATCH_WAIT") or 1
+    store_path = os.getenv("STORE") or None
+    dividends_check = os.getenv("DIVIDENDS_CHECK", 'False').lower() in ('true', '1', 't')
+    dividends_source = os.getenv("DIVIDENDS_SOURCE") or ("map" if dividends_check else None)
 
-
-    return [node, int(batch_size), bool(use_inherited_filter), bool(no_filters)]
+    return EnvConfig(
+        node=node,
+        batch_size=int(batch_size),
+        use_inherited_filter=bool(use_inherited_filter),
+        no_filters=bool(no_filters),
+        epoch_index_path=epoch_index_path,
+        headless=bool(headless),
+        raw_decode=bool(raw_decode),
+        export_dir=export_dir,
+        diagnostics=bool(diagnostics),
+        profile=profile,
+        profile_output=profile_output,
+        progressive=bool(progressive),
+        tolerance=tolerance,
+        rpc_batch=int(rpc_batch),
+        rpc_batch_wait=float(rpc_batch_wait) / 1000,
+        store_path=store_path,
+        dividends_source=dividends_source,
+        dividends_check=bool(dividends_check),
+    )
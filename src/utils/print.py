@@ -1,3 +1,4 @@
+import json
 import math
 
 from rich.console import Console
@@ -17,13 +18,29 @@ def format_float(value: float, decimals: int, floor: bool = True) -> str:
     return f"{value:.{decimals}f}"
 
 
-def print_results(results: list[list[float | None, float | None]], netuid: int, hotkey: str):
+def print_results(results: list[list[float | None, float | None]], netuid: int, hotkey: str, as_json: bool = False):
+    """
+    Prints the result row [apy, divs], [apy, divs, take] or
+    [apy, divs, take, coverage, complete, sufficient] as a table, or as one JSON object;
+    coverage, complete and sufficient (coverage reaches the required ratio) are only shown
+    when given.
+    """
+    if as_json:
+        row = list(results[0]) if results and results[0] else []
+        [apy, divs, take] = (row + [None] * 3)[:3]
+        output = {"netuid": netuid, "hotkey": hotkey, "apy": apy, "dividends": divs, "take": take}
+        if len(row) > 3:
+            output.update(coverage=row[3], complete=row[4], sufficient=row[5])
+        print(json.dumps(output), flush=True)
+        return
+
     if not results or not results[0]:
         console = Console()
         console.print("[i]No data found for this hotkey...[/i]")
         return
 
-    [apy, divs] = results[0]
+    row = list(results[0])
+    [apy, divs, take] = (row + [None])[:3]
     
     table = Table(caption_style="white i")
     table.add_column("Metric", justify="right", style="blue")
@@ -54,7 +71,55 @@ def print_results(results: list[list[float | None, float | None]], netuid: int,
     table.add_row("Hotkey", hotkey)
     table.add_row("APY", formatted_apy)
     table.add_row("Dividends", formatted_divs)
+    table.add_row("Effective take", "N/A" if take is None else f"{format_float(take * 100, 2)}%")
+    if len(row) > 3:
+        table.add_row("Coverage", f"{format_float(row[3] * 100, 2)}%" + ("" if row[4] else " (partial)"))
 
     console = Console()
     console.print("\n")
     console.print(table)
+
+
+def print_all_results(results: dict, hotkey: str, as_json: bool = False):
+    """
+    Prints one row per netuid of {netuid: ApyResult or None} (root is 0) as a table, or one
+    JSON object per line with the keys of print_results().
+    """
+    if as_json:
+        for netuid, result in results.items():
+            output = {"netuid": netuid, "hotkey": hotkey, "apy": None, "dividends": None, "take": None,
+                      "coverage": None, "complete": False, "sufficient": False}
+            if result is not None:
+                output.update(apy=result.apy, dividends=result.dividends, take=result.take,
+                              coverage=result.coverage, complete=result.complete, sufficient=result.sufficient)
+            print(json.dumps(output), flush=True)
+        return
+
+    console = Console()
+    if not results:
+        console.print("[i]No data found for this hotkey...[/i]")
+        return
+
+    table = Table(title=hotkey, caption_style="white i")
+    table.add_column("Subnet", justify="right", style="blue")
+    table.add_column("APY", justify="right", style="magenta")
+    table.add_column("Dividends", justify="right", style="magenta")
+    table.add_column("Effective take", justify="right", style="magenta")
+    table.add_column("Coverage", justify="right", style="magenta")
+
+    for netuid, result in results.items():
+        subnet = "Root Network" if netuid == 0 else f"Subnet {netuid}"
+        if result is None:
+            table.add_row(subnet, "N/A", "N/A", "N/A", "N/A")
+            continue
+        unit = "𝞃" if netuid == 0 else "α"
+        table.add_row(
+            subnet,
+            f"{format_float(result.apy, 2)}%" if result.apy >= 0.01 else "<0.01%",
+            f"{format_float(result.dividends, 6)}{unit}" if result.dividends >= 0.000001 else f"<0.000001{unit}",
+            "N/A" if result.take is None else f"{format_float(result.take * 100, 2)}%",
+            f"{format_float(result.coverage * 100, 2)}%" + ("" if result.complete else " (partial)"),
+        )
+
+    console.print("\n")
+    console.print(table)
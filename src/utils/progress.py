@@ -0,0 +1,95 @@
+import sys
+import time
+
+from rich.text import Text
+
+
+class HeadlessConsole:
+    """Console replacement printing plain text (rich markup stripped) to stderr."""
+
+    def __init__(self, file=None):
+        self.file = file or sys.stderr
+
+    def print(self, *objects, **kwargs):
+        text = " ".join(Text.from_markup(o).plain if isinstance(o, str) else str(o) for o in objects)
+        print(text, file=self.file, flush=True)
+
+
+class HeadlessProgress:
+    """
+    Drop-in replacement of rich's Progress for non-interactive runs.
+
+    update() only adds to an integer counter; a one-line status for every task is
+    written at most once per `interval` seconds, so the event loop spends no time on
+    terminal rendering and there is no refresh thread competing for the GIL.
+    """
+
+    def __init__(self, interval: float = 5.0, file=None):
+        self.console = HeadlessConsole(file)
+        self.interval = interval
+        self._tasks = []
+        self._next_flush = time.monotonic() + interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def add_task(self, description: str, total=None, **kwargs) -> int:
+        self._tasks.append([Text.from_markup(description).plain, total, 0])
+        return len(self._tasks) - 1
+
+    def update(self, task_id: int, advance: int = 0, description=None, **kwargs):
+        self._tasks[task_id][2] += advance
+        if description is not None:
+            self._tasks[task_id][0] = Text.from_markup(description).plain
+        if self.interval and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        self._next_flush = time.monotonic() + self.interval
+        for description, total, completed in self._tasks:
+            self.console.print(f"{description}: {completed}/{total if total is not None else '?'}")
+
+
+class CallbackConsole:
+    """Console replacement passing plain text (rich markup stripped) to `log`, or dropping it."""
+
+    def __init__(self, log=None):
+        self.log = log
+
+    def print(self, *objects, **kwargs):
+        if self.log is not None:
+            self.log(" ".join(Text.from_markup(o).plain if isinstance(o, str) else str(o) for o in objects))
+
+
+class CallbackProgress:
+    """
+    Progress replacement for library use: nothing is rendered, every update() calls
+    `on_update(description, completed, total)` when given and console output goes to `log`.
+    """
+
+    def __init__(self, on_update=None, log=None):
+        self.console = CallbackConsole(log)
+        self.on_update = on_update
+        self._tasks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_task(self, description: str, total=None, **kwargs) -> int:
+        self._tasks.append([Text.from_markup(description).plain, total, 0])
+        return len(self._tasks) - 1
+
+    def update(self, task_id: int, advance: int = 0, description=None, **kwargs):
+        task = self._tasks[task_id]
+        task[2] += advance
+        if description is not None:
+            task[0] = Text.from_markup(description).plain
+        if self.on_update is not None:
+            self.on_update(*task)
@@ -0,0 +1,101 @@
+"""
+Shared fixtures: a small in-memory chain standing in for AsyncSubtensor.
+
+A ChainStub serves the subnets of `tempos` with epochs at the blocks where
+(block + netuid) % (tempo + 1) == 0, block hashes equal to the block numbers and
+finalized head `finalized`. Storage values come from value() and the entries of
+query_map_subtensor from entries(), which the test modules override; every read is
+counted in `reads`.
+"""
+import io
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from bittensor import Balance
+
+from src.utils.progress import HeadlessProgress
+
+HEAD = 100_000
+TEMPO = 360
+TEMPOS = {1: 99, 2: 360, 3: 360}
+RAO = 10**9
+HOTKEYS = ("hk-a", "hk-b", "hk-c")
+
+
+def dividends(hotkey, block):
+    """Subnet dividends of the HOTKEYS at every other epoch of TEMPO, growing with the hotkey."""
+    return (HOTKEYS.index(hotkey) + 1) * RAO if (block // (TEMPO + 1)) % 2 else 0
+
+
+class Substrate:
+    def __init__(self, chain):
+        self.chain = chain
+
+    async def get_chain_finalised_head(self):
+        return self.chain.finalized
+
+    async def get_block_number(self, block_hash):
+        return block_hash
+
+    async def get_block_hash(self, block):
+        return block
+
+
+class ChainStub:
+    """AsyncSubtensor stand-in (see module docstring)."""
+
+    tempos = {1: TEMPO}
+
+    def __init__(self, finalized=HEAD):
+        self.finalized = finalized
+        self.reads = Counter()
+        self.substrate = Substrate(self)
+
+    def last_step(self, netuid, block):
+        return block - (block + netuid) % (self.tempos[netuid] + 1)
+
+    def value(self, name, params, block):
+        """Value of the storage item name[params] at block, None if unset."""
+        return None
+
+    def entries(self, name, params, block):
+        """(key, value) entries of the storage map name[params, *] at block."""
+        return []
+
+    async def get_all_subnets_info(self, block=None):
+        self.reads["SubnetsInfo"] += 1
+        return [
+            SimpleNamespace(netuid=netuid, tempo=tempo, blocks_since_epoch=block - self.last_step(netuid, block))
+            for netuid, tempo in self.tempos.items()
+        ]
+
+    async def get_all_subnets_netuid(self, block=None):
+        return list(self.tempos)
+
+    async def subnet(self, netuid, block=None):
+        self.reads["Subnet"] += 1
+        return SimpleNamespace(tempo=self.tempos[netuid], last_step=self.last_step(netuid, block))
+
+    async def query_subtensor(self, name, params=None, block=None):
+        self.reads[name] += 1
+        return SimpleNamespace(value=self.value(name, params, block))
+
+    async def query_map_subtensor(self, name, params=None, block=None):
+        self.reads[f"{name} map"] += 1
+        entries = self.entries(name, params, block)
+
+        async def records():
+            for key, value in entries:
+                yield key, SimpleNamespace(value=value)
+        return records()
+
+    async def get_subnet_price(self, netuid, block=None):
+        self.reads["SubnetPrice"] += 1
+        return Balance.from_tao(0.01 * netuid)
+
+
+@pytest.fixture
+def progress():
+    """progress(out=None): a silent HeadlessProgress, writing to `out` if given."""
+    return lambda out=None: HeadlessProgress(interval=0, file=out or io.StringIO())
@@ -0,0 +1,119 @@
+"""
+Tests for the all-subnets mode.
+"""
+import asyncio
+from collections import Counter
+
+import pytest
+
+from src.all_subnets import SharedBlockValues, retrieve_and_calculate_hotkey_all_apy
+from src.options import CalcOptions
+from src.root_calc import retrieve_and_calculate_hotkey_root_apy
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import HEAD, RAO, TEMPOS
+from tests.conftest import ChainStub as BaseChain
+
+
+class ChainStub(BaseChain):
+    """Stake on subnets 1 and 3 only; dividends on odd blocks. `keyed_reads` counts reads by (name, params)."""
+
+    tempos = TEMPOS
+
+    def __init__(self):
+        super().__init__()
+        self.keyed_reads = Counter()
+
+    def entries(self, name, params, block):
+        return [(netuid, 0 if netuid == 2 else 5000 * RAO) for netuid in (0, 1, 2, 3)]
+
+    async def subnet(self, netuid, block=None):
+        raise AssertionError("the schedule comes from get_all_subnets_info")
+
+    async def query_subtensor(self, name, params=None, block=None):
+        self.keyed_reads[(name, tuple(params or ()))] += 1
+        return await super().query_subtensor(name, params, block)
+
+    def value(self, name, params, block):
+        if name == "RootClaimable":
+            return [[(netuid, {"bits": block * 1000 * netuid}) for netuid in TEMPOS]]
+        if name == "TotalHotkeyAlpha":
+            return 5000 * RAO + block
+        if name == "AlphaDividendsPerSubnet":
+            return RAO if block % 2 else 0
+        if name == "TaoWeight":
+            return 2**63
+        if name == "Delegates":
+            return 11796
+        return None
+
+
+@pytest.mark.unit
+def test_all_subnets_match_separate_runs(progress):
+    chain = ChainStub()
+    results = asyncio.run(retrieve_and_calculate_hotkey_all_apy(chain, "hk", "7d", HEAD, progress()))
+    assert list(results) == [0, 1, 3]
+
+    async def separate():
+        info = {subnet.netuid: subnet for subnet in await chain.get_all_subnets_info(HEAD)}
+        out = {0: await retrieve_and_calculate_hotkey_root_apy(chain, "hk", "7d", HEAD, progress())}
+        for netuid in (1, 3):
+            schedule = (HEAD - info[netuid].blocks_since_epoch, info[netuid].tempo + 1)
+            out[netuid] = await retrieve_and_calculate_hotkey_subnet_apy(
+                chain, netuid, "hk", "7d", HEAD, progress(), schedule=schedule
+            )
+        return out
+
+    expected = asyncio.run(separate())
+    for netuid, result in results.items():
+        assert result.apy == pytest.approx(expected[netuid].apy)
+        assert result.dividends == pytest.approx(expected[netuid].dividends)
+        assert result.skipped == expected[netuid].skipped
+
+
+@pytest.mark.unit
+def test_root_stake_and_tao_weight_are_read_once(progress):
+    chain = ChainStub()
+    results = asyncio.run(retrieve_and_calculate_hotkey_all_apy(chain, "hk", "7d", HEAD, progress()))
+
+    # Subnet epochs reuse the root stakes read by the root pass
+    root_blocks = chain.keyed_reads[("RootClaimable", ("hk",))] - 1
+    assert chain.keyed_reads[("TotalHotkeyAlpha", ("hk", 0))] == root_blocks
+    assert chain.keyed_reads[("TaoWeight", ())] == 2
+    assert "TaoWeight" not in results[1].reads
+    assert "TotalHotkeyAlpha" in results[1].reads
+
+
+@pytest.mark.unit
+def test_shared_values_read_concurrent_requests_once():
+    chain = ChainStub()
+
+    async def run():
+        shared = SharedBlockValues(chain, "hk", [10, 20])
+        stakes = await asyncio.gather(*[shared.root_stake_tao(10) for _ in range(5)])
+        shared.put_root_stake(20, 7 * RAO)
+        return shared, stakes, await shared.root_stake_tao(20)
+
+    shared, stakes, put = asyncio.run(run())
+    assert stakes == [pytest.approx(5000 + 10 / RAO)] * 5
+    assert put == 7
+    assert shared.reads == {"TotalHotkeyAlpha": 1}
+    assert shared.hits == 5
+
+
+@pytest.mark.unit
+def test_deadline_is_split_over_root_and_subnets(progress):
+    class StallingChain(ChainStub):
+        """The epoch reads of every calculation after its first 10 never complete."""
+
+        async def query_subtensor(self, name, params=None, block=None):
+            if name in ("RootClaimable", "AlphaDividendsPerSubnet") and self.keyed_reads[(name, tuple(params))] >= 10:
+                await asyncio.Event().wait()
+            return await super().query_subtensor(name, params, block)
+
+    results = asyncio.run(retrieve_and_calculate_hotkey_all_apy(
+        StallingChain(), "hk", "7d", HEAD, progress(), batch_size=2, options=CalcOptions(deadline=0.6)
+    ))
+
+    assert list(results) == [0, 1, 3]
+    # Root used its share only: every subnet still got one
+    assert all(result is not None and 0 < result.processed < result.total for result in results.values())
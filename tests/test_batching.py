@@ -0,0 +1,94 @@
+"""
+Tests for the batching websocket against a local stand-in JSON-RPC server.
+"""
+import asyncio
+import json
+import logging
+
+import pytest
+from async_substrate_interface import AsyncSubstrateInterface
+from websockets.asyncio.server import serve
+
+from src.batching import BatchingWebsocket, install_batching
+
+
+class StandInServer:
+    """Echoes the first param back; answers batches in reverse order to check demultiplexing."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def handler(self, connection):
+        async for message in connection:
+            request = json.loads(message)
+            self.frames.append(len(request) if isinstance(request, list) else 1)
+            if isinstance(request, list):
+                await connection.send(json.dumps([self.answer(r) for r in reversed(request)]))
+            else:
+                await connection.send(json.dumps(self.answer(request)))
+
+    @staticmethod
+    def answer(request):
+        return {"jsonrpc": "2.0", "id": request["id"], "result": request["params"][0]}
+
+
+class Subtensor:
+    def __init__(self, url, log_raw=False):
+        self.substrate = AsyncSubstrateInterface(url, ws_shutdown_timer=None, _log_raw_websockets=log_raw)
+
+
+async def read_all(max_batch, count, log_raw=False):
+    server = StandInServer()
+    async with serve(server.handler, "127.0.0.1", 0) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        subtensor = Subtensor(f"ws://127.0.0.1:{port}", log_raw)
+        ws = install_batching(subtensor, max_batch, 0.005)
+        results = await asyncio.gather(*[
+            subtensor.substrate.rpc_request("state_getStorage", [f"0x{i:04x}"]) for i in range(count)
+        ])
+        await ws.shutdown()
+    return server, ws, results
+
+
+@pytest.mark.unit
+def test_batched_requests_are_demultiplexed():
+    server, ws, results = asyncio.run(read_all(16, 100))
+
+    assert isinstance(ws, BatchingWebsocket)
+    assert [r["result"] for r in results] == [f"0x{i:04x}" for i in range(100)]
+    assert sum(server.frames) == 100
+    assert max(server.frames) <= 16
+    assert len(server.frames) < 100
+    assert ws.requests_sent == 100
+    assert ws.frames_sent == len(server.frames)
+
+
+@pytest.mark.unit
+def test_batch_of_one_is_sent_as_plain_request():
+    server, ws, results = asyncio.run(read_all(1, 5))
+
+    assert [r["result"] for r in results] == [f"0x{i:04x}" for i in range(5)]
+    assert server.frames == [1] * 5
+
+
+@pytest.mark.unit
+def test_batches_are_logged_with_raw_websocket_logging(caplog):
+    with caplog.at_level(logging.DEBUG, logger="raw_websocket"):
+        server, ws, results = asyncio.run(read_all(16, 20, log_raw=True))
+
+    assert len(server.frames) < 20
+    sent = [r.message for r in caplog.records if r.message.startswith("WEBSOCKET_SEND> [")]
+    received = [r.message for r in caplog.records if r.message.startswith("WEBSOCKET_RECEIVE> [")]
+    assert sent and received
+
+
+@pytest.mark.unit
+def test_unsupported_version_keeps_stock_websocket(monkeypatch):
+    monkeypatch.setattr("src.batching.SUPPORTED_VERSIONS", {(0, 1)})
+    subtensor = Subtensor("ws://127.0.0.1:1")
+    stock = subtensor.substrate.ws
+    messages = []
+
+    assert install_batching(subtensor, 16, log=messages.append) is None
+    assert subtensor.substrate.ws is stock
+    assert "RPC batching disabled" in messages[0]
@@ -0,0 +1,128 @@
+"""
+Tests for the ApyCalculator session API.
+"""
+import asyncio
+
+import pytest
+
+from src.calculator import ApyCalculator
+from src.root_calc import retrieve_and_calculate_hotkey_root_apy
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import HEAD, HOTKEYS, RAO, dividends
+from tests.conftest import ChainStub as BaseChain
+
+
+class ChainStub(BaseChain):
+    def entries(self, name, params, block):
+        return [(hotkey, dividends(hotkey, block)) for hotkey in HOTKEYS]
+
+    def value(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return dividends(params[1], block)
+        if name == "TotalHotkeyAlpha":
+            return 5000 * RAO
+        if name == "TaoWeight":
+            return 2**63
+        if name == "RootClaimable":
+            return [[(1, {"bits": block * 2**20})]]
+        return None
+
+
+@pytest.mark.unit
+def test_session_matches_calculators_and_reports_progress(progress):
+    updates = []
+
+    async def run():
+        async with ApyCalculator(subtensor=ChainStub()) as calculator:
+            subnet = await calculator.subnet_apy(
+                1, "hk-b", "7d", HEAD, on_progress=lambda *update: updates.append(update)
+            )
+            root = await calculator.root_apy("hk-b", "7d", HEAD)
+        return subnet, root
+
+    subnet, root = asyncio.run(run())
+    expected_subnet = asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(ChainStub(), 1, "hk-b", "7d", HEAD, progress()))
+    expected_root = asyncio.run(retrieve_and_calculate_hotkey_root_apy(ChainStub(), "hk-b", "7d", HEAD, progress()))
+
+    assert subnet.apy == pytest.approx(expected_subnet.apy)
+    assert subnet.dividends == pytest.approx(expected_subnet.dividends)
+    assert subnet.coverage == expected_subnet.coverage
+    assert root.apy == pytest.approx(expected_root.apy)
+    assert updates[-1] == ("Fetching data for hk-b", subnet.total, subnet.total)
+
+
+@pytest.mark.unit
+def test_subnet_bulk_shares_schedule_and_dividends(progress):
+    chain = ChainStub()
+
+    async def run():
+        async with ApyCalculator(subtensor=chain) as calculator:
+            return await calculator.subnet_apy_bulk(1, HOTKEYS, "7d", HEAD)
+
+    results = asyncio.run(run())
+    expected = {
+        hotkey: asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(ChainStub(), 1, hotkey, "7d", HEAD, progress()))
+        for hotkey in HOTKEYS
+    }
+
+    for hotkey in HOTKEYS:
+        assert results[hotkey].apy == pytest.approx(expected[hotkey].apy)
+        assert results[hotkey].dividends == pytest.approx(expected[hotkey].dividends)
+    assert chain.reads["Subnet"] == 1
+    assert chain.reads["AlphaDividendsPerSubnet map"] == expected["hk-a"].total
+    assert chain.reads["AlphaDividendsPerSubnet"] == 0
+
+
+@pytest.mark.unit
+def test_root_bulk_reads_grid_once_and_prices_from_cache():
+    chain = ChainStub()
+
+    async def run():
+        async with ApyCalculator(subtensor=chain) as calculator:
+            return await calculator.root_apy_bulk(HOTKEYS, "7d", HEAD), calculator.cache
+
+    results, cache = asyncio.run(run())
+    events = results["hk-a"].total
+
+    assert set(results) == set(HOTKEYS)
+    assert chain.reads["SubnetsInfo"] == 1
+    # Prices do not depend on the hotkey: read once per event for all hotkeys
+    assert chain.reads["SubnetPrice"] == events
+    assert cache.hits > 0
+
+
+@pytest.mark.unit
+def test_bulk_failure_is_logged_and_left_as_none():
+    messages = []
+
+    async def run():
+        async with ApyCalculator(subtensor=ChainStub(), log=messages.append) as calculator:
+            calculate = calculator._subnet
+
+            async def flaky(netuid, hotkey, *args):
+                if hotkey == "hk-c":
+                    raise ConnectionError("node gone")
+                return await calculate(netuid, hotkey, *args)
+
+            calculator._subnet = flaky
+            return await calculator.subnet_apy_bulk(1, HOTKEYS, "7d", HEAD)
+
+    results = asyncio.run(run())
+    assert results["hk-c"] is None
+    assert results["hk-a"] is not None and results["hk-b"] is not None
+    assert "Error calculating APY for hk-c: node gone" in messages
+
+
+@pytest.mark.unit
+def test_close_restores_the_subtensor_methods():
+    chain = ChainStub()
+    chain.get_subnet_price = get_subnet_price = chain.get_subnet_price
+
+    async def run():
+        async with ApyCalculator(subtensor=chain) as calculator:
+            assert "query_subtensor" in vars(chain)
+            await calculator.subnet_apy(1, "hk-a", "24h", HEAD)
+
+    asyncio.run(run())
+    assert "query_subtensor" not in vars(chain)
+    assert chain.get_subnet_price is get_subnet_price
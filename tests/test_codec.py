@@ -0,0 +1,121 @@
+"""
+Test cases for the native decoders in codec.py against the generic SCALE encoder,
+claimable_float (fixed_to_float) and Balance.from_rao.
+"""
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+from bittensor import Balance
+from scalecodec.base import RuntimeConfiguration
+from scalecodec.type_registry import load_type_registry_preset
+
+from src.codec import (
+    decode_compact,
+    decode_i96f32,
+    decode_i96f32_batch,
+    decode_root_claimable,
+    decode_u64,
+    decode_u64_batch,
+    rao_to_tao_batch,
+)
+from src.helpers import claimable_float, query_subtensor_raw
+
+
+@pytest.fixture(scope="module")
+def scale():
+    runtime_config = RuntimeConfiguration()
+    runtime_config.update_type_registry(load_type_registry_preset("legacy"))
+
+    def encode(type_string, value) -> bytes:
+        return bytes(runtime_config.create_scale_object(type_string).encode(value).data)
+
+    return encode
+
+
+@pytest.mark.unit
+def test_decode_u64_matches_balance_from_rao(scale):
+    """u64 decoding, scalar and batch, matches Balance.from_rao(x).tao"""
+    rng = random.Random(1)
+    values = [0, 1, 10**9, 4000 * 10**9, 2**53 - 1] + [rng.randrange(2**53) for _ in range(200)]
+    encoded = [scale("u64", v) for v in values]
+
+    assert [decode_u64(e) for e in encoded] == values
+    assert decode_u64_batch(encoded).tolist() == values
+    assert [decode_u64(e) / 10**9 for e in encoded] == [Balance.from_rao(v).tao for v in values]
+    assert rao_to_tao_batch(decode_u64_batch(encoded)).tolist() == [Balance.from_rao(v).tao for v in values]
+
+    # Absent storage decodes to 0, like the `if raw else 0` fallbacks
+    assert decode_u64(None) == 0
+    assert decode_u64_batch([None, encoded[3]]).tolist() == [0, values[3]]
+
+
+@pytest.mark.unit
+def test_decode_i96f32_matches_claimable_float(scale):
+    """I96F32 decoding, scalar and batch, matches claimable_float for the Go reference values"""
+    rng = random.Random(2)
+    bits = [0, 4920112, 5592406, 13387317, 2**32, 7 * 2**32 + 123, -5] + [
+        rng.randrange(2**40) for _ in range(200)
+    ]
+    encoded = [scale("i128", b) for b in bits]
+    expected = [claimable_float({"bits": b}) for b in bits]
+
+    assert [decode_i96f32(e) for e in encoded] == expected
+    assert decode_i96f32_batch(encoded).tolist() == expected
+
+
+@pytest.mark.unit
+def test_decode_root_claimable(scale):
+    """RootClaimable BTreeMap<u16, I96F32> decodes to {netuid: claimable_float(bits)}"""
+    entries = [(1, 4920112), (64, 5592406), (128, 13387317)]
+    data = scale("BTreeMap<u16, i128>", entries)
+
+    assert decode_root_claimable(data) == {n: claimable_float({"bits": b}) for n, b in entries}
+    assert decode_root_claimable(scale("BTreeMap<u16, i128>", [])) == {}
+    assert decode_root_claimable(None) == {}
+
+
+@pytest.mark.unit
+def test_decode_compact(scale):
+    for value in [0, 1, 63, 64, 16383, 16384, 2**30 - 1, 2**30, 2**40]:
+        data = scale("Compact<u64>", value)
+        assert decode_compact(data) == (value, len(data))
+
+
+@pytest.mark.unit
+def test_raw_query_uses_the_storage_default_of_the_block_runtime(scale, monkeypatch):
+    """Absent keys return the metadata default, re-read after a runtime upgrade"""
+    monkeypatch.setattr("src.helpers._storage_keys", {})
+
+    class Substrate:
+        version = 1
+        defaults = {1: 42, 2: 7}
+
+        async def get_block_hash(self, block):
+            return f"0x{block:064x}"
+
+        async def init_runtime(self, block_hash=None):
+            return SimpleNamespace(runtime_version=self.version)
+
+        async def create_storage_key(self, pallet, name, params, block_hash=None):
+            default = SimpleNamespace(value_object="0x" + scale("u64", self.defaults[self.version]).hex())
+            return SimpleNamespace(
+                to_hex=lambda: f"0x{self.version}{name}",
+                metadata_storage_function=SimpleNamespace(
+                    value={"modifier": "Default"}, value_object={"default": default}
+                ),
+            )
+
+        async def rpc_request(self, method, params):
+            keys, block_hash = params
+            return {"result": [{"block": block_hash, "changes": [
+                [key, "0x" + scale("u64", 5).hex() if key.endswith("TaoWeight") else None] for key in keys
+            ]}]}
+
+    subtensor = SimpleNamespace(substrate=Substrate())
+    queries = [("TaoWeight", []), ("TotalHotkeyAlpha", ["hk-raw", 1])]
+
+    assert list(map(decode_u64, asyncio.run(query_subtensor_raw(subtensor, queries, 10)))) == [5, 42]
+    subtensor.substrate.version = 2
+    assert list(map(decode_u64, asyncio.run(query_subtensor_raw(subtensor, queries, 20)))) == [5, 7]
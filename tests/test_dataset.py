@@ -0,0 +1,129 @@
+"""
+Tests for the columnar export: a partition written from the captured tao5 inputs must
+reproduce the same results when read back, and allow recomputing under other filters.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from src.dataset import (
+    ROOT_COLUMNS,
+    Dataset,
+    DatasetWriter,
+    calculate_from_dataset,
+    iter_datasets,
+    root_writer,
+    subnet_row,
+    subnet_writer,
+)
+from src.events import FAILED, MISSING
+from src.root_calc import calculate_hotkey_root_apy, normalize_claimable_alpha
+from src.subnet_calc import calculate_hotkey_subnet_apy
+
+DATA = Path(__file__).parent / "data"
+
+
+def load(name: str) -> dict:
+    with open(DATA / name, "r") as f:
+        return json.load(f)
+
+
+def export_subnet(tmp_path, test_data):
+    events = test_data["events"]
+    writer = subnet_writer(
+        str(tmp_path), 1, "hk", "30d", 100, len(events), float(test_data["actual_interval_seconds"])
+    )
+    for idx, (event, data) in enumerate(zip(events, test_data["fetched_data"])):
+        writer.write(idx, subnet_row(event["block"], data))
+    writer.close()
+    return next(iter_datasets(str(tmp_path), 1))
+
+
+@pytest.mark.unit
+def test_subnet_dataset_round_trip(tmp_path):
+    test_data = load("calc_args_subnet_20251117_103000.json")
+    dataset = export_subnet(tmp_path, test_data)
+
+    for no_filters in (False, True):
+        expected = calculate_hotkey_subnet_apy(
+            test_data["events"], test_data["fetched_data"], float(test_data["actual_interval_seconds"]), no_filters
+        )
+        result = calculate_from_dataset(dataset, no_filters)
+        assert (result.apy, result.dividends, result.period_yield, result.skipped) == pytest.approx(expected)
+
+
+@pytest.mark.unit
+def test_subnet_dataset_thresholds(tmp_path):
+    test_data = load("calc_args_subnet_20251117_103000.json")
+    dataset = export_subnet(tmp_path, test_data)
+
+    # Zero thresholds keep every epoch with a positive stake, like no filters
+    unfiltered = calculate_from_dataset(dataset, no_filters=True)
+    relaxed = calculate_from_dataset(dataset, min_alpha_stake=0, min_combined_stake=0)
+    assert relaxed.skipped == unfiltered.skipped
+    assert relaxed.apy == pytest.approx(unfiltered.apy)
+
+    # Unreachable thresholds drop every epoch with dividends
+    strict = calculate_from_dataset(dataset, min_alpha_stake=float("inf"), min_combined_stake=float("inf"))
+    assert strict.dividends == 0.0
+    assert strict.skipped >= unfiltered.skipped
+
+
+@pytest.mark.unit
+def test_root_dataset_round_trip(tmp_path):
+    test_data = load("calc_args_root_20251116_112601.json")
+    events = test_data["events"]
+    baseline = normalize_claimable_alpha(test_data["baseline_claimable_alpha"])
+    actual_interval_seconds = float(test_data["actual_interval_seconds"])
+
+    writer = root_writer(str(tmp_path), "hk", "30d", 100, len(events), actual_interval_seconds, baseline)
+    for idx, event in enumerate(events):
+        block, netuid = event["block"], event["netuid"]
+        claimable_raw = test_data["root_claimable_dicts_raw"][idx]
+        claimable = (
+            FAILED if claimable_raw == -1 else normalize_claimable_alpha(claimable_raw).get(netuid, MISSING)
+        )
+        writer.write(idx, {
+            "block": block,
+            "netuid": netuid,
+            "claimable": claimable,
+            "stake": float(test_data["stakes_raw"][idx]),
+            "price": float(test_data["prices_tao_per_alpha"][idx]),
+        })
+    writer.close()
+
+    dataset = next(iter_datasets(str(tmp_path), 0))
+    assert set(dataset.columns) == set(ROOT_COLUMNS)
+    assert len(dataset) == len(events)
+
+    expected = calculate_hotkey_root_apy(
+        events,
+        baseline,
+        test_data["root_claimable_dicts_raw"],
+        test_data["stakes_raw"],
+        test_data["prices_tao_per_alpha"],
+        actual_interval_seconds,
+        bool(test_data["no_filters"]),
+    )
+    result = calculate_from_dataset(dataset, bool(test_data["no_filters"]))
+    assert (result.apy, result.dividends, result.period_yield, result.skipped) == pytest.approx(expected)
+
+
+@pytest.mark.unit
+def test_incomplete_partition_is_ignored(tmp_path):
+    writer = subnet_writer(str(tmp_path), 1, "hk", "24h", 100, 3, 86400.0)
+    writer.write(0, subnet_row(10, -1))
+    # meta.json is written on close only
+    assert list(iter_datasets(str(tmp_path))) == []
+
+
+@pytest.mark.unit
+def test_rows_are_read_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.dataset.READ_CHUNK", 3)
+    writer = DatasetWriter(str(tmp_path), ROOT_COLUMNS, 7, {"netuid": 0})
+    for idx in range(7):
+        writer.write(idx, {"block": idx, "netuid": idx, "claimable": idx / 2, "stake": 1.0, "price": 0.5})
+    writer.close()
+
+    assert list(Dataset(str(tmp_path)).root_rows()) == [(idx, idx / 2, 1.0, 0.5) for idx in range(7)]
@@ -0,0 +1,192 @@
+"""
+Tests for calculations under a deadline. The epoch reads of the stub chain never complete
+after a given number, so a deadline always expires there, whatever the speed of the machine.
+"""
+import asyncio
+import io
+import json
+
+import pytest
+
+from src.options import CalcOptions
+from src.root_calc import RootApyStream, retrieve_and_calculate_hotkey_root_apy
+from src.subnet_calc import SubnetApyStream, retrieve_and_calculate_hotkey_subnet_apy
+from src.streaming import ApyResult
+from src.utils.print import print_all_results, print_results
+from tests.conftest import HEAD, RAO, TEMPOS
+from tests.conftest import ChainStub as BaseChain
+
+EPOCH_READS = ("AlphaDividendsPerSubnet", "RootClaimable")
+
+
+class ChainStub(BaseChain):
+    """
+    The epoch reads (EPOCH_READS) after the first `stall_after` wait forever; `in_flight`
+    counts the reads waiting and `stalled` is set once one does.
+    """
+
+    tempos = {1: TEMPOS[1]}
+
+    def __init__(self, stall_after=None):
+        super().__init__()
+        self.stall_after = stall_after
+        self.in_flight = 0
+        self.stalled = asyncio.Event()
+
+    async def stall(self):
+        self.in_flight += 1
+        self.stalled.set()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.in_flight -= 1
+
+    async def query_subtensor(self, name, params=None, block=None):
+        if self.stall_after is not None and name in EPOCH_READS and self.reads[name] >= self.stall_after:
+            await self.stall()
+        return await super().query_subtensor(name, params, block)
+
+    def value(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return RAO
+        if name == "TotalHotkeyAlpha":
+            return 5000 * RAO
+        if name == "TaoWeight":
+            return 2**63
+        if name == "RootClaimable":
+            return [[(1, {"bits": block * 2**20})]]
+        return None
+
+
+@pytest.fixture
+def run_subnet(progress):
+    def run(chain, deadline, out=None):
+        return asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(
+            chain, 1, "hk", "7d", HEAD, progress(out), batch_size=4, options=CalcOptions(deadline=deadline),
+        ))
+    return run
+
+
+@pytest.mark.unit
+def test_subnet_deadline_returns_partial_result_and_cancels_reads(run_subnet):
+    chain = ChainStub(stall_after=10)
+    out = io.StringIO()
+    result = run_subnet(chain, 0.15, out)
+
+    assert result.processed == chain.reads["AlphaDividendsPerSubnet"] == 10
+    assert result.processed < result.total
+    assert not result.complete
+    assert result.coverage == pytest.approx(result.processed / result.total)
+    assert not result.sufficient
+    assert result.take is None
+    assert result.error is not None
+    assert chain.in_flight == 0
+    assert "Deadline of 0.15s reached" in out.getvalue()
+    assert "< required 90.00%" in out.getvalue()
+
+
+@pytest.mark.unit
+def test_generous_deadline_returns_exact_result(run_subnet, progress):
+    expected = asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(ChainStub(), 1, "hk", "7d", HEAD, progress()))
+    result = run_subnet(ChainStub(), 60)
+
+    assert result.complete and result.sufficient
+    assert result.apy == pytest.approx(expected.apy)
+    assert result.dividends == pytest.approx(expected.dividends)
+
+
+@pytest.mark.unit
+def test_root_deadline_returns_partial_result(progress):
+    chain = ChainStub(stall_after=10)
+    result = asyncio.run(retrieve_and_calculate_hotkey_root_apy(
+        chain, "hk", "7d", HEAD, progress(), batch_size=4, options=CalcOptions(deadline=0.15),
+    ))
+
+    assert 0 < result.processed < result.total
+    assert not result.complete
+    assert chain.in_flight == 0
+
+
+@pytest.mark.unit
+def test_deadline_during_grid_raises(run_subnet):
+    class SlowGrid(ChainStub):
+        async def subnet(self, netuid, block=None):
+            await self.stall()
+
+    with pytest.raises(TimeoutError, match="grid build"):
+        run_subnet(SlowGrid(), 0.05)
+
+
+@pytest.mark.unit
+def test_print_results_json_flags_partial(capsys):
+    print_results([[12.5, 0.25, None, 0.4, False, False]], 1, "5Hotkey", as_json=True)
+    output = json.loads(capsys.readouterr().out)
+    assert output["coverage"] == 0.4
+    assert output["complete"] is False
+    assert output["sufficient"] is False
+
+
+@pytest.mark.unit
+def test_print_all_results_json_flags_sufficient(capsys):
+    results = {0: ApyResult(10.0, 1.0, 0.001, skipped=0, processed=95, total=100), 1: None}
+    print_all_results(results, "5Hotkey", as_json=True)
+    root, subnet = map(json.loads, capsys.readouterr().out.splitlines())
+    assert root["complete"] is False and root["sufficient"] is True
+    assert subnet["sufficient"] is False
+
+
+@pytest.mark.unit
+def test_cancelled_calculation_cancels_take_reads(progress):
+    class SlowTake(ChainStub):
+        async def query_subtensor(self, name, params=None, block=None):
+            if name == "Delegates":
+                await self.stall()
+            return await super().query_subtensor(name, params, block)
+
+    chain = SlowTake()
+
+    async def run():
+        task = asyncio.ensure_future(retrieve_and_calculate_hotkey_subnet_apy(chain, 1, "hk", "7d", HEAD, progress()))
+        await chain.stalled.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return chain.in_flight
+
+    assert asyncio.run(run()) == 0
+
+
+@pytest.mark.unit
+def test_stopped_run_removes_partial_export(tmp_path, progress):
+    out = io.StringIO()
+    asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(
+        ChainStub(stall_after=10), 1, "hk", "7d", HEAD, progress(out), batch_size=4,
+        options=CalcOptions(export_dir=str(tmp_path), deadline=0.1),
+    ))
+
+    assert "Export skipped" in out.getvalue()
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("calculate, stream", [
+    (lambda chain, progress, export_dir: retrieve_and_calculate_hotkey_subnet_apy(
+        chain, 1, "hk", "7d", HEAD, progress, batch_size=4, options=CalcOptions(export_dir=export_dir)
+    ), SubnetApyStream),
+    (lambda chain, progress, export_dir: retrieve_and_calculate_hotkey_root_apy(
+        chain, "hk", "7d", HEAD, progress, batch_size=4, options=CalcOptions(export_dir=export_dir)
+    ), RootApyStream),
+])
+def test_failed_run_removes_partial_export(tmp_path, progress, monkeypatch, calculate, stream):
+    feed, fed = stream.feed, []
+
+    def failing_feed(self, event, data):
+        fed.append(event)
+        if len(fed) == 20:
+            raise ValueError("undecodable event")
+        return feed(self, event, data)
+
+    monkeypatch.setattr(stream, "feed", failing_feed)
+    with pytest.raises(ValueError, match="undecodable event"):
+        asyncio.run(calculate(ChainStub(), progress(), str(tmp_path)))
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,64 @@
+"""
+Tests for the opt-in diagnostics: phase timing, loop lag and the sampling profiler.
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.utils.diagnostics import NO_DIAGNOSTICS, Diagnostics
+
+
+def busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.mark.unit
+def test_phases_accumulate():
+    diagnostics = Diagnostics()
+    for _ in range(3):
+        with diagnostics.phase("decode"):
+            busy(0.002)
+
+    calls, wall, cpu = diagnostics.phases["decode"]
+    assert calls == 3
+    assert wall >= 0.006
+    assert cpu > 0
+
+
+@pytest.mark.unit
+def test_disabled_phase_is_shared_noop():
+    assert NO_DIAGNOSTICS.phase("fetch") is NO_DIAGNOSTICS.phase("calculation")
+    with NO_DIAGNOSTICS.phase("fetch"):
+        pass
+
+
+@pytest.mark.unit
+def test_loop_lag_and_sampling_profile(tmp_path):
+    output = tmp_path / "profile.folded"
+    diagnostics = Diagnostics("sample", str(output))
+
+    async def run():
+        async with diagnostics:
+            await asyncio.sleep(0.03)
+            # Blocks the loop: shows up as lag and in the sampled stacks
+            busy(0.05)
+            await asyncio.sleep(0.03)
+
+    asyncio.run(run())
+
+    assert diagnostics.monitor.stats()["max"] >= 0.03
+    assert diagnostics.phases["total"][0] == 1
+    lines = output.read_text().splitlines()
+    assert lines
+    assert any("busy (test_diagnostics.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+@pytest.mark.unit
+def test_unknown_profiler():
+    with pytest.raises(ValueError):
+        Diagnostics("perf")
@@ -0,0 +1,124 @@
+"""
+Tests for the per-epoch dividends sources.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.dividends import EpochDividends, parse_source
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import HEAD, HOTKEYS, RAO, Substrate, dividends
+from tests.conftest import ChainStub as BaseChain
+
+
+class EventSubstrate(Substrate):
+    async def get_events(self, block_hash):
+        self.chain.reads["System.Events"] += 1
+        events = [{"event": {"module_id": "System", "event_id": "ExtrinsicSuccess", "attributes": {}}}]
+        for hotkey in HOTKEYS:
+            amount = dividends(hotkey, block_hash) + (self.chain.event_error if hotkey == "hk-c" else 0)
+            attributes = {"hotkey": hotkey, "netuid": 1, "amount": amount}
+            events.append(SimpleNamespace(value={
+                "event": {"module_id": "SubtensorModule", "event_id": "Dividends", "attributes": attributes}
+            }))
+        return events
+
+
+class ChainStub(BaseChain):
+    def __init__(self, event_error=0):
+        super().__init__()
+        self.event_error = event_error
+        self.substrate = EventSubstrate(self)
+
+    def entries(self, name, params, block):
+        return [(hotkey, dividends(hotkey, block)) for hotkey in HOTKEYS]
+
+    def value(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return dividends(params[1], block)
+        if name == "TotalHotkeyAlpha":
+            return 5000 * RAO
+        if name == "TaoWeight":
+            return 2**63
+        return None
+
+
+def run_hotkeys(chain, progress, source=None):
+    async def run():
+        return [
+            await retrieve_and_calculate_hotkey_subnet_apy(
+                chain, 1, hotkey, "7d", HEAD, progress(), dividends_source=source,
+            )
+            for hotkey in HOTKEYS
+        ]
+    return asyncio.run(run())
+
+
+@pytest.mark.unit
+def test_parse_source():
+    assert parse_source("map") == ("map", "", "", ())
+    assert parse_source("events:SubtensorModule.Dividends:hotkey,netuid,amount") == (
+        "events", "SubtensorModule", "Dividends", ("hotkey", "netuid", "amount")
+    )
+    assert parse_source("events:Pallet.Event")[3] == ("0", "1", "2")
+    with pytest.raises(ValueError):
+        parse_source("events")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("spec", ["map", "events:SubtensorModule.Dividends:hotkey,netuid,amount"])
+def test_dividend_reads_do_not_grow_with_hotkeys(spec, progress):
+    expected = run_hotkeys(ChainStub(), progress)
+
+    chain = ChainStub()
+    source = EpochDividends(chain, spec)
+    results = run_hotkeys(chain, progress, source)
+
+    epochs = results[0].total
+    assert [r.apy for r in results] == pytest.approx([r.apy for r in expected])
+    assert [r.dividends for r in results] == pytest.approx([r.dividends for r in expected])
+    assert chain.reads["AlphaDividendsPerSubnet"] == 0
+    if spec == "map":
+        assert chain.reads["AlphaDividendsPerSubnet map"] == epochs
+    else:
+        assert chain.reads["System.Events"] == epochs
+    assert source.hits == epochs * (len(HOTKEYS) - 1)
+
+
+@pytest.mark.unit
+def test_check_mode_reports_mismatches_and_uses_storage(progress):
+    expected = run_hotkeys(ChainStub(), progress)
+
+    chain = ChainStub(event_error=7)
+    source = EpochDividends(chain, "events:SubtensorModule.Dividends:hotkey,netuid,amount", check=True)
+    results = run_hotkeys(chain, progress, source)
+
+    epochs = results[0].total
+    assert [r.apy for r in results] == pytest.approx([r.apy for r in expected])
+    assert source.checked == epochs * len(HOTKEYS)
+    # hk-c is off by 7 rao in every epoch's event
+    assert source.mismatch_count == epochs
+    assert {hotkey for _, _, hotkey, _, _ in source.mismatches} == {"hk-c"}
+    assert "mismatches against storage" in source.stats()
+
+
+@pytest.mark.unit
+def test_epochs_are_dropped_once_every_consumer_read_them(progress):
+    chain = ChainStub()
+    source = EpochDividends(chain, consumers=len(HOTKEYS))
+    results = run_hotkeys(chain, progress, source)
+
+    assert len(source) == 0
+    assert chain.reads["AlphaDividendsPerSubnet map"] == results[0].total
+
+
+@pytest.mark.unit
+def test_cached_epochs_are_bounded(progress):
+    chain = ChainStub()
+    source = EpochDividends(chain, max_entries=4)
+    results = run_hotkeys(chain, progress, source)
+
+    assert len(source) <= 4
+    # Dropped epochs are read again, the results do not change
+    assert [r.apy for r in results] == pytest.approx([r.apy for r in run_hotkeys(ChainStub(), progress)])
@@ -0,0 +1,26 @@
+"""
+Tests for the settings read from the environment.
+"""
+import pytest
+
+from src.utils.env import parse_env_data
+
+
+@pytest.mark.unit
+def test_invalid_tolerance_is_reported(monkeypatch, capsys):
+    monkeypatch.setenv("TOLERANCE", "half")
+    with pytest.raises(SystemExit):
+        parse_env_data()
+    assert "TOLERANCE needs a positive number" in capsys.readouterr().out
+
+
+@pytest.mark.unit
+def test_env_settings_are_read_by_name(monkeypatch):
+    monkeypatch.setenv("TOLERANCE", "0.5")
+    monkeypatch.setenv("RPC_BATCH_WAIT", "4")
+    monkeypatch.setenv("NO_FILTERS", "1")
+    monkeypatch.delenv("INHERITED", raising=False)
+    env = parse_env_data()
+    assert env.tolerance == 0.5 and env.progressive
+    assert env.rpc_batch_wait == pytest.approx(0.004)
+    assert env.no_filters and not env.use_inherited_filter
@@ -0,0 +1,81 @@
+"""
+Tests for the persisted epoch index using a small in-memory chain.
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+from src.epoch_index import EpochIndex
+from src.subnet_calc import subnet_epoch_grid
+
+# Netuid 5: epochs every 10 blocks until block 200, then every 25 blocks (tempo change)
+EPOCHS = list(range(100, 201, 10)) + list(range(225, 1001, 25))
+
+
+class ChainStub:
+    def __init__(self):
+        self.reads = 0
+
+    async def query_subtensor(self, name, params=None, block=None):
+        self.reads += 1
+        if name == "NetworksAdded":
+            return SimpleNamespace(value=params[0] == 5)
+        if name == "NetworkRegisteredAt":
+            return SimpleNamespace(value=100)
+        if name == "BlocksSinceLastStep":
+            last = max(e for e in EPOCHS if e <= block)
+            return SimpleNamespace(value=block - last)
+        raise KeyError(name)
+
+
+@pytest.mark.unit
+def test_epoch_index_follows_tempo_change_and_persists(tmp_path):
+    path = str(tmp_path / "epochs.json")
+    chain = ChainStub()
+
+    index = EpochIndex(path)
+    asyncio.run(index.update(chain, [5], 150, 500))
+    assert list(index.epochs(5, 150, 500)) == [e for e in EPOCHS if 150 <= e <= 500]
+    assert [period for _, _, period in index.iter_events([5], 190, 260)] == [10, 10, 25, 25]
+
+    # Reloaded index extends forward only over the new blocks
+    reloaded = EpochIndex(path)
+    chain.reads = 0
+    asyncio.run(reloaded.update(chain, [5], 150, 600))
+    assert chain.reads == 2 + 5  # NetworksAdded, NetworkRegisteredAt + one read per new epoch
+    assert list(reloaded.epochs(5, 150, 600)) == [e for e in EPOCHS if 150 <= e <= 600]
+
+    # Registration bounds the backfill
+    asyncio.run(reloaded.update(chain, [5], 0, 600))
+    assert list(reloaded.epochs(5, 0, 600)) == [e for e in EPOCHS if e <= 600]
+
+
+@pytest.mark.unit
+def test_epoch_index_rejects_uncovered_range():
+    index = EpochIndex()
+    asyncio.run(index.update(ChainStub(), [5], 400, 500))
+    with pytest.raises(KeyError):
+        index.epochs(5, 100, 500)
+
+
+@pytest.mark.unit
+def test_subnet_grid_without_epochs_raises_clear_error():
+    with pytest.raises(KeyError, match="no epochs of netuid 5 up to block 95"):
+        asyncio.run(subnet_epoch_grid(ChainStub(), 5, 95, 50, epoch_index=EpochIndex()))
+
+
+@pytest.mark.unit
+def test_epoch_index_rejects_unregistered_netuid_and_missing_reads(tmp_path):
+    path = str(tmp_path / "epochs.json")
+    with pytest.raises(KeyError, match="Netuid 6 is not registered at block 500"):
+        asyncio.run(EpochIndex(path).update(ChainStub(), [6], 400, 500))
+
+    class EmptyChain(ChainStub):
+        async def query_subtensor(self, name, params=None, block=None):
+            if name == "BlocksSinceLastStep":
+                return SimpleNamespace(value=None)
+            return await super().query_subtensor(name, params, block)
+
+    with pytest.raises(ValueError, match="No BlocksSinceLastStep for netuid 5"):
+        asyncio.run(EpochIndex(path).update(EmptyChain(), [5], 400, 500))
+    assert EpochIndex(path).subnets == {}
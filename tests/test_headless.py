@@ -0,0 +1,31 @@
+"""
+Tests for the headless progress and JSON output used in non-interactive runs.
+"""
+import io
+import json
+import pytest
+
+from src.utils.print import print_results
+from src.utils.progress import HeadlessProgress
+
+
+@pytest.mark.unit
+def test_headless_progress_flushes_in_batches():
+    """Counters are only written at the flush interval and on exit, markup stripped"""
+    out = io.StringIO()
+    with HeadlessProgress(interval=3600, file=out) as progress:
+        task = progress.add_task("[cyan]Fetching stakes", total=3)
+        for _ in range(3):
+            progress.update(task, advance=1)
+        assert out.getvalue() == ""
+        progress.console.print("[yellow]Coverage is low[/yellow]")
+
+    assert out.getvalue().splitlines() == ["Coverage is low", "Fetching stakes: 3/3"]
+
+
+@pytest.mark.unit
+def test_print_results_json(capsys):
+    print_results([[12.5, 0.25, 0.18]], 0, "5Hotkey", as_json=True)
+    assert json.loads(capsys.readouterr().out) == {
+        "netuid": 0, "hotkey": "5Hotkey", "apy": 12.5, "dividends": 0.25, "take": 0.18
+    }
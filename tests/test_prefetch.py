@@ -0,0 +1,159 @@
+"""
+Tests for the read cache and the watchlist prefetcher.
+"""
+import asyncio
+from collections import Counter
+
+import pytest
+
+from src.prefetch import Prefetcher, RateLimiter, ReadCache, install_read_cache
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import RAO, TEMPOS
+from tests.conftest import ChainStub as BaseChain
+
+
+class ChainStub(BaseChain):
+    tempos = TEMPOS
+
+    def __init__(self, finalized):
+        super().__init__(finalized)
+        self.blocks = Counter()
+
+    async def query_subtensor(self, name, params=None, block=None):
+        self.blocks[block] += 1
+        return await super().query_subtensor(name, params, block)
+
+    def value(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return RAO if params[1] == "hk-a" else 0
+        if name == "TotalHotkeyAlpha":
+            return 5000 * RAO
+        if name == "TaoWeight":
+            return 2**63
+        if name == "RootClaimable":
+            return [[(1, {"bits": block * 2**20})]]
+        return None
+
+
+def prefetcher(chain, watchlist, **kwargs):
+    cache = install_read_cache(chain)
+    return Prefetcher(chain, cache, watchlist, rate=0, log=lambda msg: None, **kwargs)
+
+
+@pytest.mark.unit
+def test_poll_warms_new_epochs_only_once_finalized():
+    chain = ChainStub(finalized=100_050)
+    fetcher = prefetcher(chain, [(1, "hk-a"), (1, "hk-b")])
+
+    warmed = asyncio.run(fetcher.poll())
+    epoch = chain.last_step(1, 100_050)
+    assert warmed == [(1, epoch)]
+    # hk-a has dividends and gets the whole plan, hk-b only the dividends read
+    assert chain.reads["AlphaDividendsPerSubnet"] == 2
+    assert chain.reads["TotalHotkeyAlpha"] == 2 and chain.reads["TaoWeight"] == 1
+
+    # Before the predicted next epoch is finalized, polls do not even read the schedules
+    chain.finalized = fetcher.next_epochs[1] - 1
+    assert asyncio.run(fetcher.poll()) == []
+    assert chain.reads["SubnetsInfo"] == 1
+
+    chain.finalized = fetcher.next_epochs[1]
+    assert asyncio.run(fetcher.poll()) == [(1, epoch + TEMPOS[1] + 1)]
+
+
+@pytest.mark.unit
+def test_root_watch_warms_every_subnet_epoch():
+    chain = ChainStub(finalized=100_050)
+    fetcher = prefetcher(chain, [(0, "hk-r")])
+
+    warmed = asyncio.run(fetcher.poll())
+    assert sorted(netuid for netuid, _ in warmed) == list(TEMPOS)
+    assert chain.reads["RootClaimable"] == len(TEMPOS)
+    assert chain.reads["SubnetPrice"] == len(TEMPOS)
+
+
+@pytest.mark.unit
+def test_calculation_after_prefetch_reads_newest_epoch_from_cache(progress):
+    head = 100_050
+    chain = ChainStub(finalized=head)
+    fetcher = prefetcher(chain, [(1, "hk-a")])
+
+    async def run():
+        await fetcher.poll()
+        chain.blocks.clear()
+        return await retrieve_and_calculate_hotkey_subnet_apy(chain, 1, "hk-a", "24h", head, progress())
+
+    asyncio.run(run())
+    assert chain.blocks[chain.last_step(1, head)] == 0
+    assert fetcher.cache.hits >= 8
+
+
+@pytest.mark.unit
+def test_cache_skips_unfinalized_blocks_and_evicts():
+    chain = ChainStub(finalized=0)
+    cache = install_read_cache(chain, ReadCache(max_entries=2))
+    cache.finalized = 100
+
+    async def run():
+        for block in (10, 10, 20, 30, 10, 200, 200):
+            await chain.query_subtensor("TaoWeight", block=block, params=[])
+
+    asyncio.run(run())
+    # 10 is evicted by 20 and 30; 200 is above the finalized head
+    assert chain.reads["TaoWeight"] == 6
+    assert cache.hits == 1
+    assert len(cache) == 2
+
+
+@pytest.mark.unit
+def test_rate_limiter_spaces_calls():
+    async def run():
+        limiter = RateLimiter(50)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await limiter.wait()
+        return loop.time() - start
+
+    assert asyncio.run(run()) >= 0.1
+
+
+@pytest.mark.unit
+def test_failed_epoch_is_not_marked_warmed_and_is_retried():
+    class FlakyChain(ChainStub):
+        fail = True
+
+        async def query_subtensor(self, name, params=None, block=None):
+            if name == "ChildKeys" and self.fail:
+                raise ConnectionError("node gone")
+            return await super().query_subtensor(name, params, block)
+
+    chain = FlakyChain(finalized=100_050)
+    messages = []
+    fetcher = Prefetcher(chain, install_read_cache(chain), [(1, "hk-a")], rate=0, log=messages.append)
+
+    assert asyncio.run(fetcher.poll()) == []
+    assert 1 not in fetcher.warmed
+    assert "retried at the next poll" in messages[0]
+
+    # Retried before the next epoch is finalized
+    chain.fail = False
+    assert asyncio.run(fetcher.poll()) == [(1, chain.last_step(1, 100_050))]
+    assert asyncio.run(fetcher.poll()) == []
+
+
+@pytest.mark.unit
+def test_rate_limit_counts_every_read():
+    chain = ChainStub(finalized=100_050)
+    fetcher = prefetcher(chain, [(1, "hk-a")])
+    fetcher._limiter = RateLimiter(100)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await fetcher.poll()
+        return loop.time() - start
+
+    # hk-a has dividends: the 3 stake reads wait for the 5 reads before them at 100 per second
+    assert asyncio.run(run()) >= 0.045
+    assert sum(fetcher.reads.values()) == 8
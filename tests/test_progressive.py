@@ -0,0 +1,109 @@
+"""
+Tests for the progressive estimate using real data from calc_args_subnet_20251117_103000.json.
+"""
+import asyncio
+import json
+from contextlib import aclosing
+from pathlib import Path
+
+import pytest
+
+from src.helpers import as_completed_windowed
+from src.progressive import ProgressiveEstimate, stratified_block_runs, stratified_order, van_der_corput
+from src.streaming import SubnetApyStream
+
+
+@pytest.mark.unit
+def test_van_der_corput_prefixes_are_stratified():
+    n = 64
+    order = van_der_corput(n)
+    assert sorted(order) == list(range(n))
+    for size in (2, 4, 8, 16):
+        cells = {position * size // n for position in order[:size]}
+        assert cells == set(range(size))
+    # Scrambled: not the regular grid of plain bit reversal
+    assert order[:8] != (0, 32, 16, 48, 8, 40, 24, 56)
+
+
+@pytest.mark.unit
+def test_stratified_order_is_proportional():
+    strata = {1: list(range(0, 10)), 2: list(range(10, 40))}
+    order = list(stratified_order(strata))
+    assert sorted(order) == list(range(40))
+    first = order[:8]
+    assert sum(1 for item in first if item < 10) == 2
+
+
+@pytest.mark.unit
+def test_stratified_block_runs_cover_every_block_once():
+    events = [(10, 1, 5), (10, 2, 5), (15, 1, 5), (15, 2, 5), (20, 1, 5), (22, 3, 7)]
+    runs = list(stratified_block_runs(events))
+    assert sorted(block for block, _ in runs) == [10, 15, 20, 22]
+    assert sorted(idx for _, run in runs for idx, _ in run) == list(range(len(events)))
+
+
+@pytest.mark.unit
+def test_estimate_converges_to_exact_result():
+    json_file = Path(__file__).parent / "data" / "calc_args_subnet_20251117_103000.json"
+
+    if not json_file.exists():
+        pytest.skip(f"Test data file not found: {json_file}")
+
+    with open(json_file, "r") as f:
+        test_data = json.load(f)
+
+    results = test_data["fetched_data"]
+    actual_interval_seconds = float(test_data["actual_interval_seconds"])
+    total = len(results)
+
+    stream = SubnetApyStream(total, actual_interval_seconds, bool(test_data["no_filters"]))
+    estimate = ProgressiveEstimate({1: total}, actual_interval_seconds)
+    for position, event_index in enumerate(van_der_corput(total)):
+        stream.feed(event_index, results[event_index])
+        estimate.add(1, stream.epoch_values(results[event_index]))
+        if position == total // 2:
+            partial = estimate.result()
+            assert not partial.complete
+            assert partial.error > 0
+
+    exact = stream.result()
+    final = estimate.result()
+    assert final.complete
+    assert final.error == pytest.approx(0.0, abs=1e-9)
+    assert final.apy == pytest.approx(exact.apy)
+    assert final.dividends == pytest.approx(exact.dividends)
+    assert final.skipped == exact.skipped
+
+
+@pytest.mark.unit
+def test_closing_windowed_fetch_cancels_pending():
+    started = []
+
+    async def fetch(i):
+        started.append(i)
+        await asyncio.sleep(0 if i == 0 else 10)
+        return i
+
+    async def run():
+        factories = (lambda i=i: fetch(i) for i in range(100))
+        async with aclosing(as_completed_windowed(factories, 4)) as results:
+            async for result in results:
+                assert result == 0
+                break
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert len(started) == 4
+
+
+@pytest.mark.unit
+def test_estimate_without_samples_has_unbounded_error():
+    estimate = ProgressiveEstimate({1: 10, 2: 10}, 86400.0)
+    assert estimate.result().error == float("inf")
+    assert not estimate.converged(1.0)
+
+    estimate.add(1, None)
+    assert estimate.result().error == float("inf")
+    estimate.add(2, (0.001, 1.0))
+    assert estimate.result().error < float("inf")
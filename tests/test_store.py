@@ -0,0 +1,161 @@
+"""
+Tests for the local epoch store against the node-backed calculators.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.epoch_index import EpochIndex
+from src.options import CalcOptions
+from src.root_calc import retrieve_and_calculate_hotkey_root_apy
+from src.store import EpochStore, calculate_from_store
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import HEAD, RAO, TEMPOS, Substrate
+from tests.conftest import ChainStub as BaseChain
+
+
+class StorageSubstrate(Substrate):
+    """state_queryStorageAt over the u64 items of ChainStub."""
+
+    async def init_runtime(self, block_hash=None):
+        return SimpleNamespace(runtime_version=1)
+
+    async def create_storage_key(self, pallet, name, params, block_hash=None):
+        key = "0x" + "|".join(["store-test", name, *map(str, params)]).encode().hex()
+        default = SimpleNamespace(value_object="0x" + "00" * 8)
+        return SimpleNamespace(
+            to_hex=lambda: key,
+            metadata_storage_function=SimpleNamespace(value={"modifier": "Default"}, value_object={"default": default}),
+        )
+
+    async def rpc_request(self, method, params):
+        keys, block = params
+        changes = []
+        for key in keys:
+            _, name, *args = bytes.fromhex(key[2:]).decode().split("|")
+            args = [int(a) if a.isdigit() else a for a in args]
+            value = (await self.chain.query_subtensor(name, args, block)).value or 0
+            changes.append([key, "0x" + value.to_bytes(8, "little").hex()])
+        return {"result": [{"block": block, "changes": changes}]}
+
+
+class ChainStub(BaseChain):
+    """
+    hk-a: dividends on subnet 1 at odd epochs, RootClaimable on every netuid.
+    hk-b: no dividends, RootClaimable without an entry for netuid 3.
+    RootClaimable rates grow at each netuid's epochs only.
+    """
+
+    tempos = TEMPOS
+
+    def __init__(self):
+        super().__init__()
+        self.substrate = StorageSubstrate(self)
+
+    def claimable(self, hotkey, block):
+        netuids = [1, 2] if hotkey == "hk-b" else [1, 2, 3]
+        return [[(n, {"bits": self.last_step(n, block) * n * 2**20}) for n in netuids]]
+
+    def dividends(self, netuid, hotkey, block):
+        return RAO if hotkey == "hk-a" and netuid == 1 and (self.last_step(1, block) // 100) % 2 else 0
+
+    def entries(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return [(hotkey, self.dividends(params[0], hotkey, block)) for hotkey in ("hk-a", "hk-b")]
+        if name == "RootClaimable":
+            return [(hotkey, self.claimable(hotkey, block)) for hotkey in ("hk-a", "hk-b")]
+        raise KeyError(name)
+
+    def value(self, name, params, block):
+        if name == "NetworksAdded":
+            return True
+        if name == "NetworkRegisteredAt":
+            return 10
+        if name == "BlocksSinceLastStep":
+            return block - self.last_step(params[0], block)
+        if name == "RootClaimable":
+            return self.claimable(params[0], block)
+        if name == "AlphaDividendsPerSubnet":
+            return self.dividends(params[0], params[1], block)
+        if name == "TotalHotkeyAlpha":
+            return (5000 + params[1]) * RAO + block
+        if name == "TaoWeight":
+            return 2**63
+        return None
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EpochStore(str(tmp_path / "store.sqlite"))
+    asyncio.run(store.update(ChainStub(), list(TEMPOS), HEAD - 7200, HEAD, log=lambda msg: None))
+    yield store
+    store.close()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("hotkey", ["hk-a", "hk-b"])
+def test_root_from_store_matches_node(store, hotkey, progress):
+    expected = asyncio.run(retrieve_and_calculate_hotkey_root_apy(
+        ChainStub(), hotkey, "24h", HEAD, progress(), options=CalcOptions(epoch_index=EpochIndex())
+    ))
+    result = calculate_from_store(store, 0, hotkey, "24h", HEAD)
+
+    assert result.total == expected.total
+    assert result.skipped == expected.skipped
+    assert result.apy == pytest.approx(expected.apy)
+    assert result.dividends == pytest.approx(expected.dividends)
+
+
+@pytest.mark.unit
+def test_subnet_from_store_matches_node(store, progress):
+    expected = asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(
+        ChainStub(), 1, "hk-a", "24h", HEAD, progress(), options=CalcOptions(epoch_index=EpochIndex())
+    ))
+    result = calculate_from_store(store, 1, "hk-a", "24h", HEAD)
+
+    assert expected.dividends > 0
+    assert result.total == expected.total
+    assert result.apy == pytest.approx(expected.apy)
+    assert result.dividends == pytest.approx(expected.dividends)
+
+
+@pytest.mark.unit
+def test_update_skips_stored_epochs_and_extends_coverage(store):
+    chain = ChainStub()
+    fetched = []
+    original = chain.query_map_subtensor
+
+    async def counting(name, params=None, block=None):
+        if name == "RootClaimable":
+            fetched.append(block)
+        return await original(name, params, block)
+
+    chain.query_map_subtensor = counting
+    asyncio.run(store.update(chain, list(TEMPOS), HEAD - 7200, HEAD + 400, log=lambda msg: None))
+
+    assert fetched and min(fetched) > HEAD
+    assert all(store.covers(netuid, HEAD - 7201, HEAD + 400) for netuid in TEMPOS)
+    with pytest.raises(KeyError):
+        calculate_from_store(store, 0, "hk-a", "7d", HEAD)
+
+
+@pytest.mark.unit
+def test_follow_retries_epochs_of_a_failed_update(store, progress):
+    class FailingChain(ChainStub):
+        async def query_map_subtensor(self, name, params=None, block=None):
+            if name == "AlphaDividendsPerSubnet" and params == [1]:
+                raise ConnectionError("node gone")
+            return await super().query_map_subtensor(name, params, block)
+
+    messages = []
+    asyncio.run(store.follow_step(FailingChain(), HEAD + 400, 100, EpochIndex(), messages.append))
+    assert "failed on netuids [1]" in messages[-1]
+    assert store.head(1) == HEAD and store.head(2) == HEAD + 400
+
+    asyncio.run(store.follow_step(ChainStub(), HEAD + 800, 100, EpochIndex(), lambda msg: None))
+    assert all(store.covers(netuid, HEAD - 7201, HEAD + 800) for netuid in TEMPOS)
+    expected = asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(
+        ChainStub(), 1, "hk-a", "24h", HEAD + 800, progress(), options=CalcOptions(epoch_index=EpochIndex())
+    ))
+    assert calculate_from_store(store, 1, "hk-a", "24h", HEAD + 800).dividends == pytest.approx(expected.dividends)
@@ -0,0 +1,90 @@
+"""
+Tests for the incremental APY calculators using real data from calc_args_subnet_20251117_103000.json.
+"""
+import asyncio
+import json
+import random
+from pathlib import Path
+import pytest
+
+from src.helpers import as_completed_windowed
+from src.streaming import SubnetApyStream, _StreamingApy
+from src.subnet_calc import calculate_hotkey_subnet_apy
+
+
+@pytest.mark.unit
+def test_subnet_apy_stream_out_of_order():
+    """Feeding events out of order must give the same result as the batch calculation"""
+    json_file = Path(__file__).parent / "data" / "calc_args_subnet_20251117_103000.json"
+
+    if not json_file.exists():
+        pytest.skip(f"Test data file not found: {json_file}")
+
+    with open(json_file, "r") as f:
+        test_data = json.load(f)
+
+    events = test_data["events"]
+    results = test_data["fetched_data"]
+    actual_interval_seconds = float(test_data["actual_interval_seconds"])
+    no_filters = bool(test_data["no_filters"])
+
+    expected = calculate_hotkey_subnet_apy(events, results, actual_interval_seconds, no_filters)
+
+    order = list(range(len(events)))
+    random.Random(7).shuffle(order)
+
+    stream = SubnetApyStream(len(events), actual_interval_seconds, no_filters)
+    for event_index in order:
+        stream.feed(event_index, results[event_index])
+        partial = stream.result()
+        assert partial.processed + stream.buffered == order.index(event_index) + 1
+
+    result = stream.result()
+    assert result.complete
+    assert abs(result.apy - expected[0]) < 0.000001
+    assert abs(result.dividends - expected[1]) < 0.000001
+    assert abs(result.period_yield - expected[2]) < 0.000001
+    assert result.skipped == expected[3]
+
+
+@pytest.mark.unit
+def test_stream_rejects_duplicate_events():
+    """An event can be fed only once"""
+    stream = SubnetApyStream(2, 86400.0)
+    stream.feed(1, -1)
+    with pytest.raises(ValueError):
+        stream.feed(1, -1)
+    stream.feed(0, -1)
+    with pytest.raises(ValueError):
+        stream.feed(0, -1)
+    assert stream.result().skipped == 2
+
+
+@pytest.mark.unit
+def test_backpressure_bounds_buffer_behind_slow_first_fetch():
+    """A slow first fetch must not let the reorder buffer grow past the window"""
+    limit, total = 4, 200
+    stream = SubnetApyStream(total, 86400.0)
+
+    async def fetch(event_index):
+        await asyncio.sleep(0.05 if event_index == 0 else 0)
+        return event_index
+
+    async def run():
+        fetches, hold = stream.backpressure(
+            ((event_index, lambda event_index=event_index: fetch(event_index)) for event_index in range(total)), limit
+        )
+        most = 0
+        async for event_index in as_completed_windowed(fetches, limit, hold):
+            stream.feed(event_index, -1)
+            most = max(most, stream.buffered)
+        return most
+
+    assert asyncio.run(run()) < limit
+    assert stream.result().complete
+
+
+@pytest.mark.unit
+def test_streaming_base_requires_apply():
+    with pytest.raises(TypeError):
+        _StreamingApy(1, 86400.0)
@@ -0,0 +1,101 @@
+"""
+Tests for the planned epoch reads of the subnet calculator.
+"""
+import asyncio
+
+import pytest
+
+from src.dataset import calculate_from_dataset, iter_datasets
+from src.options import CalcOptions
+from src.subnet_calc import retrieve_and_calculate_hotkey_subnet_apy
+from tests.conftest import HEAD, RAO, TEMPO
+from tests.conftest import ChainStub as BaseChain
+
+
+class ChainStub(BaseChain):
+    """Dividends every 4th epoch; the alpha stake is under the combined threshold on its own."""
+
+    def __init__(self, alpha_stake_tao=3000):
+        super().__init__()
+        self.alpha_stake_tao = alpha_stake_tao
+
+    def value(self, name, params, block):
+        if name == "AlphaDividendsPerSubnet":
+            return RAO if (block // (TEMPO + 1)) % 4 == 0 else 0
+        if name == "TotalHotkeyAlpha":
+            hotkey, netuid = params
+            if hotkey == "parent":
+                return 2000 * RAO
+            return (self.alpha_stake_tao if netuid else 100) * RAO
+        if name == "TaoWeight":
+            return 2**63
+        if name == "ParentKeys":
+            return [(2**64 - 1, ["parent"])]
+        return None
+
+
+@pytest.fixture
+def run(progress):
+    def run(chain, use_inherited=False, no_filters=False, export_dir=None):
+        return asyncio.run(retrieve_and_calculate_hotkey_subnet_apy(
+            chain, 1, "hk", "7d", HEAD, progress(), use_inherited_filer=use_inherited, no_filters=no_filters,
+            options=CalcOptions(export_dir=export_dir),
+        ))
+    return run
+
+
+@pytest.mark.unit
+def test_epochs_without_dividends_cost_one_read(run, monkeypatch):
+    monkeypatch.setattr("helpers.decode_account_id", lambda account: account)
+    chain = ChainStub(alpha_stake_tao=5000)
+    result = run(chain)
+
+    with_divs = (result.total + 3) // 4
+    assert result.reads == {
+        "AlphaDividendsPerSubnet": result.total,
+        "TotalHotkeyAlpha": 2 * with_divs,
+        "TaoWeight": with_divs,
+    }
+    assert result.dividends == pytest.approx(with_divs)
+    assert result.skipped == 0
+
+
+@pytest.mark.unit
+def test_no_filters_reads_no_filter_inputs(run):
+    chain = ChainStub(alpha_stake_tao=5000)
+    result = run(chain, no_filters=True)
+
+    assert set(result.reads) == {"AlphaDividendsPerSubnet", "TotalHotkeyAlpha"}
+    assert result.reads["TotalHotkeyAlpha"] == (result.total + 3) // 4
+
+
+@pytest.mark.unit
+def test_inherited_stake_read_only_when_own_stake_fails(run, monkeypatch):
+    monkeypatch.setattr("helpers.decode_account_id", lambda account: account)
+    with_inherited = run(ChainStub(alpha_stake_tao=3000), use_inherited=True)
+    without_inherited = run(ChainStub(alpha_stake_tao=3000))
+
+    with_divs = (with_inherited.total + 3) // 4
+    # 3000 α alone is under 4000; with the parent's 2000 α it passes
+    assert without_inherited.skipped == with_divs
+    assert without_inherited.dividends == 0
+    assert with_inherited.skipped == 0
+    assert with_inherited.dividends == pytest.approx(with_divs)
+    assert with_inherited.reads["ParentKeys"] == with_divs
+    assert with_inherited.reads["ChildKeys"] == with_divs
+
+
+@pytest.mark.unit
+# 3980 α passes only with the root stake, 3000 α only with the parent's stake
+@pytest.mark.parametrize("use_inherited, alpha_stake_tao", [(False, 3980), (True, 3000)])
+def test_no_filters_export_recomputes_with_filters(run, tmp_path, monkeypatch, use_inherited, alpha_stake_tao):
+    monkeypatch.setattr("helpers.decode_account_id", lambda account: account)
+    chain = ChainStub(alpha_stake_tao=alpha_stake_tao)
+    run(chain, use_inherited=use_inherited, no_filters=True, export_dir=str(tmp_path))
+    filtered = run(ChainStub(alpha_stake_tao=alpha_stake_tao), use_inherited=use_inherited)
+
+    recomputed = calculate_from_dataset(next(iter_datasets(str(tmp_path), 1)))
+    assert filtered.dividends > 0
+    assert recomputed.skipped == filtered.skipped
+    assert recomputed.apy == pytest.approx(filtered.apy)
+    assert recomputed.dividends == pytest.approx(filtered.dividends)
@@ -0,0 +1,56 @@
+"""
+Tests for the change-point reads and the effective take calculation.
+"""
+import asyncio
+import pytest
+
+from src.take import Piecewise, TakeAccumulator, resolve_piecewise
+
+
+@pytest.mark.unit
+def test_resolve_piecewise_reads_only_around_change_points():
+    blocks = list(range(1000, 1000 + 361 * 200, 361))
+    change_block = blocks[137]
+    reads = []
+
+    async def fetch(block):
+        reads.append(block)
+        return 0.18 if block < change_block else 0.09
+
+    values = asyncio.run(resolve_piecewise(fetch, iter(blocks)))
+
+    assert [values.at(b) for b in blocks] == [0.18 if b < change_block else 0.09 for b in blocks]
+    assert len(values) == 2  # only the change points are kept
+    assert len(reads) <= 2 + 17  # both ends + log2(71839 blocks) bisection steps
+
+
+@pytest.mark.unit
+def test_resolve_piecewise_constant_value():
+    reads = []
+
+    async def fetch(block):
+        reads.append(block)
+        return 0
+
+    values = asyncio.run(resolve_piecewise(fetch, [1, 2, 3, 4]))
+    assert [values.at(b) for b in [1, 2, 3, 4]] == [0, 0, 0, 0]
+    assert len(reads) == 2
+    assert len(asyncio.run(resolve_piecewise(fetch, []))) == 0
+
+
+@pytest.mark.unit
+def test_take_accumulator_weights_by_dividends():
+    takes = TakeAccumulator()
+    takes.add(0, 3.0, 100.0)
+    takes.add(1, 0.0, 100.0)
+    takes.add(2, 1.0, 100.0, parent_share=0.5)
+    # Epoch 1 has no dividends and is not kept
+    assert list(takes.events) == [0, 2]
+    takes.locate(iter([10, 20, 30, 40]))
+    assert list(takes.blocks) == [10, 30]
+
+    # delegate take 0.18 until block 40, childkey take 0.10 on half of epoch 2's dividends
+    take = takes.result(Piecewise([(10, 0.18), (40, 0.0)]), Piecewise([(10, 0.10)]))
+    assert abs(take - (3.0 * 0.18 + 1.0 * (0.5 * 0.10 + 0.5 * 0.18)) / 4.0) < 1e-12
+
+    assert TakeAccumulator().result(Piecewise([(10, 0.18)])) is None